@@ -0,0 +1,96 @@
+# access.py
+
+import os
+import json
+import time
+import logging
+import threading
+
+from config import ACCESS_FILE, CHAT_ID, RATE_LIMIT_COUNT, RATE_LIMIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Роли по умолчанию: какие команды доступны ("*" — все).
+# Файл ACCESS_FILE может переопределить роли и задать чаты:
+# {"chats": {"123": "owner", "456": "manager"},
+#  "roles": {"manager": ["analyze", "managers"]},
+#  "quotas": {"manager": [5, 30]}}   # [ёмкость, за сколько секунд восполняется]
+DEFAULT_ROLES = {
+    "owner": ["*"],
+    "manager": ["analyze", "forecast", "managers", "compare", "pace", "subscribe", "unsubscribe", "subscriptions"],
+    "accountant": ["forecast", "forecast_prev", "forecast_period", "period", "export", "pnl", "compare", "pace",
+                   "subscribe", "unsubscribe", "subscriptions"],
+}
+
+_cache = {"mtime": None, "config": None}
+_lock = threading.Lock()
+_buckets = {}
+
+
+def load_access():
+    """Настройки доступа (перечитываются при изменении файла). CHAT_ID из .env — всегда владелец."""
+    try:
+        mtime = os.path.getmtime(ACCESS_FILE)
+    except OSError:
+        mtime = None
+    with _lock:
+        if _cache["config"] is not None and _cache["mtime"] == mtime:
+            return _cache["config"]
+        data = {}
+        if mtime is not None:
+            try:
+                with open(ACCESS_FILE, encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError as e:
+                logger.error("Не удалось разобрать %s: %s", ACCESS_FILE, e)
+        chats = {str(chat): role for chat, role in data.get("chats", {}).items()}
+        if CHAT_ID:
+            chats.setdefault(str(CHAT_ID), "owner")
+        config = {
+            "chats": chats,
+            "roles": {**DEFAULT_ROLES, **data.get("roles", {})},
+            "quotas": data.get("quotas", {}),
+        }
+        _cache.update(mtime=mtime, config=config)
+        return config
+
+
+def role_of(chat_id):
+    """Роль чата или None, если чат не допущен."""
+    return load_access()["chats"].get(str(chat_id))
+
+
+def is_allowed(role, command):
+    commands = load_access()["roles"].get(role, [])
+    return "*" in commands or command in commands
+
+
+def take_token(chat_id, role=None):
+    """
+    Квота чата — корзина токенов: ёмкость capacity, полностью восполняется за seconds.
+    Списывает один токен; False — квота исчерпана.
+    """
+    capacity, seconds = load_access()["quotas"].get(role, [RATE_LIMIT_COUNT, RATE_LIMIT_SECONDS])
+    now = time.monotonic()
+    with _lock:
+        tokens, updated = _buckets.get(chat_id, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * capacity / seconds)
+        allowed = tokens >= 1
+        _buckets[chat_id] = (tokens - 1 if allowed else tokens, now)
+    return allowed
+
+
+def check(chat_id, command):
+    """
+    Проверка до любого обращения к данным: None — можно выполнять,
+    иначе текст отказа ('' — отказ без ответа, чтобы не тратить отправки на флуд).
+    """
+    role = role_of(chat_id)
+    if role is None:
+        # Незнакомому чату отвечаем не чаще квоты — ID нужен, чтобы владелец мог его добавить
+        return f"⛔ Нет доступа. ID чата: {chat_id}" if take_token(chat_id) else ""
+    if not is_allowed(role, command):
+        return "⛔ Команда недоступна для вашей роли." if take_token(chat_id, role) else ""
+    if not take_token(chat_id, role):
+        return "⏳ Слишком много запросов, попробуйте через минуту."
+    return None
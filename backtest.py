@@ -0,0 +1,138 @@
+# backtest.py
+
+import sys
+import numpy as np
+import pandas as pd
+
+from utils import metric_columns
+from pnl import calculate
+from params_history import effective_lookup
+
+SUM_METRICS = ["revenue", "salary", "delivery"]
+MAX_DAYS = 31
+
+
+def month_day_matrices(df, before=None, months=None):
+    """
+    Данные завершённых месяцев (до месяца before, по умолчанию — текущего) матрицами
+    месяц × день месяца (31 столбец): суммы revenue/salary/delivery, сумма и число
+    значений фудкоста, признак дня с данными. months — только последние months месяцев.
+    Возвращает (первый месяц как Period, число дней в каждом месяце, {имя: матрица}).
+    """
+    first_open = pd.Timestamp(before or pd.Timestamp.now()).to_period("M")
+    df = df[df["Дата"] < first_open.start_time] if not df.empty else df
+    if months:
+        df = df[df["Дата"] >= (first_open - months).start_time]
+    if df.empty:
+        return None, np.array([], dtype=int), {}
+
+    dates = df["Дата"]
+    code = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+    rows, cols = code - code.min(), dates.dt.day.to_numpy() - 1
+    count = int(rows.max()) + 1
+    start = pd.Period(year=int(code.min() // 12), month=int(code.min() % 12) + 1, freq="M")
+    days_in_month = np.array([(start + i).days_in_month for i in range(count)])
+
+    metrics = metric_columns(df)
+    matrices = {}
+    for name in SUM_METRICS:
+        matrix = np.zeros((count, MAX_DAYS))
+        np.add.at(matrix, (rows, cols), np.nan_to_num(metrics[name].to_numpy()))
+        matrices[name] = matrix
+    foodcost = metrics["foodcost"].to_numpy()
+    present = ~np.isnan(foodcost)
+    matrices["foodcost_sum"] = np.zeros((count, MAX_DAYS))
+    matrices["foodcost_count"] = np.zeros((count, MAX_DAYS))
+    np.add.at(matrices["foodcost_sum"], (rows[present], cols[present]), foodcost[present])
+    np.add.at(matrices["foodcost_count"], (rows[present], cols[present]), 1)
+    matrices["days"] = np.zeros((count, MAX_DAYS))
+    matrices["days"][rows, cols] = 1
+    return start, days_in_month, matrices
+
+
+def backtest(df, before=None, months=None):
+    """
+    Точность прогноза на конец месяца по всем завершённым месяцам сразу.
+    Прогноз на день среза d — итоги за дни 1..d, пересчитанные на весь месяц
+    (среднее за дни с данными × дней в месяце); фудкост — средний за дни 1..d.
+    Всё — накопленные суммы по матрицам месяц × день и один векторный расчёт P&L
+    (pnl.calculate) для всех срезов и фактических итогов месяцев.
+    Возвращает DataFrame по дню среза: revenue_mape, profit_mape (прибыль после УСН, %), months.
+    """
+    start, days_in_month, matrices = month_day_matrices(df, before, months)
+    if start is None:
+        return pd.DataFrame(columns=["revenue_mape", "profit_mape", "months"])
+
+    cumulative = {name: matrix.cumsum(axis=1) for name, matrix in matrices.items()}
+    days_seen = cumulative["days"]
+    day_numbers = np.arange(1, MAX_DAYS + 1)
+    valid = (day_numbers[None, :] <= days_in_month[:, None]) & (days_seen > 0)
+    month_idx, day_idx = np.nonzero(valid)
+    scale = days_in_month[month_idx] / days_seen[month_idx, day_idx]
+
+    # Строки для P&L: сначала все срезы, затем фактические итоги каждого месяца
+    count = len(days_in_month)
+    projected = {name: cumulative[name][month_idx, day_idx] * scale for name in SUM_METRICS}
+    actual = {name: cumulative[name][:, -1] for name in SUM_METRICS}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        projected["foodcost"] = (cumulative["foodcost_sum"][month_idx, day_idx]
+                                 / cumulative["foodcost_count"][month_idx, day_idx])
+        actual["foodcost"] = cumulative["foodcost_sum"][:, -1] / cumulative["foodcost_count"][:, -1]
+    totals = pd.DataFrame({name: np.concatenate([projected[name], actual[name]]) for name in projected})
+
+    # Параметры управляющей таблицы: для среза — действовавшие в тот день, для факта — на конец месяца
+    month_starts = [(start + i).start_time for i in range(count)]
+    as_of = [month_starts[m] + pd.Timedelta(days=int(d)) for m, d in zip(month_idx, day_idx)]
+    as_of += [(start + i).end_time.normalize() for i in range(count)]
+    lines, _ = calculate(totals, lookup=effective_lookup(as_of, index=totals.index))
+    profit = lines["profit_after_usn"].to_numpy(dtype=float)
+    profit_projected, profit_actual = profit[:len(month_idx)], profit[len(month_idx):]
+
+    def ape(forecast, fact):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(fact != 0, np.abs(forecast - fact) / np.abs(fact) * 100, np.nan)
+
+    errors = pd.DataFrame({
+        "day": day_idx + 1,
+        "revenue_mape": ape(projected["revenue"], actual["revenue"][month_idx]),
+        "profit_mape": ape(profit_projected, profit_actual[month_idx]),
+    })
+    result = errors.groupby("day").agg(
+        revenue_mape=("revenue_mape", "mean"),
+        profit_mape=("profit_mape", "mean"),
+        months=("revenue_mape", "count"),
+    )
+    result.attrs["first_month"] = str(start)
+    result.attrs["last_month"] = str(start + count - 1)
+    return result
+
+
+def backtest_report(df, months=None, before=None):
+    """Текст для /backtest: MAPE прогноза на конец месяца по дню среза."""
+    result = backtest(df, before, months)
+    if result.empty:
+        return "⚠️ Нет завершённых месяцев для проверки прогноза."
+
+    def percent(value):
+        return "—" if pd.isna(value) else f"{value:.1f}%"
+
+    lines = [
+        "📐 Точность прогноза на конец месяца (MAPE)",
+        f"Месяцы: {result.attrs['first_month']} — {result.attrs['last_month']}",
+        "Прогноз: среднее за дни с данными × дней в месяце\n",
+        "День | Выручка | Прибыль после УСН | Мес.",
+    ]
+    for day, row in result.iterrows():
+        lines.append(f"{day} | {percent(row['revenue_mape'])} | {percent(row['profit_mape'])} | {int(row['months'])}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import time
+    from sync import sync
+
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    df = sync()
+    started = time.perf_counter()
+    print(backtest_report(df, months))
+    print(f"\nРасчёт: {time.perf_counter() - started:.3f} с")
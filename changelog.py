@@ -0,0 +1,195 @@
+# changelog.py
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from config import CHANGELOG_DB, CHANGELOG_KEEP_DAYS, CLOSED_MONTH_ALERTS
+from utils import metric_columns, format_ruble, send_to_telegram
+from sync import register_sync_hook
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_changes_lock = threading.Lock()
+_last = {"version": None, "changes": None}  # журнал считается один раз на синхронизацию
+
+
+def _connect():
+    os.makedirs(os.path.dirname(CHANGELOG_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(CHANGELOG_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS row_hashes ("
+        " row_key TEXT PRIMARY KEY,"
+        " date TEXT NOT NULL,"
+        " hash INTEGER NOT NULL,"
+        " revenue REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS change_log ("
+        " synced_at TEXT NOT NULL,"
+        " row_key TEXT NOT NULL,"
+        " date TEXT NOT NULL,"
+        " kind TEXT NOT NULL,"          # added / changed / removed
+        " revenue_before REAL,"
+        " revenue_after REAL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_synced ON change_log (synced_at)")
+    return conn
+
+
+def row_fingerprints(df):
+    """
+    Ключ и хэш содержимого каждой строки.
+    Ключ — дата|менеджер|номер строки с той же датой и менеджером (в порядке таблицы).
+    Хэш не зависит от типов после dataset.compact: числа приводятся к float64, остальное — к строкам.
+    """
+    dates = df["Дата"].dt.strftime("%Y-%m-%d")
+    managers = (df["Менеджер"].astype(object).fillna("").astype(str).str.strip()
+                if "Менеджер" in df.columns else pd.Series("", index=df.index))
+    occurrence = pd.DataFrame({"d": dates, "m": managers}).groupby(["d", "m"], sort=False).cumcount()
+    canonical = pd.DataFrame({
+        col: (df[col].astype("float64") if pd.api.types.is_numeric_dtype(df[col])
+              else df[col].astype(object).where(df[col].notna(), "").astype(str))
+        for col in df.columns
+    })
+    hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy().view(np.int64)
+    return pd.DataFrame({
+        "row_key": (dates + "|" + managers + "|" + occurrence.astype(str)).to_numpy(),
+        "date": dates.to_numpy(),
+        "hash": hashes,
+        "revenue": metric_columns(df)["revenue"].to_numpy(),
+    })
+
+
+def _db_rows(fingerprints):
+    return [(key, date, int(value), None if np.isnan(revenue) else float(revenue))
+            for key, date, value, revenue in zip(fingerprints["row_key"], fingerprints["date"],
+                                                  fingerprints["hash"], fingerprints["revenue"])]
+
+
+def _empty_changes(initial):
+    return {"initial": initial, "dates": [], "months": [], "retro_dates": [], "closed_months": {},
+            "added": 0, "changed": 0, "removed": 0}
+
+
+def record_changes(df, now=None):
+    """
+    Сравнивает строки df с сохранёнными хэшами, записывает журнал и новые хэши.
+    Возвращает словарь: затронутые дни и месяцы, правки задним числом (дни не позже
+    прежней последней даты), итоги правок закрытых месяцев (выручка до и после; новые дни
+    после прежней последней даты правкой не считаются),
+    число добавленных, изменённых и удалённых строк. initial=True — сравнивать было не с чем.
+    """
+    if df.empty or "Дата" not in df.columns:
+        return _empty_changes(initial=True)
+    now = now or datetime.now()
+    current = row_fingerprints(df).drop_duplicates("row_key")
+    with _lock, _connect() as conn:
+        stored = pd.read_sql_query("SELECT row_key, date, hash, revenue FROM row_hashes", conn)
+        if stored.empty:
+            conn.executemany("INSERT INTO row_hashes (row_key, date, hash, revenue) VALUES (?, ?, ?, ?)",
+                             _db_rows(current))
+            return _empty_changes(initial=True)
+
+        # Int64: после внешнего соединения хэши не должны превращаться во float (потеря младших битов)
+        merged = stored.astype({"hash": "Int64"}).merge(
+            current.astype({"hash": "Int64"}), on="row_key", how="outer", suffixes=("_old", "_new"), indicator=True)
+        kinds = np.select(
+            [merged["_merge"] == "right_only", merged["_merge"] == "left_only",
+             (merged["hash_old"] != merged["hash_new"]).fillna(False).astype(bool)],
+            ["added", "removed", "changed"], default="")
+        diff = merged[kinds != ""].assign(kind=kinds[kinds != ""])
+        diff["date"] = diff["date_new"].fillna(diff["date_old"])
+        if diff.empty:
+            return _empty_changes(initial=False)
+
+        synced_at = now.strftime("%Y-%m-%d %H:%M:%S")
+        conn.executemany(
+            "INSERT INTO change_log (synced_at, row_key, date, kind, revenue_before, revenue_after)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(synced_at, key, date, kind, None if pd.isna(before) else float(before),
+              None if pd.isna(after) else float(after))
+             for key, date, kind, before, after in zip(diff["row_key"], diff["date"], diff["kind"],
+                                                       diff["revenue_old"], diff["revenue_new"])])
+        removed = diff.loc[diff["kind"] == "removed", "row_key"]
+        conn.executemany("DELETE FROM row_hashes WHERE row_key = ?", [(key,) for key in removed])
+        upserts = current[current["row_key"].isin(diff.loc[diff["kind"] != "removed", "row_key"])]
+        conn.executemany("INSERT OR REPLACE INTO row_hashes (row_key, date, hash, revenue) VALUES (?, ?, ?, ?)",
+                         _db_rows(upserts))
+        keep_from = (now - timedelta(days=CHANGELOG_KEEP_DAYS)).strftime("%Y-%m-%d")
+        conn.execute("DELETE FROM change_log WHERE synced_at < ?", (keep_from,))
+
+    previous_last = stored["date"].max()
+    current_month = now.strftime("%Y-%m")
+    diff["month"] = diff["date"].str[:7]
+    # Новые дни после прежней последней даты — обычное дозаполнение конца месяца, а не правка
+    retro = (diff["kind"] != "added") | (diff["date"] <= previous_last)
+    closed = diff[(diff["month"] < current_month) & retro]
+    closed_months = {
+        month: {
+            "rows": len(group),
+            "dates": sorted(group["date"].unique()),
+            "revenue_before": float(group["revenue_old"].fillna(0).sum()),
+            "revenue_after": float(group["revenue_new"].fillna(0).sum()),
+        }
+        for month, group in closed.groupby("month")
+    }
+    return {
+        "initial": False,
+        "dates": sorted(diff["date"].unique()),
+        "months": sorted(diff["month"].unique()),
+        "retro_dates": sorted(diff.loc[diff["date"] <= previous_last, "date"].unique()),
+        "closed_months": closed_months,
+        "added": int((diff["kind"] == "added").sum()),
+        "changed": int((diff["kind"] == "changed").sum()),
+        "removed": int((diff["kind"] == "removed").sum()),
+    }
+
+
+def changes_for(df, version):
+    """Изменения синхронизации version (считаются один раз, дальше — из памяти)."""
+    with _changes_lock:
+        if _last["version"] == version and version is not None:
+            return _last["changes"]
+        changes = record_changes(df)
+        _last.update(version=version, changes=changes)
+        return changes
+
+
+def closed_month_message(changes):
+    """Текст оповещения о правках в закрытых месяцах ('' — правок не было)."""
+    lines = []
+    for month, info in changes["closed_months"].items():
+        title = datetime.strptime(month, "%Y-%m").strftime("%B %Y")
+        days = ", ".join(datetime.strptime(day, "%Y-%m-%d").strftime("%d.%m") for day in info["dates"][:10])
+        if len(info["dates"]) > 10:
+            days += f" и ещё {len(info['dates']) - 10}"
+        delta = info["revenue_after"] - info["revenue_before"]
+        sign = "+" if delta >= 0 else "−"
+        lines.append(f"📅 {title}: строк {info['rows']} ({days}), выручка {sign}{format_ruble(abs(delta))}")
+    if not lines:
+        return ""
+    return "✏️ Изменились данные закрытых месяцев:\n" + "\n".join(lines)
+
+
+@register_sync_hook
+def _journal(df, version):
+    changes = changes_for(df, version)
+    if changes["retro_dates"]:
+        logger.info("Правки задним числом: %s", changes["retro_dates"])
+    message = closed_month_message(changes) if CLOSED_MONTH_ALERTS else ""
+    if message:
+        send_to_telegram(message)
+
+
+def recent_changes(limit=50):
+    """Последние записи журнала (новые сверху)."""
+    with _lock, _connect() as conn:
+        return pd.read_sql_query(
+            "SELECT synced_at, date, row_key, kind, revenue_before, revenue_after FROM change_log"
+            " ORDER BY synced_at DESC, date DESC LIMIT ?", conn, params=(limit,))
@@ -1,6 +1,8 @@
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from drive_ingest import list_folder
+
 # === Настройки ===
 SERVICE_ACCOUNT_FILE = 'credentials.json'  # имя JSON-файла с ключом
 FOLDER_ID = 'PASTE_YOUR_FOLDER_ID_HERE'  # замени на ID папки из Google Диска
@@ -14,13 +16,8 @@ def get_drive_service():
 
 # === Получить список файлов ===
 def list_files(folder_id):
-    service = get_drive_service()
-    results = service.files().list(
-        q=f"'{folder_id}' in parents and trashed = false",
-        pageSize=10,
-        fields="files(id, name, mimeType)"
-    ).execute()
-    files = results.get('files', [])
+    # Постранично — тем же обходом, что и импорт из папки (drive_ingest.list_folder)
+    files = list_folder(folder_id, service=get_drive_service())
     if not files:
         print("📁 В папке ничего нет.")
     else:
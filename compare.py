@@ -0,0 +1,168 @@
+# compare.py
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+from utils import format_ruble, metric_columns
+from sync import register_sync_hook, get_data, get_version
+
+# Метрики дневной агрегатной таблицы: (колонка, заголовок, способ агрегации за период)
+COMPARE_METRICS = [
+    ("Выручка", "📊 Выручка", "sum"),
+    ("Ср. чек", "🧾 Ср. чек", "mean"),
+    ("Доставка", "📦 Доставка", "sum"),
+    ("ЗП зал", "🪑 ЗП зал", "sum"),
+]
+
+_index = {"version": None, "data": None}
+
+
+def build_daily_table(df):
+    """Дневная агрегатная таблица, отсортированная по дате (одна строка на день)."""
+    if df.empty or "Дата" not in df.columns:
+        return pd.DataFrame(columns=["Дата"] + [m[0] for m in COMPARE_METRICS])
+    metrics = metric_columns(df)
+    grouped = pd.DataFrame({
+        "Дата": df["Дата"],
+        "Выручка": metrics["revenue"],
+        "Ср. чек": metrics["avg_check"],
+        "Доставка": metrics["delivery"],
+        "ЗП зал": metrics["hall"],
+    }).groupby("Дата", sort=True)
+    daily = grouped[["Выручка", "Доставка", "ЗП зал"]].sum()
+    daily.insert(1, "Ср. чек", grouped["Ср. чек"].mean())
+    return daily.reset_index()
+
+
+def build_calendar_index(df):
+    """
+    Календарный индекс поверх дневной таблицы:
+    (год, месяц) и (ISO-год, ISO-неделя) -> диапазон строк, день недели -> номера строк.
+    """
+    daily = build_daily_table(df)
+    dates = pd.DatetimeIndex(daily["Дата"])
+    iso = dates.isocalendar()
+
+    def ranges(keys):
+        result = {}
+        for pos, key in enumerate(keys):
+            if key in result:
+                result[key] = (result[key][0], pos + 1)
+            else:
+                result[key] = (pos, pos + 1)
+        return result
+
+    return {
+        "daily": daily,
+        "dates": dates.values,
+        "values": {m[0]: daily[m[0]].to_numpy(dtype=float) for m in COMPARE_METRICS},
+        "months": ranges(zip(dates.year, dates.month)),
+        "weeks": ranges(zip(iso["year"], iso["week"])),
+        "weekdays": {wd: np.flatnonzero(dates.weekday == wd) for wd in range(7)},
+    }
+
+
+@register_sync_hook
+def _rebuild_index(df, version):
+    _index["data"] = build_calendar_index(df)
+    _index["version"] = version
+
+
+def get_calendar_index():
+    """Индекс для последней синхронизации (строится заново, только если данные обновились)."""
+    get_data()
+    if _index["version"] != get_version():
+        _rebuild_index(get_data(), get_version())
+    return _index["data"]
+
+
+def _slice_until(index, start_stop, last_day):
+    """Срез месяца/недели, обрезанный по дню last_day включительно."""
+    start, stop = start_stop
+    end = np.searchsorted(index["dates"], np.datetime64(last_day), side="right")
+    return start, min(stop, end)
+
+
+def _aggregate(index, positions, per_day=False):
+    """Итоги по строкам positions; per_day=True — средние за день вместо сумм."""
+    result = {}
+    for column, _, how in COMPARE_METRICS:
+        if per_day:
+            how = "mean"
+        values = index["values"][column][positions]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            result[column] = np.nan
+        else:
+            result[column] = values.sum() if how == "sum" else values.mean()
+    return result
+
+
+def _month_to_date(index, year, month, day):
+    key = (year, month)
+    if key not in index["months"]:
+        return None
+    last_day = pd.Timestamp(year, month, min(day, pd.Timestamp(year, month, 1).days_in_month))
+    start, stop = _slice_until(index, index["months"][key], last_day)
+    return _aggregate(index, slice(start, stop))
+
+
+def _format_rows(current, base):
+    lines = []
+    for column, title, how in COMPARE_METRICS:
+        cur = current[column]
+        prev = base[column]
+        if pd.isna(prev) or not prev:
+            delta = "—"
+        else:
+            delta = f"{(cur - prev) / prev * 100:+.1f}%"
+        lines.append(f"{title}: {format_ruble(cur)} vs {format_ruble(prev)} ({delta})")
+    return "\n".join(lines)
+
+
+def compare_report(kind="mom", count=8):
+    """
+    Сравнительный отчёт:
+    'mom' — месяц к прошлому месяцу, 'yoy' — месяц к тому же месяцу прошлого года
+    (оба за одинаковое число дней), 'week' — неделя к прошлой неделе,
+    'weekday' — последний день против среднего за count таких же дней недели.
+    """
+    index = get_calendar_index()
+    if index["daily"].empty:
+        return "⚠️ Нет доступных данных"
+
+    last = pd.Timestamp(index["dates"][-1])
+
+    if kind == "mom":
+        prev = last.replace(day=1) - timedelta(days=1)
+        current = _month_to_date(index, last.year, last.month, last.day)
+        base = _month_to_date(index, prev.year, prev.month, last.day)
+        title = f"📅 {last.strftime('%B %Y')} (1–{last.day}) vs {prev.strftime('%B %Y')}"
+    elif kind == "yoy":
+        current = _month_to_date(index, last.year, last.month, last.day)
+        base = _month_to_date(index, last.year - 1, last.month, last.day)
+        title = f"📅 {last.strftime('%B %Y')} (1–{last.day}) vs {last.strftime('%B')} {last.year - 1}"
+    elif kind == "week":
+        iso = last.isocalendar()
+        prev_day = last - timedelta(days=7)
+        prev_iso = prev_day.isocalendar()
+        key, prev_key = (iso[0], iso[1]), (prev_iso[0], prev_iso[1])
+        current = _aggregate(index, slice(*index["weeks"][key]))
+        base = None
+        if prev_key in index["weeks"]:
+            base = _aggregate(index, slice(*_slice_until(index, index["weeks"][prev_key], prev_day)))
+        title = f"📅 Неделя {iso[1]} (по {last.strftime('%d.%m')}) vs неделя {prev_iso[1]}"
+    elif kind == "weekday":
+        positions = index["weekdays"][last.weekday()]
+        current_pos = len(index["dates"]) - 1
+        history = positions[positions < current_pos][-count:]
+        current = _aggregate(index, [current_pos])
+        base = _aggregate(index, history, per_day=True) if len(history) else None
+        title = f"📅 {last.strftime('%A %d.%m')} vs среднее за {len(history)} таких же дней"
+    else:
+        return "❌ Некорректный тип сравнения. Используйте: mom, yoy, week, weekday."
+
+    if base is None or current is None:
+        return f"{title}\n\n⚠️ Нет данных для сравнения."
+    return f"{title}\n\n{_format_rows(current, base)}"
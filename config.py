@@ -6,12 +6,73 @@ load_dotenv()                     # Загрузка всех переменны
 SHEET_ID = "1SHHKKcgXgbzs_AyBQJpyHx9zDauVz6iR9lz1V7Q3hyw"  # ID основной Google-таблицы с операционными данными
 MANAGEMENT_SHEET_ID = "1nqpQ97D9rS2hPVQrrlbPKO5QG5RXvc936xvw6TSHnXc"  # ID управляющей Google-таблицы
 MANAGEMENT_SHEET_NAME = "Лист1"    # Имя листа в управляющей таблице
+TARGETS_SHEET_NAME = os.getenv('TARGETS_SHEET_NAME', 'Цели')  # Лист целей месяца в управляющей таблице
+DASHBOARD_SHEET_ID = os.getenv('DASHBOARD_SHEET_ID', '')  # Таблица для публикации показателей (пусто — выключено)
+DASHBOARD_SHEET_NAME = os.getenv('DASHBOARD_SHEET_NAME', 'Dashboard')  # Лист с показателями
+DASHBOARD_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]  # Запись — только для публикации
+DASHBOARD_DAYS = int(os.getenv('DASHBOARD_DAYS', '31'))  # Сколько последних дней в дневных показателях
+DASHBOARD_MONTHS = int(os.getenv('DASHBOARD_MONTHS', '12'))  # Сколько месяцев P&L
 
 SERVICE_ACCOUNT_FILE = 'fifth-medley-461515-h0-089884c74c28.json'  # JSON строка с ключом сервисного аккаунта
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]  # Права доступа только на чтение
+GOOGLE_SHEETS_API_URL = "https://sheets.googleapis.com"  # Настоящий адрес Sheets API
+SHEETS_API_URL = os.getenv('SHEETS_API_URL', GOOGLE_SHEETS_API_URL)  # Можно подменить (локальный эмулятор, нагрузочный тест)
+SHEETS_ANONYMOUS = os.getenv('SHEETS_ANONYMOUS', '') == '1'  # Без авторизации — только для эмулятора
+SHEETS_PROVIDER = os.getenv('SHEETS_PROVIDER', 'gspread')  # gspread или async (sheets_async: пул соединений, параллельные batchGet)
+SHEETS_POOL_SIZE = int(os.getenv('SHEETS_POOL_SIZE', '10'))  # Соединений keep-alive в пуле асинхронного клиента
+SHEETS_HTTP2 = os.getenv('SHEETS_HTTP2', '1') == '1'  # HTTP/2, если установлен пакет h2
+SHEETS_TIMEOUT = float(os.getenv('SHEETS_TIMEOUT', '30'))  # Таймаут запроса асинхронного клиента, сек
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')  # если хотите хранить токен в .env
 CHAT_ID = os.getenv('CHAT_ID')                # если хотите хранить chat_id в .env
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')  # Адрес Bot API (подменяется в нагрузочном тесте)
+
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.metadata.readonly"]  # Права только на метаданные файлов Drive
+WATCH_INTERVAL_SECONDS = int(os.getenv('WATCH_INTERVAL_SECONDS', '120'))  # Как часто проверять изменения таблицы
+STATE_DIR = os.getenv('STATE_DIR', 'state')   # Папка для локального состояния бота (кэши, отметки)
+
+FETCH_RETRIES = int(os.getenv('FETCH_RETRIES', '4'))                 # Повторы запроса к Google при 429/5xx
+FETCH_BACKOFF_BASE = float(os.getenv('FETCH_BACKOFF_BASE', '0.5'))   # Первая пауза перед повтором, сек
+FETCH_BACKOFF_MAX = float(os.getenv('FETCH_BACKOFF_MAX', '8'))       # Максимальная пауза между повторами, сек
+CIRCUIT_FAILURES = int(os.getenv('CIRCUIT_FAILURES', '3'))           # Подряд неудачных загрузок до размыкания
+CIRCUIT_RESET_SECONDS = int(os.getenv('CIRCUIT_RESET_SECONDS', '60'))  # Сколько не обращаться к Google после размыкания
+MANAGEMENT_CACHE_SECONDS = int(os.getenv('MANAGEMENT_CACHE_SECONDS', '60'))  # Кэш управляющей таблицы между вызовами
+SHEETS_READS_PER_MINUTE = int(os.getenv('SHEETS_READS_PER_MINUTE', '60'))  # Бюджет чтений Sheets в минуту (квота Google)
+QUOTA_RESERVE = float(os.getenv('QUOTA_RESERVE', '0.25'))  # Доля бюджета, которую видят только плановые отчёты
+QUOTA_MAX_WAIT_SECONDS = float(os.getenv('QUOTA_MAX_WAIT_SECONDS', '60'))  # Сколько чтение может ждать в очереди бюджета
+
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', '2'))      # Одновременных загрузок из Google на весь процесс
+RATE_LIMIT_COUNT = int(os.getenv('RATE_LIMIT_COUNT', '5'))        # Квота чата по умолчанию: команд подряд
+RATE_LIMIT_SECONDS = int(os.getenv('RATE_LIMIT_SECONDS', '30'))   # За сколько секунд квота восполняется
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))   # Сколько обновлений бот обрабатывает одновременно
+
+HISTORY_DB = os.getenv('HISTORY_DB', os.path.join(STATE_DIR, 'history.db'))  # Локальная история (импорт из файлов)
+ANALYTICS_DB = os.getenv('ANALYTICS_DB', os.path.join(STATE_DIR, 'analytics.db'))  # Аналитическое хранилище (зеркало данных)
+DATA_MAX_AGE_SECONDS = int(os.getenv('DATA_MAX_AGE_SECONDS', '300'))  # Насколько старые данные можно отдать по команде
+NAV_CACHE_SIZE = int(os.getenv('NAV_CACHE_SIZE', '32'))  # Готовых ответов навигации (кнопки) на один чат
+PARAMS_DB = os.getenv('PARAMS_DB', os.path.join(STATE_DIR, 'params.db'))  # История параметров управляющей таблицы
+CHANGELOG_DB = os.getenv('CHANGELOG_DB', os.path.join(STATE_DIR, 'changelog.db'))  # Хэши строк и журнал правок таблицы
+CHANGELOG_KEEP_DAYS = int(os.getenv('CHANGELOG_KEEP_DAYS', '90'))  # Сколько дней хранить журнал правок
+CLOSED_MONTH_ALERTS = os.getenv('CLOSED_MONTH_ALERTS', '') == '1'  # Оповещать о правках в закрытых месяцах
+
+DRIVE_FOLDER_ID = os.getenv('DRIVE_FOLDER_ID', '')  # Папка Drive с выгрузками кассы (пусто — импорт выключен)
+DRIVE_READ_SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]  # Чтение содержимого файлов Drive
+DRIVE_POLL_SECONDS = int(os.getenv('DRIVE_POLL_SECONDS', '600'))  # Как часто проверять папку
+DRIVE_DOWNLOAD_CONCURRENCY = int(os.getenv('DRIVE_DOWNLOAD_CONCURRENCY', '3'))  # Одновременных скачиваний
+DRIVE_CHUNK_SIZE = int(os.getenv('DRIVE_CHUNK_SIZE', str(4 * 1024 * 1024)))  # Размер куска при скачивании, байт
+
+TIMEZONE = os.getenv('TIMEZONE', 'Europe/Kaliningrad')  # Часовой пояс расписаний (отчёт в 9:30, подписки)
+ACCESS_FILE = os.getenv('ACCESS_FILE', os.path.join(STATE_DIR, 'access.json'))  # Допущенные чаты, роли и квоты
+SEND_RATE_PER_SECOND = float(os.getenv('SEND_RATE_PER_SECOND', '20'))  # Сообщений в секунду при рассылке (лимит Telegram ~30)
+SEND_CONCURRENCY = int(os.getenv('SEND_CONCURRENCY', '4'))  # Одновременных отправок при рассылке
+
+BOT_MODE = os.getenv('BOT_MODE', 'polling')            # polling или webhook
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')             # Публичный адрес бота (https://...), без пути
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')  # Интерфейс HTTP-сервера
+WEBHOOK_PORT = int(os.getenv('PORT', os.getenv('WEBHOOK_PORT', '8443')))  # Порт (PORT задают хостинги)
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')   # Путь, на который Telegram шлёт обновления
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')       # Секретный токен, обязателен для webhook: запросы без него отклоняются
+RECORD_UPDATES_FILE = os.getenv('RECORD_UPDATES_FILE', '')  # Куда записывать входящие обновления для replay
 
 ##import os                         # Для работы с переменными окружения
 ##from dotenv import load_dotenv    # Для загрузки .env файла
@@ -0,0 +1,34 @@
+# coordinator.py
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoordinator:
+    """
+    Координатор запросов перед обработчиками команд: одинаковые команды,
+    пока выполняются, считаются один раз, а результат получают все ожидающие
+    (в том числе из разных чатов). Лимиты на чат — в access.py.
+    Вычисления идут в пуле потоков, чтобы не блокировать цикл событий бота.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+
+    async def run(self, key, func, *args):
+        """Выполняет func(*args) в потоке или присоединяется к уже идущему вычислению с тем же ключом."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            logger.info("Запрос %s присоединён к выполняющемуся", key)
+        # shield: отмена одного ожидающего не отменяет общий расчёт для остальных
+        return await asyncio.shield(task)
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
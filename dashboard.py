@@ -0,0 +1,232 @@
+# dashboard.py
+
+import os
+import sys
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import gspread
+from gspread.utils import rowcol_to_a1
+
+from config import (
+    STATE_DIR,
+    DASHBOARD_SHEET_ID,
+    DASHBOARD_SHEET_NAME,
+    DASHBOARD_DAYS,
+    DASHBOARD_MONTHS,
+)
+from utils import get_write_client, metric_columns, rank_managers
+from dataset import date_slice
+from store import get_store
+from forecast import pnl_trend, PNL_LINES
+from pnl import display_value
+from sync import register_sync_hook, get_data
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.path.join(STATE_DIR, "dashboard.json")
+
+_lock = threading.Lock()  # фоновая публикация и /dashboard не публикуют одновременно
+_pending = {"df": None, "running": False}  # последняя версия данных, ждущая фоновой публикации
+_pending_lock = threading.Lock()
+
+
+def _load_state():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, STATE_FILE)
+
+
+def _cell(value, digits=2):
+    """Значение ячейки: числа округлены, пропуски — пустая строка."""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return ""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = round(float(value), digits)
+        return int(value) if value.is_integer() else value
+    return str(value)
+
+
+def daily_rows(df, days=DASHBOARD_DAYS):
+    """Показатели по дням за последние days дней с данными — как в /analyze."""
+    rows = [[f"Дневные показатели (последние {days} дн.)"],
+            ["Дата", "Менеджер", "Выручка", "Бар", "Кухня", "Ср. чек", "Доставка", "Фудкост, %", "Скидка, %"]]
+    if df.empty or "Дата" not in df.columns:
+        return rows
+    last = df["Дата"].max()
+    part = date_slice(df, last - timedelta(days=days - 1), last)
+    metrics = metric_columns(part)
+    frame = pd.DataFrame({
+        "date": part["Дата"],
+        "manager": part["Менеджер"].astype(object) if "Менеджер" in part.columns else None,
+        **{key: metrics[key] for key in ("revenue", "bar", "kitchen", "avg_check", "delivery", "foodcost", "discount")},
+    })
+    grouped = frame.groupby("date", sort=True)
+    daily = grouped[["revenue", "bar", "kitchen", "delivery"]].sum()
+    daily["avg_check"] = grouped["avg_check"].mean()
+    daily["foodcost"] = display_value(grouped["foodcost"].mean(), "foodcost")
+    daily["discount"] = display_value(grouped["discount"].mean(), "discount")
+    daily["manager"] = grouped["manager"].first()
+    for date, row in daily.sort_index(ascending=False).iterrows():
+        rows.append([date.strftime("%Y-%m-%d"), _cell(row["manager"]), _cell(row["revenue"], 0),
+                     _cell(row["bar"], 0), _cell(row["kitchen"], 0), _cell(row["avg_check"], 0),
+                     _cell(row["delivery"], 0), _cell(row["foodcost"], 1), _cell(row["discount"], 1)])
+    return rows
+
+
+def pnl_rows(store, months=DASHBOARD_MONTHS):
+    """P&L по месяцам — те же строки, что в /forecast и /pnl (pnl.calculate)."""
+    rows = [[f"P&L по месяцам (последние {months})"], ["Месяц"] + [title for _, title in PNL_LINES]]
+    lines, _ = pnl_trend(months, store)
+    for month, line in lines.iterrows():
+        rows.append([month] + [_cell(line[key], 0) for key, _ in PNL_LINES])
+    return rows
+
+
+def manager_rows(store, now=None):
+    """Рейтинг менеджеров за текущий месяц — как в /managers."""
+    now = now or datetime.now()
+    start = now.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    rows = [[f"Рейтинг менеджеров за {start.strftime('%Y-%m')}"],
+            ["Менеджер", "Выручка", "Ср. чек", "Глубина", "Скидка, %", "Оценка"]]
+    stats = store.manager_stats(start, end).fillna(0)
+    if stats.empty:
+        return rows
+    for name, row in rank_managers(stats).iterrows():
+        rows.append([name, _cell(row["Общая выручка"], 0), _cell(row["Ср. чек общий"], 0), _cell(row["Глубина"], 1),
+                     _cell(display_value(row["Скидка общий, %"], "discount"), 1), _cell(row["Оценка"], 3)])
+    return rows
+
+
+def build_grid(df, store):
+    """Весь лист: разделы друг под другом через пустую строку."""
+    grid = []
+    for section in (daily_rows(df), pnl_rows(store), manager_rows(store)):
+        if grid:
+            grid.append([])
+        grid.extend(section)
+    return grid
+
+
+def changed_ranges(old, new, force=False):
+    """
+    Отличия нового листа от опубликованного: список (A1-диапазон, [[значения]]).
+    Подряд идущие изменённые ячейки строки — один диапазон; ячейки, которых
+    в новом листе нет, очищаются пустой строкой. force=True — записать все ячейки
+    обоих листов, даже совпадающие.
+    """
+    ranges = []
+    for r in range(max(len(old), len(new))):
+        old_row = old[r] if r < len(old) else []
+        new_row = new[r] if r < len(new) else []
+        width = max(len(old_row), len(new_row))
+        run_start, run = None, []
+        for c in range(width + 1):
+            value = new_row[c] if c < len(new_row) else ""
+            previous = old_row[c] if c < len(old_row) else ""
+            if c < width and (force or value != previous):
+                if run_start is None:
+                    run_start = c
+                run.append(value)
+            elif run_start is not None:
+                ranges.append((f"{rowcol_to_a1(r + 1, run_start + 1)}:{rowcol_to_a1(r + 1, run_start + len(run))}",
+                               [run]))
+                run_start, run = None, []
+    return ranges
+
+
+def _worksheet_range(a1):
+    return "'" + DASHBOARD_SHEET_NAME.replace("'", "''") + "'!" + a1
+
+
+def _ensure_worksheet(spreadsheet, grid):
+    try:
+        spreadsheet.worksheet(DASHBOARD_SHEET_NAME)
+    except gspread.exceptions.WorksheetNotFound:
+        spreadsheet.add_worksheet(DASHBOARD_SHEET_NAME, rows=max(len(grid) + 20, 100),
+                                  cols=max((len(row) for row in grid), default=10) + 2)
+
+
+def publish(df=None, full=False):
+    """
+    Публикует показатели на лист DASHBOARD_SHEET_NAME: один values:batchUpdate
+    только с изменившимися ячейками относительно последней публикации.
+    full=True — переписать все ячейки (если лист правили руками); прежние ячейки
+    за пределами нового листа очищаются. Возвращает число ячеек.
+    """
+    df = get_data() if df is None else df
+    grid = build_grid(df, get_store())
+    target = f"{DASHBOARD_SHEET_ID}/{DASHBOARD_SHEET_NAME}"
+    with _lock:
+        state = _load_state()
+        old = state.get("grid", []) if state.get("target") == target else []
+        ranges = changed_ranges(old, grid, force=full)
+        if not ranges:
+            return 0
+
+        spreadsheet = get_write_client().open_by_key(DASHBOARD_SHEET_ID)
+        if not old or full:
+            _ensure_worksheet(spreadsheet, grid)  # первая публикация: лист может ещё не существовать
+        spreadsheet.values_batch_update({
+            "valueInputOption": "RAW",
+            "data": [{"range": _worksheet_range(a1), "values": values} for a1, values in ranges],
+        })
+        _save_state({"target": target, "grid": grid})
+        return sum(len(values[0]) for _, values in ranges)
+
+
+def _publish_pending():
+    """Фоновый поток: публикует последнюю ждущую версию, пока такие появляются."""
+    while True:
+        with _pending_lock:
+            df = _pending["df"]
+            _pending["df"] = None
+            if df is None:
+                _pending["running"] = False
+                return
+        try:
+            cells = publish(df)
+            if cells:
+                logger.info("Dashboard: обновлено ячеек %s", cells)
+        except Exception as e:
+            logger.exception("Не удалось опубликовать Dashboard: %s", e)
+
+
+@register_sync_hook
+def _publish_on_sync(df, version):
+    """
+    Запись в Sheets — в фоновом потоке: синхронизацию ждут команды пользователей.
+    Пока идёт публикация, новые версии не копятся — публикуется последняя.
+    """
+    if not DASHBOARD_SHEET_ID:
+        return
+    if df.attrs.get("fallback_age"):
+        return  # данные из резервной копии — не перезаписываем ими лист
+    with _pending_lock:
+        _pending["df"] = df
+        if _pending["running"]:
+            return
+        _pending["running"] = True
+    threading.Thread(target=_publish_pending, name="dashboard-publish", daemon=True).start()
+
+
+if __name__ == "__main__":
+    if not DASHBOARD_SHEET_ID:
+        print("Задайте DASHBOARD_SHEET_ID в .env")
+        sys.exit(1)
+    cells = publish(full="--full" in sys.argv)  # изменения могла успеть опубликовать и фоновая публикация после загрузки
+    print(f"✅ Обновлено ячеек: {cells}")
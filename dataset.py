@@ -0,0 +1,97 @@
+# dataset.py
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+from utils import to_percent_number
+
+# Колонки-проценты, которые приходят из таблицы строками ('24,5%') — разбираются один раз
+PERCENT_COLUMNS = ["Фудкост общий, %"]
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def _downcast(series):
+    """int32, если все значения целые и помещаются; float32, если значения представимы точно; иначе как есть."""
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    present = ~np.isnan(values)
+    if present.all() and len(values) and np.array_equal(values, np.round(values)) \
+            and values.min() >= INT32_MIN and values.max() <= INT32_MAX:
+        return series.astype("int32")
+    if np.array_equal(values[present].astype(np.float32).astype(np.float64), values[present]):
+        return series.astype("float32")
+    return series
+
+
+def compact(df):
+    """
+    Компактный вид очищенного набора данных (после clean_data / merge_with_history):
+    - 'Менеджер' — категория (коды вместо строк);
+    - процентные строки разобраны в числа один раз;
+    - числа сжаты до int32/float32 только там, где это без потерь;
+    - строки отсортированы по дате, так что выборка периода — срез позиций, а не маска.
+    Расчёты получают float64 через utils.metric_columns.
+    """
+    if df.empty or "Дата" not in df.columns:
+        return df
+    attrs = dict(df.attrs)
+    df = df.sort_values("Дата", kind="stable", ignore_index=True)
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col == "Дата":
+            columns[col] = series
+        elif col == "Менеджер":
+            columns[col] = series.astype("category")
+        elif col in PERCENT_COLUMNS:
+            columns[col] = _downcast(to_percent_number(series))
+        elif pd.api.types.is_numeric_dtype(series):
+            columns[col] = _downcast(series)
+        else:
+            columns[col] = series
+    result = pd.DataFrame(columns)
+    result.attrs = attrs
+    return result
+
+
+def date_bounds(df, start, end):
+    """Позиции [lo, hi) строк за [start, end] в кадре, отсортированном по дате (см. compact)."""
+    dates = df["Дата"].to_numpy(dtype="datetime64[ns]")
+    lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left")
+    hi = np.searchsorted(dates, np.datetime64(pd.Timestamp(end) + timedelta(days=1)), side="left")
+    return int(lo), int(hi)
+
+
+def date_slice(df, start, end):
+    """Строки за период срезом по позициям — без булевой маски и копии кадра."""
+    lo, hi = date_bounds(df, start, end)
+    return df.iloc[lo:hi]
+
+
+def memory_report(before, after):
+    """Байты по колонкам до и после сжатия (с учётом строк: deep=True)."""
+    usage_before = before.memory_usage(deep=True, index=False)
+    usage_after = after.memory_usage(deep=True, index=False)
+
+    def size(value):
+        return f"{value:,}".replace(",", " ")
+
+    lines = [f"{'Колонка':<28}{'Тип до':>10}{'Тип после':>12}{'Байт до':>12}{'Байт после':>12}"]
+    for col in before.columns:
+        lines.append(
+            f"{col[:27]:<28}{str(before[col].dtype):>10}{str(after[col].dtype):>12}"
+            f"{size(usage_before[col]):>12}{size(usage_after[col]):>12}"
+        )
+    total_before, total_after = usage_before.sum(), usage_after.sum()
+    lines.append(f"{'Итого':<50}{size(total_before):>12}{size(total_after):>12}")
+    if total_before:
+        lines.append(f"Экономия: {(1 - total_after / total_before) * 100:.1f}%")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from utils import read_data
+    from history import merge_with_history
+
+    raw = merge_with_history(read_data())
+    print(memory_report(raw, compact(raw)))
@@ -0,0 +1,203 @@
+# drive_ingest.py
+
+import os
+import sys
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+
+from config import (
+    SERVICE_ACCOUNT_FILE,
+    STATE_DIR,
+    DRIVE_FOLDER_ID,
+    DRIVE_READ_SCOPES,
+    DRIVE_DOWNLOAD_CONCURRENCY,
+    DRIVE_CHUNK_SIZE,
+)
+from importer import import_file
+from sync import sync
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.path.join(STATE_DIR, "drive_ingest.json")
+PAGE_SIZE = 1000  # Максимум, который отдаёт Drive API за страницу
+
+# Какие файлы забираем: расширение по имени или «родная» таблица Google (выгружается в xlsx)
+SUPPORTED_EXTENSIONS = (".xlsx", ".xlsm", ".csv")
+GOOGLE_SHEET_MIME = "application/vnd.google-apps.spreadsheet"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FILE_FIELDS = "id, name, mimeType, parents, modifiedTime, md5Checksum, trashed"
+
+# httplib2 внутри клиента Drive не потокобезопасен — у каждого потока свой клиент
+_local = threading.local()
+
+
+def _get_service():
+    if getattr(_local, "service", None) is None:
+        creds = service_account.Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE, scopes=DRIVE_READ_SCOPES)
+        _local.service = build("drive", "v3", credentials=creds, cache_discovery=False)
+    return _local.service
+
+
+def _load_state():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, STATE_FILE)
+
+
+def _is_supported(file):
+    return file.get("mimeType") == GOOGLE_SHEET_MIME or file.get("name", "").lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def _version(file):
+    """Отпечаток содержимого: md5 (обычные файлы) или время изменения (таблицы Google)."""
+    return file.get("md5Checksum") or file.get("modifiedTime")
+
+
+def list_folder(folder_id, service=None):
+    """Все файлы папки — постранично, пока есть nextPageToken."""
+    service = service or _get_service()
+    files, page_token = [], None
+    while True:
+        response = service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            pageSize=PAGE_SIZE,
+            pageToken=page_token,
+            fields=f"nextPageToken, files({FILE_FIELDS})",
+        ).execute()
+        files.extend(response.get("files", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def list_changes(page_token, service=None):
+    """
+    Изменения с курсора page_token (changes.list постранично).
+    Возвращает (изменённые файлы, новый курсор).
+    """
+    service = service or _get_service()
+    files = []
+    while True:
+        response = service.changes().list(
+            pageToken=page_token,
+            pageSize=PAGE_SIZE,
+            spaces="drive",
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))",
+        ).execute()
+        for change in response.get("changes", []):
+            if not change.get("removed") and change.get("file"):
+                files.append(change["file"])
+        if "newStartPageToken" in response:
+            return files, response["newStartPageToken"]
+        page_token = response["nextPageToken"]
+
+
+def download(file):
+    """Скачивает файл кусками DRIVE_CHUNK_SIZE во временный файл; возвращает путь."""
+    service = _get_service()
+    if file["mimeType"] == GOOGLE_SHEET_MIME:
+        request = service.files().export_media(fileId=file["id"], mimeType=XLSX_MIME)
+        suffix = ".xlsx"
+    else:
+        request = service.files().get_media(fileId=file["id"])
+        suffix = os.path.splitext(file["name"])[1].lower()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            downloader = MediaIoBaseDownload(f, request, chunksize=DRIVE_CHUNK_SIZE)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _ingest_one(file):
+    path = download(file)
+    try:
+        return import_file(path)
+    finally:
+        os.remove(path)
+
+
+def ingest(folder_id=DRIVE_FOLDER_ID):
+    """
+    Забирает из папки новые и изменённые файлы и импортирует их в историю.
+    Первый запуск — полный обход папки, дальше — только изменения с курсора.
+    Курсор сдвигается, только если все файлы обработаны; повторно скачанные
+    файлы с тем же отпечатком пропускаются. Возвращает {имя файла: строк}.
+    """
+    state = _load_state()
+    if state.get("folder_id") != folder_id:
+        state = {"folder_id": folder_id, "files": {}}
+    service = _get_service()
+    if state.get("page_token"):
+        candidates, new_token = list_changes(state["page_token"], service)
+    else:
+        # Курсор берём до обхода: изменения во время обхода придут в следующий раз
+        new_token = service.changes().getStartPageToken().execute()["startPageToken"]
+        candidates = list_folder(folder_id, service)
+
+    known = state["files"]
+    pending = {}
+    for file in candidates:
+        # Без parents приходят и файлы, открытые сервисному аккаунту вне папки (рабочие таблицы) — их не берём
+        if (folder_id in file.get("parents", []) and not file.get("trashed")
+                and _is_supported(file) and known.get(file["id"]) != _version(file)):
+            pending[file["id"]] = file
+
+    results, failed = {}, False
+    with ThreadPoolExecutor(max_workers=DRIVE_DOWNLOAD_CONCURRENCY) as pool:
+        futures = {pool.submit(_ingest_one, file): file for file in pending.values()}
+        for future, file in futures.items():
+            try:
+                results[file["name"]] = future.result()
+                known[file["id"]] = _version(file)
+            except Exception as e:
+                failed = True
+                logger.exception("Не удалось импортировать %s из Drive: %s", file["name"], e)
+
+    if not failed:
+        state["page_token"] = new_token
+    _save_state(state)
+    if any(results.values()):
+        sync()  # новые строки истории сразу попадают в общий набор данных
+    return results
+
+
+def ingest_job():
+    """Задача для планировщика: ошибки логируются, а не роняют планировщик."""
+    try:
+        results = ingest()
+        if results:
+            logger.info("Импорт из Drive: %s", results)
+    except Exception as e:
+        logger.exception("Ошибка импорта из Drive: %s", e)
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else DRIVE_FOLDER_ID
+    if not folder:
+        print("Использование: python drive_ingest.py ID_папки (или DRIVE_FOLDER_ID в .env)")
+        sys.exit(1)
+    for name, count in ingest(folder).items():
+        print(f"✅ {name}: импортировано строк {count}")
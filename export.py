@@ -0,0 +1,136 @@
+# export.py
+
+import os
+import csv
+import tempfile
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from forecast import pnl_values, PNL_LINES
+from period import parse_period, get_prefix_sums, range_stats, month_fraction
+from sync import get_data
+from config import DATA_MAX_AGE_SECONDS
+from dataset import date_bounds
+
+EXPORT_CHUNK_ROWS = 1000  # Сколько строк набора данных берётся из кадра за один шаг
+
+
+def _temp_path(suffix):
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def _row_positions(df, start, end):
+    """Номера строк за [start, end] в порядке дат — без копирования самого кадра."""
+    if df["Дата"].is_monotonic_increasing:
+        # Кадр из sync уже отсортирован по дате (dataset.compact) — достаточно границ
+        return np.arange(*date_bounds(df, start, end))
+    dates = df["Дата"].to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(dates, kind="stable")
+    sorted_dates = dates[order]
+    lo = np.searchsorted(sorted_dates, np.datetime64(pd.Timestamp(start)), side="left")
+    hi = np.searchsorted(sorted_dates, np.datetime64(pd.Timestamp(end) + timedelta(days=1)), side="left")
+    return order[lo:hi]
+
+
+def _cell(value):
+    """Значение ячейки: даты — как date, пропуски — пустые."""
+    if isinstance(value, pd.Timestamp):
+        return value.date()
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def iter_dataset_rows(df, positions):
+    """Строки набора данных кусками по EXPORT_CHUNK_ROWS: в памяти только текущий кусок."""
+    for chunk_start in range(0, len(positions), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[positions[chunk_start:chunk_start + EXPORT_CHUNK_ROWS]]
+        for row in chunk.itertuples(index=False, name=None):
+            yield [_cell(value) for value in row]
+
+
+def _month_ranges(start, end):
+    current = start
+    while current <= end:
+        next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(next_month - timedelta(days=1), end)
+        yield current, last
+        current = next_month
+
+
+def iter_pnl_rows(start, end):
+    """Помесячные строки P&L (итоги месяца — по префиксным суммам)."""
+    prefix = get_prefix_sums()
+    for month_start, month_end in _month_ranges(start, end):
+        stats = range_stats(prefix, month_start, month_end)
+        if stats["rows"] == 0:
+            continue
+        totals = {key: stats[key] for key in ("revenue", "salary", "foodcost", "delivery")}
+        values = pnl_values(totals, fixed_scale=month_fraction(month_start, month_end), as_of=month_end)
+        yield [month_start.strftime("%Y-%m")] + [_cell(round(values[key], 2)) for key, _ in PNL_LINES]
+
+
+def _write_xlsx(path, df, positions, start, end):
+    # write_only: строки сразу уходят в файл, книга не держится в памяти целиком
+    wb = Workbook(write_only=True)
+    data_sheet = wb.create_sheet("Данные")
+    data_sheet.append(list(df.columns))
+    for row in iter_dataset_rows(df, positions):
+        data_sheet.append(row)
+    pnl_sheet = wb.create_sheet("P&L")
+    pnl_sheet.append(["Месяц"] + [title for _, title in PNL_LINES])
+    for row in iter_pnl_rows(start, end):
+        pnl_sheet.append(row)
+    wb.save(path)
+
+
+def _write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def export_files(args):
+    """
+    Выгрузка за период: аргументы как у /period, последний аргумент 'csv' или 'xlsx' (по умолчанию).
+    Возвращает список (путь к временному файлу, имя для пользователя); файлы удаляет вызывающий.
+    """
+    args = list(args)
+    fmt = "xlsx"
+    if args and args[-1].lower() in ("csv", "xlsx"):
+        fmt = args.pop().lower()
+    start, end = parse_period(args)
+    df = get_data(DATA_MAX_AGE_SECONDS)
+    positions = _row_positions(df, start, end) if not df.empty else np.array([], dtype=int)
+    name = f"export_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
+
+    # Файл попадает в список сразу после создания: при ошибке записи удаляются все созданные
+    files = []
+    try:
+        if fmt == "xlsx":
+            files.append((_temp_path(".xlsx"), f"{name}.xlsx"))
+            _write_xlsx(files[-1][0], df, positions, start, end)
+        else:
+            files.append((_temp_path(".csv"), f"{name}.csv"))
+            _write_csv(files[-1][0], list(df.columns), iter_dataset_rows(df, positions))
+            files.append((_temp_path(".csv"), f"{name}_pnl.csv"))
+            _write_csv(files[-1][0], ["Месяц"] + [title for _, title in PNL_LINES], iter_pnl_rows(start, end))
+    except Exception:
+        remove_files(files)
+        raise
+    return files
+
+
+def remove_files(files):
+    for path, _ in files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
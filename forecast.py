@@ -1,23 +1,31 @@
+import os
 from datetime import datetime, timedelta
 import calendar
 import pandas as pd
-from utils import get_management_percent, get_management_value, format_ruble
+from utils import format_ruble
+from pnl import calculate
+from store import get_store
+from params_history import effective_lookup
 
 def get_manager_bonus_line(profit_after_usn, format_ruble):
     # Место для вашей логики по бонусу, если нужно
     return ""
 
-def forecast(df):
+def _month_bounds(year, month):
+    return datetime(year, month, 1), datetime(year, month, calendar.monthrange(year, month)[1])
+
+def forecast(store=None):
     """Прогноз по текущему месяцу: учитывает все основные затраты и прибыль."""
+    store = store or get_store()
     now = datetime.now()
     # Только строки за текущий месяц и год
-    current_month_df = df[(df["Дата"].dt.year == now.year) & (df["Дата"].dt.month == now.month)]
-    if current_month_df.empty:
+    totals = store.period_totals(*_month_bounds(now.year, now.month))
+    if not totals["rows"]:
         return "⚠️ Нет данных за текущий месяц."
 
-    return _forecast_core(current_month_df, now.year, now.month, period_label=f"Прогноз на {now.strftime('%B %Y')}")
+    return pnl_report(totals, period_label=f"Прогноз на {now.strftime('%B %Y')}")
 
-def forecast_for_period(df, period='current'):
+def forecast_for_period(period='current', store=None):
     """Прогноз по выбранному месяцу: period='current' или 'previous'."""
     today = datetime.now()
     if period == 'current':
@@ -31,164 +39,180 @@ def forecast_for_period(df, period='current'):
     else:
         return "❌ Некорректный период. Используйте 'current' или 'previous'."
 
-    period_df = df[(df["Дата"].dt.year == year) & (df["Дата"].dt.month == month)]
-    if period_df.empty:
+    report = _month_report(year, month, store or get_store())
+    if report is None:
         period_text = "текущий" if period == "current" else "прошлый"
         return f"⚠️ Нет данных за {period_text} месяц."
-    
-    label = f"Итоги за {datetime(year, month, 1).strftime('%B %Y')}"
-    return _forecast_core(period_df, year, month, period_label=label)
-
-def _forecast_core(df_period, year, month, period_label="Прогноз"):
-    # Суммарная выручка
-    total_revenue_series = df_period["Выручка бар"] + df_period["Выручка кухня"]
-    salary_series = df_period["Начислено"]
-
-    avg_daily_revenue = total_revenue_series.mean()
-    avg_daily_salary = salary_series.mean()
-    days_in_month = calendar.monthrange(year, month)[1]
-
-    # Для текущего месяца — прогноз, для завершенного — сумма (переиспользуем ядро)
-    # Здесь — итог за период (месяц)
-    total_revenue = total_revenue_series.sum()
-
-    fixed_salaries = get_management_value("ЗП упр", "Сумма")
-    salary_msg = ""
-    if fixed_salaries is None:
-        fixed_salaries = 0
-        salary_msg = "❗ Не удалось получить фикс. зарплату из управляющей таблицы.\n"
-    total_salary = salary_series.sum() + fixed_salaries
-    labor_cost_share = (total_salary / total_revenue * 100) if total_revenue else 0
-
-    franchise_percent = get_management_percent("Франшиза")
-    if franchise_percent is None:
-        fc_msg = "❗ Не удалось получить процент по франшизе.\n"
-        franchise_expense = 0
-    else:
-        franchise_expense = total_revenue * (franchise_percent / 100)
-        fc_msg = ""
-
-    writeoff_percent = get_management_percent("Процент списания")
-    wo_msg = ""
-    if writeoff_percent is None:
-        wo_msg = "❗ Не удалось получить процент списания.\n"
-        writeoff_expense = 0
-    else:
-        writeoff_expense = total_revenue * (writeoff_percent / 1000)
-
-    hozy_percent = get_management_percent("Процент хозы")
-    if hozy_percent is None:
-        hozy_percent = get_management_percent("Хозы")
-    hozy_msg = ""
-    if hozy_percent is None:
-        hozy_msg = "❗ Не удалось получить процент хозрасходов.\n"
-        hozy_expense = 0
-    else:
-        hozy_expense = total_revenue * (hozy_percent / 100)
-
-    foodcost_month_raw = df_period["Фудкост общий, %"]
-    foodcost_month_nums = pd.to_numeric(foodcost_month_raw, errors="coerce")
-    foodcost_month = foodcost_month_nums.mean()
-    foodcost_expense = total_revenue * (foodcost_month / 1000)
-
-    delivery_col_candidates = [col for col in df_period.columns if "достав" in col.lower()]
-    if delivery_col_candidates:
-        delivery_col = delivery_col_candidates[0]
-    else:
-        return "Столбец доставки не найден!"
-    delivery_series = df_period[delivery_col]
-    total_delivery = delivery_series.sum()
-    delivery_percent = get_management_percent("Процент доставка")
-    if delivery_percent is not None and delivery_percent > 100:
-        delivery_percent = delivery_percent / 100
-    if delivery_percent is None:
-        delivery_msg = "❗ Не удалось получить процент по доставке.\n"
-        delivery_expense = 0
-    else:
-        delivery_expense = total_delivery * (delivery_percent / 100)
-        delivery_msg = ""
-
-    acquiring_percent = get_management_percent("Эквайринг")
-    if acquiring_percent is not None and acquiring_percent > 100:
-        acquiring_percent = acquiring_percent / 1000
-    if acquiring_percent is None:
-        acquiring_msg = "❗ Не удалось получить процент эквайринга.\n"
-        acquiring_expense = 0
-    else:
-        acquiring_expense = total_revenue * (acquiring_percent / 1000)
-        acquiring_msg = ""
-
-    bank_commission_percent = get_management_percent("Комиссия Банка")
-    if bank_commission_percent is not None and bank_commission_percent > 100:
-        bank_commission_percent = bank_commission_percent / 1000
-    if bank_commission_percent is None:
-        bank_commission_msg = "❗ Не удалось получить процент комиссии банка.\n"
-        bank_commission_expense = 0
-    else:
-        bank_commission_expense = total_revenue * (bank_commission_percent / 1000)
-        bank_commission_msg = ""
-
-    permanent_costs = get_management_value("Постоянные", "Сумма")
-    if permanent_costs is None:
-        permanent_costs = 0
-        permanent_msg = "❗ Не удалось получить значение постоянных расходов.\n"
-    else:
-        permanent_msg = ""
-
-    salary_tax_percent = get_management_percent("Налоги ЗП")
-    if salary_tax_percent is not None:
-        salary_tax = total_salary * (salary_tax_percent / 100)
-        salary_tax_msg = ""
-    else:
-        salary_tax = 0
-        salary_tax_msg = "❗ Не удалось получить процент по налогам ЗП.\n"
-
-    var_expense_share = (franchise_expense / total_revenue * 100) if total_revenue else 0
-    wo_share = (writeoff_expense / total_revenue * 100) if total_revenue else 0
-    hozy_share = (hozy_expense / total_revenue * 100) if total_revenue else 0
-
-    total_costs = (
-        total_salary
-        + foodcost_expense
-        + franchise_expense
-        + writeoff_expense
-        + hozy_expense
-        + delivery_expense
-        + acquiring_expense
-        + bank_commission_expense
-        + permanent_costs
-        + salary_tax
+    return report
+
+def forecast_for_month(year, month, store=None):
+    """Итоги произвольного месяца (для навигации по месяцам)."""
+    report = _month_report(year, month, store or get_store())
+    if report is None:
+        return f"⚠️ Нет данных за {datetime(year, month, 1).strftime('%B %Y')}."
+    return report
+
+def _month_report(year, month, store):
+    start, end = _month_bounds(year, month)
+    totals = store.period_totals(start, end)
+    if not totals["rows"]:
+        return None
+    label = f"Итоги за {start.strftime('%B %Y')}"
+    # Прошедший месяц считаем по ставкам, действовавшим в конце того месяца
+    as_of = end if end < datetime.now().replace(day=1) else None
+    return pnl_report(totals, period_label=label, as_of=as_of)
+
+def pnl_trend(months=12, store=None):
+    """
+    P&L за последние months месяцев: один GROUP BY по данным и параметры управляющей таблицы,
+    действовавшие на конец каждого месяца (для текущего — на сегодня).
+    """
+    store = store or get_store()
+    now = datetime.now()
+    first = now.replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    totals = store.monthly_totals(first, _month_bounds(now.year, now.month)[1])
+    if totals.empty:
+        return totals, ""
+    as_of = [min(_month_bounds(int(month[:4]), int(month[5:7]))[1], now) for month in totals.index]
+    return calculate(totals, lookup=effective_lookup(as_of, index=totals.index))
+
+def pnl_trend_report(months=12, store=None):
+    """Компактная таблица P&L по месяцам (суммы в тысячах рублей)."""
+    lines, warnings = pnl_trend(months, store)
+    if lines.empty:
+        return "⚠️ Нет данных за выбранные месяцы."
+
+    def thousands(value):
+        return "—" if pd.isna(value) else f"{value / 1000:,.0f}к".replace(",", " ")
+
+    rows = [f"📅 P&L за {len(lines)} мес. (тыс. ₽)\n", "Месяц | Выручка | LC | ФК | Прибыль | После УСН"]
+    for month, row in lines.iterrows():
+        rows.append(
+            f"{month} | {thousands(row['revenue'])} | {row['salary_share']:.1f}% | "
+            f"{row['foodcost_percent']:.1f}% | {thousands(row['profit'])} | {thousands(row['profit_after_usn'])}"
+        )
+    rows.append(
+        f"Итого | {thousands(lines['revenue'].sum())} | | | "
+        f"{thousands(lines['profit'].sum())} | {thousands(lines['profit_after_usn'].sum())}"
     )
-
-    profit = total_revenue - total_costs
-
-    usn_percent = get_management_percent("УСН")
-    if usn_percent is not None:
-        usn_expense = profit * (usn_percent / 100)
-        usn_msg = ""
-    else:
-        usn_expense = 0
-        usn_msg = "❗ Не удалось получить процент УСН.\n"
-
-    profit_after_usn = profit - usn_expense
-    bonus_line = get_manager_bonus_line(profit_after_usn, format_ruble)
-
+    text = "\n".join(rows)
+    return f"{text}\n\n{warnings}" if warnings else text
+
+def pnl_trend_chart(months=12, store=None, path=None):
+    """
+    График выручки и прибыли по месяцам; возвращает путь к PNG (по умолчанию — временный файл)
+    или None, если за месяцы нет данных.
+    """
+    lines, _ = pnl_trend(months, store)
+    if lines.empty:
+        return None
+
+    import tempfile
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.bar(lines.index, lines["revenue"] / 1000, label="Выручка", color="#9ecae1")
+    ax.plot(lines.index, lines["profit_after_usn"] / 1000, label="Прибыль после УСН", color="#d62728", marker="o")
+    ax.set_ylabel("тыс. ₽")
+    ax.set_title(f"P&L за {len(lines)} мес.")
+    ax.legend()
+    ax.tick_params(axis="x", rotation=45)
+    fig.tight_layout()
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+def pnl_values(totals, fixed_scale=1.0, as_of=None):
+    """
+    P&L по готовым итогам периода: revenue, salary, delivery — суммы,
+    foodcost — средний фудкост строк. fixed_scale — доля месяца для постоянных расходов.
+    as_of — дата, на которую брать параметры из истории (None — текущий снимок таблицы).
+    Возвращает словарь со строками P&L, процентами и предупреждениями.
+    """
+    frame = pd.DataFrame([{key: totals[key] for key in ("revenue", "salary", "foodcost", "delivery")}])
+    lookup = effective_lookup([as_of], index=frame.index) if as_of is not None else None
+    lines, warnings = calculate(frame, lookup=lookup, fixed_scale=fixed_scale)
+    row = lines.iloc[0]
+
+    def percent(key):
+        value = row[f"{key}_percent"]
+        return None if value is None or pd.isna(value) else value
+
+    return {
+        "revenue": row["revenue"],
+        "salary": row["salary"],
+        "labor_cost_share": row["salary_share"],
+        "foodcost": row["foodcost"],
+        "foodcost_percent": row["foodcost_percent"],
+        "franchise": row["franchise"],
+        "franchise_share": row["franchise_share"],
+        "writeoff": row["writeoff"],
+        "writeoff_share": row["writeoff_share"],
+        "hozy": row["hozy"],
+        "hozy_share": row["hozy_share"],
+        "delivery": row["delivery"],
+        "delivery_percent": percent("delivery"),
+        "acquiring": row["acquiring"],
+        "acquiring_percent": percent("acquiring"),
+        "bank_commission": row["bank_commission"],
+        "bank_commission_percent": percent("bank_commission"),
+        "salary_tax": row["salary_tax"],
+        "salary_tax_percent": percent("salary_tax"),
+        "permanent": row["permanent"],
+        "profit": row["profit"],
+        "usn": row["usn"],
+        "usn_percent": percent("usn"),
+        "profit_after_usn": row["profit_after_usn"],
+        "warnings": warnings,
+    }
+
+# Строки P&L для выгрузок: (ключ в pnl_values, заголовок)
+PNL_LINES = [
+    ("revenue", "Выручка"),
+    ("salary", "ЗП"),
+    ("foodcost", "Фудкост"),
+    ("franchise", "Франшиза"),
+    ("writeoff", "Списание"),
+    ("hozy", "Хозы"),
+    ("delivery", "Доставка"),
+    ("acquiring", "Эквайринг"),
+    ("bank_commission", "Комиссия банка"),
+    ("salary_tax", "Налоги на ЗП"),
+    ("permanent", "Постоянные"),
+    ("profit", "Прибыль"),
+    ("usn", "УСН"),
+    ("profit_after_usn", "Прибыль после УСН"),
+]
+
+def _pct(value):
+    return f"{value:g}" if value is not None else '-'
+
+def pnl_report(totals, period_label="Прогноз", fixed_scale=1.0, as_of=None):
+    v = pnl_values(totals, fixed_scale, as_of)
+    bonus_line = get_manager_bonus_line(v["profit_after_usn"], format_ruble)
     return (
         f"📅 {period_label}:\n"
-        f"📊 Выручка: {format_ruble(total_revenue)}\n"
-        f"🪑 ЗП: {format_ruble(total_salary)} (LC: {labor_cost_share:.1f}%)\n"
-        f"🍔 Фудкост: {format_ruble(foodcost_expense)} ({foodcost_month/10:.1f}%)\n"
-        f"💼 Франшиза: {format_ruble(franchise_expense)} ({var_expense_share:.1f}%)\n"
-        f"📉 Списание: {format_ruble(writeoff_expense)} ({wo_share:.1f}%)\n"
-        f"🧹 Хозы: {format_ruble(hozy_expense)} ({hozy_share:.1f}%)\n"
-        f"🚚 Доставка: {format_ruble(delivery_expense)} ({delivery_percent if delivery_percent is not None else '-' }%)\n"
-        f"🏦 Эквайринг: {format_ruble(acquiring_expense)} ({acquiring_percent/10 if acquiring_percent is not None else '-'}%)\n"
-        f"💳 Комиссия банка: {format_ruble(bank_commission_expense)} ({bank_commission_percent/10 if bank_commission_percent is not None else '-'}%)\n"
-        f"🧾 Налоги на ЗП: {format_ruble(salary_tax)} ({salary_tax_percent if salary_tax_percent is not None else '-'}%)\n"
-        f"🧱 Постоянные: {format_ruble(permanent_costs)}\n"
-        f"💰 Прибыль: {format_ruble(profit)}\n"
-        f"🏛 УСН: {format_ruble(usn_expense)} ({usn_percent if usn_percent is not None else '-'}%)\n"
-        f"💵 Прибыль после УСН: {format_ruble(profit_after_usn)}\n"
+        f"📊 Выручка: {format_ruble(v['revenue'])}\n"
+        f"🪑 ЗП: {format_ruble(v['salary'])} (LC: {v['labor_cost_share']:.1f}%)\n"
+        f"🍔 Фудкост: {format_ruble(v['foodcost'])} ({v['foodcost_percent']:.1f}%)\n"
+        f"💼 Франшиза: {format_ruble(v['franchise'])} ({v['franchise_share']:.1f}%)\n"
+        f"📉 Списание: {format_ruble(v['writeoff'])} ({v['writeoff_share']:.1f}%)\n"
+        f"🧹 Хозы: {format_ruble(v['hozy'])} ({v['hozy_share']:.1f}%)\n"
+        f"🚚 Доставка: {format_ruble(v['delivery'])} ({_pct(v['delivery_percent'])}%)\n"
+        f"🏦 Эквайринг: {format_ruble(v['acquiring'])} ({_pct(v['acquiring_percent'])}%)\n"
+        f"💳 Комиссия банка: {format_ruble(v['bank_commission'])} ({_pct(v['bank_commission_percent'])}%)\n"
+        f"🧾 Налоги на ЗП: {format_ruble(v['salary_tax'])} ({_pct(v['salary_tax_percent'])}%)\n"
+        f"🧱 Постоянные: {format_ruble(v['permanent'])}\n"
+        f"💰 Прибыль: {format_ruble(v['profit'])}\n"
+        f"🏛 УСН: {format_ruble(v['usn'])} ({_pct(v['usn_percent'])}%)\n"
+        f"💵 Прибыль после УСН: {format_ruble(v['profit_after_usn'])}\n"
         f"{bonus_line}\n"
-        f"{fc_msg}{wo_msg}{hozy_msg}{salary_msg}{delivery_msg}{acquiring_msg}{bank_commission_msg}{permanent_msg}{salary_tax_msg}{usn_msg}"
+        f"{v['warnings']}"
     )
@@ -0,0 +1,96 @@
+# history.py
+
+import os
+import json
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+from config import HISTORY_DB
+
+_cache = {"mtime": None, "df": None}
+_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB)
+    # Ключ (дата, менеджер) — он же индекс по дате для выборок периода
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS history ("
+        " date TEXT NOT NULL,"
+        " manager TEXT NOT NULL,"
+        " data TEXT NOT NULL,"
+        " PRIMARY KEY (date, manager))"
+    )
+    return conn
+
+
+def _json_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def row_keys(df):
+    """Ключ строки 'ГГГГ-ММ-ДД|Менеджер' — по нему история и таблица не дублируются."""
+    manager = df["Менеджер"].fillna("").astype(str).str.strip() if "Менеджер" in df.columns else ""
+    return df["Дата"].dt.strftime("%Y-%m-%d") + "|" + manager
+
+
+def append_rows(df):
+    """
+    Добавляет очищенные строки (как после read_data) в историю.
+    Повтор той же даты и менеджера заменяет прежнюю запись. Возвращает число строк.
+    """
+    if df.empty:
+        return 0
+    columns = list(df.columns)
+    keys = row_keys(df)
+    rows = []
+    for key, values in zip(keys, df.itertuples(index=False, name=None)):
+        date, manager = key.split("|", 1)
+        record = {col: _json_value(value) for col, value in zip(columns, values)}
+        rows.append((date, manager, json.dumps(record, ensure_ascii=False)))
+    with _lock, _connect() as conn:
+        conn.executemany(
+            "INSERT INTO history (date, manager, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(date, manager) DO UPDATE SET data = excluded.data",
+            rows,
+        )
+    return len(rows)
+
+
+def load_history():
+    """История целиком как DataFrame; перечитывается, только если файл базы изменился."""
+    if not os.path.exists(HISTORY_DB):
+        return pd.DataFrame()
+    mtime = os.path.getmtime(HISTORY_DB)
+    with _lock:
+        if _cache["mtime"] == mtime:
+            return _cache["df"]
+        with _connect() as conn:
+            records = [json.loads(data) for (data,) in conn.execute("SELECT data FROM history ORDER BY date")]
+        df = pd.DataFrame.from_records(records)
+        if not df.empty:
+            df["Дата"] = pd.to_datetime(df["Дата"])
+        _cache["mtime"] = mtime
+        _cache["df"] = df
+    return df
+
+
+def merge_with_history(live_df):
+    """Данные таблицы плюс история; при совпадении даты и менеджера приоритет у таблицы."""
+    history = load_history()
+    if history.empty or "Дата" not in live_df.columns:
+        return live_df
+    if not live_df.empty:
+        history = history[~row_keys(history).isin(set(row_keys(live_df)))]
+    merged = pd.concat([history, live_df], ignore_index=True, sort=False)
+    merged.attrs = dict(live_df.attrs)
+    return merged
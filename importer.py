@@ -0,0 +1,84 @@
+# importer.py
+
+import os
+import sys
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils import clean_data
+from history import append_rows, row_keys
+
+IMPORT_CHUNK_ROWS = 5000  # Строк в одном куске при разборе файла
+
+
+def _xlsx_chunks(path):
+    """Лист xlsx кусками DataFrame: read_only не загружает книгу в память целиком."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Заголовки не обрезаем: в таблице есть "Выручка доставка " с пробелом на конце
+        header = [str(col) if col is not None else "" for col in header]
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= IMPORT_CHUNK_ROWS:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        wb.close()
+
+
+def _csv_delimiter(path):
+    """Разделитель по строке заголовка: ';' (Excel) или '\t' важнее ',' — запятая есть в 'Фудкост общий, %'."""
+    with open(path, encoding="utf-8-sig") as f:
+        header = f.readline()
+    for delimiter in (";", "\t"):
+        if delimiter in header:
+            return delimiter
+    return ","
+
+
+def _csv_chunks(path):
+    yield from pd.read_csv(path, sep=_csv_delimiter(path), dtype=str,
+                           chunksize=IMPORT_CHUNK_ROWS, encoding="utf-8-sig")
+
+
+def import_file(path):
+    """
+    Импортирует файл xlsx/csv в историю с той же схемой и очисткой, что read_data.
+    Внутри файла дубликаты (дата, менеджер) схлопываются — остаётся последняя строка.
+    Возвращает число записанных строк.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        chunks = _xlsx_chunks(path)
+    elif ext == ".csv":
+        chunks = _csv_chunks(path)
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {path}")
+
+    written = 0
+    for chunk in chunks:
+        chunk = chunk.loc[:, [col for col in chunk.columns if col]]
+        chunk = clean_data(chunk)
+        if chunk.empty or "Дата" not in chunk.columns:
+            continue
+        chunk = chunk[~row_keys(chunk).duplicated(keep="last")]
+        written += append_rows(chunk)
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python importer.py файл.xlsx [файл.csv ...]")
+        sys.exit(1)
+    for file_path in sys.argv[1:]:
+        count = import_file(file_path)
+        print(f"✅ {file_path}: импортировано строк {count}")
@@ -0,0 +1,382 @@
+# loadtest.py
+#
+# Нагрузочный тест бота без сети: локальные заглушки Telegram Bot API и Google Sheets API,
+# настоящее приложение из main.build_app() и тысячи команд от виртуальных пользователей.
+#   python loadtest.py --users 50 --commands 40 --latency 0.05 --error-rate 0.02
+# Отчёт по сценарию: пропускная способность, задержки p50/p95/p99, число обращений к Sheets и Bot API.
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+TOKEN = "123456:LOADTEST"
+ADMIN_CHAT_ID = 1          # Сюда уходят служебные сообщения бота (ошибки), в замерах не участвует
+FIRST_USER_CHAT_ID = 1000
+
+# Сценарии: имя -> команды, которые по кругу отправляет каждый пользователь
+SCENARIOS = {
+    "analyze": ["/analyze"],
+    "mixed": ["/analyze", "/forecast", "/managers", "/forecast_prev", "/compare mom", "/period month"],
+    "heavy": ["/compare yoy", "/period year", "/compare weekday", "/period prev"],
+}
+
+MANAGERS = ["Анна", "Борис", "Вера", "Глеб"]
+MANAGEMENT_ROWS = [
+    ["Название", "Процент", "Сумма"],
+    ["Франшиза", "5", ""],
+    ["Процент списания", "15", ""],
+    ["Процент хозы", "1", ""],
+    ["Процент доставка", "30", ""],
+    ["Эквайринг", "16", ""],
+    ["Комиссия Банка", "3", ""],
+    ["Налоги ЗП", "30", ""],
+    ["УСН", "6", ""],
+    ["ЗП упр", "", "150000"],
+    ["Постоянные", "", "400000"],
+]
+
+
+def make_sheet_rows(days, seed=0):
+    """Операционная таблица за последние days дней: заголовок и строки в формате листа."""
+    rng = random.Random(seed)
+    header = ["Дата", "Менеджер", "Выручка бар", "Выручка кухня", "Ср. чек общий", "Ср. поз чек общий",
+              "Зал начислено", "Выручка доставка ", "Фудкост общий, %", "Скидка общий, %", "Начислено"]
+    rows = [header]
+    today = datetime.now()
+    for offset in range(days, -1, -1):
+        day = today - timedelta(days=offset)
+        rows.append([
+            day.strftime("%d.%m.%Y"), rng.choice(MANAGERS),
+            rng.randint(20000, 60000), rng.randint(50000, 120000), rng.randint(900, 1800),
+            rng.randint(20, 60), rng.randint(5000, 15000), rng.randint(0, 20000),
+            f"{rng.randint(200, 300) / 10}".replace(".", ",") + "%", rng.randint(10, 80), rng.randint(10000, 25000),
+        ])
+    return rows
+
+
+class Faults:
+    """Задержка и доля ошибок для заглушки."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def apply(self):
+        """Ждёт задержку (±50%) и возвращает код ошибки или None."""
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if self.error_rate and random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        if raw and self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            params.update({key: values[0] for key, values in parse_qs(raw).items()})
+        elif raw and self.headers.get("Content-Type", "").startswith("application/json"):
+            params.update(json.loads(raw))
+        return params
+
+
+class FakeSheets:
+    """Заглушка Sheets API v4: метаданные таблицы и values.get / values:batchGet."""
+
+    def __init__(self, spreadsheets, faults=None):
+        self.spreadsheets = spreadsheets  # {id: {лист: строки}}
+        self.faults = faults or Faults()
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                fake.handle(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def _values(self, spreadsheet, range_name):
+        title = unquote(range_name).split("!")[0].strip("'")
+        return {"range": range_name, "majorDimension": "ROWS", "values": spreadsheet.get(title, [])}
+
+    def handle(self, request):
+        parts = urlparse(request.path).path.strip("/").split("/")
+        # v4/spreadsheets/{id}[/values/{range}] или v4/spreadsheets/{id}/values:batchGet
+        spreadsheet_id = parts[2].split("/")[0] if len(parts) > 2 else ""
+        spreadsheet_id = spreadsheet_id.split(":")[0]
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        kind = "metadata" if len(parts) == 3 else parts[3]
+        self.count(kind)
+        status = self.faults.apply()
+        if status:
+            request._reply(status, {"error": {"code": status, "message": "injected", "status": "UNAVAILABLE"}})
+            return
+        if spreadsheet is None:
+            request._reply(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+            return
+        if kind == "metadata":
+            sheets = [{"properties": {"sheetId": index, "title": title, "index": index, "sheetType": "GRID",
+                                      "gridProperties": {"rowCount": len(rows), "columnCount": len(rows[0])}}}
+                      for index, (title, rows) in enumerate(spreadsheet.items())]
+            request._reply(200, {"spreadsheetId": spreadsheet_id, "properties": {"title": spreadsheet_id},
+                                 "sheets": sheets})
+        elif kind == "values:batchGet":
+            ranges = parse_qs(urlparse(request.path).query).get("ranges", [])
+            request._reply(200, {"spreadsheetId": spreadsheet_id,
+                                 "valueRanges": [self._values(spreadsheet, name) for name in ranges]})
+        else:
+            request._reply(200, self._values(spreadsheet, parts[4]))
+
+
+class FakeTelegram:
+    """
+    Заглушка Bot API: getUpdates отдаёт сценарные команды (long polling),
+    sendMessage и прочие ответы фиксируют время ответа каждому чату.
+    """
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self.calls = Counter()
+        self._updates = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._cond = threading.Condition()
+        self._replies = defaultdict(threading.Event)
+        fake = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                fake.handle(self)
+
+            do_GET = do_POST
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def push_command(self, chat_id, text):
+        """Кладёт команду пользователя в очередь getUpdates."""
+        self._replies[chat_id].clear()
+        with self._cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append({
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id, "date": int(time.time()), "text": text,
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+                    "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+                },
+            })
+            self._cond.notify_all()
+
+    def wait_reply(self, chat_id, timeout):
+        return self._replies[chat_id].wait(timeout)
+
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return list(self._updates[:100])
+
+    def _message(self, chat_id, text=""):
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        return {"message_id": message_id, "date": int(time.time()), "text": text,
+                "chat": {"id": int(chat_id), "type": "private"}}
+
+    def handle(self, request):
+        method = urlparse(request.path).path.rstrip("/").split("/")[-1]
+        params = request._params()
+        with self._cond:
+            self.calls[method] += 1
+        if method == "getUpdates":
+            request._reply(200, {"ok": True, "result": self._get_updates(params)})
+            return
+        status = self.faults.apply()
+        if status:
+            request._reply(status, {"ok": False, "error_code": status, "description": "injected"})
+            return
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Load", "username": "load_test_bot"}
+        elif method in ("sendMessage", "editMessageText", "sendDocument", "sendPhoto"):
+            chat_id = int(params.get("chat_id") or 0)
+            result = self._message(chat_id, params.get("text", ""))
+            self._replies[chat_id].set()
+        else:
+            result = True
+        request._reply(200, {"ok": True, "result": result})
+
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+def run_scenario(telegram, sheets, commands, users, per_user, reply_timeout):
+    """Замкнутый цикл: каждый пользователь шлёт следующую команду после ответа на предыдущую."""
+    telegram.calls.clear()
+    sheets.calls.clear()
+    latencies, timeouts = [], 0
+    lock = threading.Lock()
+
+    def user(index):
+        nonlocal timeouts
+        chat_id = FIRST_USER_CHAT_ID + index
+        for step in range(per_user):
+            started = time.perf_counter()
+            telegram.push_command(chat_id, commands[(index + step) % len(commands)])
+            ok = telegram.wait_reply(chat_id, reply_timeout)
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    timeouts += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "commands": users * per_user,
+        "replies": len(latencies),
+        "timeouts": timeouts,
+        "seconds": total,
+        "throughput": len(latencies) / total if total else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "sheets_calls": dict(sheets.calls),
+        "telegram_calls": dict(telegram.calls),
+    }
+
+
+def format_result(name, result):
+    return (
+        f"=== {name} ===\n"
+        f"Команд: {result['commands']}, ответов: {result['replies']}, без ответа: {result['timeouts']}, "
+        f"за {result['seconds']:.1f} с\n"
+        f"Пропускная способность: {result['throughput']:.1f} ответов/с\n"
+        f"Задержка p50: {result['p50'] * 1000:.0f} мс, p95: {result['p95'] * 1000:.0f} мс, "
+        f"p99: {result['p99'] * 1000:.0f} мс\n"
+        f"Обращения к Sheets: {result['sheets_calls']}\n"
+        f"Обращения к Bot API: {result['telegram_calls']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на локальных заглушках")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="сценарий (можно несколько; по умолчанию все)")
+    parser.add_argument("--users", type=int, default=50, help="одновременных пользователей")
+    parser.add_argument("--commands", type=int, default=40, help="команд на пользователя")
+    parser.add_argument("--days", type=int, default=730, help="дней в тестовой таблице")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушек, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов-ошибок заглушек")
+    parser.add_argument("--data-max-age", type=int, default=300, help="DATA_MAX_AGE_SECONDS бота")
+    parser.add_argument("--reply-timeout", type=float, default=30, help="сколько ждать ответа на команду, с")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.error_rate)
+    telegram = FakeTelegram(faults)
+    sheets = FakeSheets({}, faults)
+    for server in (telegram.server, sheets.server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Окружение бота задаётся до импорта main: config читает его при загрузке
+    state_dir = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ.update({
+        "STATE_DIR": state_dir,
+        "SHEETS_API_URL": sheets.url,
+        "SHEETS_ANONYMOUS": "1",
+        "TELEGRAM_API_URL": telegram.url,
+        "TELEGRAM_TOKEN": TOKEN,
+        "CHAT_ID": str(ADMIN_CHAT_ID),
+        "DATA_MAX_AGE_SECONDS": str(args.data_max_age),
+        "FETCH_BACKOFF_BASE": "0.05",
+    })
+    users = range(FIRST_USER_CHAT_ID, FIRST_USER_CHAT_ID + args.users)
+    with open(os.path.join(state_dir, "access.json"), "w", encoding="utf-8") as f:
+        json.dump({"chats": {str(chat): "owner" for chat in users}, "quotas": {"owner": [10 ** 6, 1]}}, f)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from config import SHEET_ID, MANAGEMENT_SHEET_ID, MANAGEMENT_SHEET_NAME
+    sheets.spreadsheets.update({
+        SHEET_ID: {"Sheet1": make_sheet_rows(args.days)},
+        MANAGEMENT_SHEET_ID: {MANAGEMENT_SHEET_NAME: MANAGEMENT_ROWS},
+    })
+    import logging
+    import main as bot
+    logging.getLogger().setLevel(logging.WARNING)  # main включает INFO — в замерах он только мешает
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Внедрённые ошибки Bot API попадают в отчёт как «без ответа» — трассировки не нужны
+    logging.getLogger("telegram.ext").setLevel(logging.CRITICAL)
+
+    app = bot.build_app(TOKEN)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def start():
+        await app.initialize()
+        await app.start()
+        await app.updater.start_polling(poll_interval=0.0, timeout=1)
+        ready.set()
+
+    threading.Thread(target=lambda: (loop.run_until_complete(start()), loop.run_forever()), daemon=True).start()
+    ready.wait()
+
+    try:
+        for name in args.scenario or sorted(SCENARIOS):
+            result = run_scenario(telegram, sheets, SCENARIOS[name], args.users, args.commands, args.reply_timeout)
+            print(format_result(name, result))
+    finally:
+        async def stop():
+            await app.updater.stop()
+            await app.stop()
+            await app.shutdown()
+        asyncio.run_coroutine_threadsafe(stop(), loop).result(timeout=30)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
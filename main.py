@@ -1,20 +1,51 @@
 import os
+import json
+import asyncio
+import tempfile
+import calendar
 import threading
 from datetime import datetime, timedelta
 import pandas as pd
 from dotenv import load_dotenv
 from apscheduler.schedulers.blocking import BlockingScheduler
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+from telegram.error import BadRequest
+from telegram.ext import (
+    ApplicationBuilder, ApplicationHandlerStop, CommandHandler, CallbackQueryHandler, ContextTypes, TypeHandler,
+)
 
-from forecast import forecast, forecast_for_period
+from forecast import forecast, forecast_for_period, forecast_for_month, pnl_trend_report, pnl_trend_chart
+from compare import compare_report
+from period import period_report
+from export import export_files, remove_files
+from config import (
+    WATCH_INTERVAL_SECONDS, DATA_MAX_AGE_SECONDS, TIMEZONE, DRIVE_FOLDER_ID, DRIVE_POLL_SECONDS,
+    TELEGRAM_API_URL, UPDATE_CONCURRENCY, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, RECORD_UPDATES_FILE,
+    DASHBOARD_SHEET_ID,
+)
+from store import get_store
+from pnl import display_value
+from coordinator import RequestCoordinator
+from access import check as check_access, role_of, is_allowed
+from profiling import profile_call, ProfilingBusyError
+from sync import sync, get_data, get_version, register_sync_hook
+from changelog import changes_for
+from params_history import changed_in as params_changed_in
+from navigation import ViewCache, keyboard, parse_callback
+from subscriptions import (
+    subscribe, unsubscribe, list_subscriptions, parse_time, subscriptions_job, venue_of, DEFAULT_VENUE, VENUES,
+)
+from watcher import watch_job, mark_report_sent
+from drive_ingest import ingest_job
+from backtest import backtest_report
+from pace import pace_report, pace_line
+from dashboard import publish as publish_dashboard
+from quota import in_lane
 from utils import (
-    read_data,
     send_to_telegram,
     format_ruble,
-    get_management_foodcost,
-    get_management_percent,
-    get_management_value,
+    stale_note,
+    rank_managers,
 )
 
 import logging
@@ -25,39 +56,33 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
 
-def analyze(df):
-    last_date = df["Дата"].max()
-    if pd.isna(last_date):
+def analyze(store=None, day=None):
+    """Итоги дня: по умолчанию — последнего дня с данными."""
+    store = store or get_store()
+    last_date = store.last_date() if day is None else pd.Timestamp(day)
+    if last_date is None:
         return "📅 Дата: не определена\n\n⚠️ Нет доступных данных"
 
-    today_df = df[df["Дата"] == last_date]
-    bar = round(today_df["Выручка бар"].sum())
-    kitchen = round(today_df["Выручка кухня"].sum())
+    day = store.day_summary(last_date)
+    if not day["rows"]:
+        return f"📅 Дата: {last_date.strftime('%Y-%m-%d')}\n\n⚠️ Нет данных за этот день"
+    bar = round(day["bar"])
+    kitchen = round(day["kitchen"])
     total = bar + kitchen
-    avg_check = round(today_df["Ср. чек общий"].mean())
-    depth = round(today_df["Ср. поз чек общий"].mean() / 10, 1)
-    hall_income = round(today_df["Зал начислено"].sum())
-    delivery = round(today_df["Выручка доставка "].sum())
+    avg_check = round(day["avg_check"])
+    depth = round(display_value(day["depth"], "depth"), 1)
+    hall_income = round(day["hall"])
+    delivery = round(day["delivery"])
     hall_share = (hall_income / total * 100) if total else 0
     delivery_share = (delivery / total * 100) if total else 0
 
-    foodcost_raw = today_df["Фудкост общий, %"].astype(str)\
-        .str.replace(",", ".")\
-        .str.replace("%", "")\
-        .str.strip()
-    foodcost = round(pd.to_numeric(foodcost_raw, errors="coerce").mean() / 10, 1)
-
-    discount_raw = today_df["Скидка общий, %"].astype(str)\
-        .str.replace(",", ".")\
-        .str.replace("%", "")\
-        .str.strip()
-    discount = round(pd.to_numeric(discount_raw, errors="coerce").mean() / 10, 1)
+    foodcost = round(display_value(day["foodcost"], "foodcost"), 1)
+    discount = round(display_value(day["discount"], "discount"), 1)
 
     avg_check_emoji = "🙂" if avg_check >= 1300 else "🙁"
     foodcost_emoji = "🙂" if foodcost <= 23 else "🙁"
 
-    managers_today = today_df["Менеджер"].dropna().unique()
-    manager_name = managers_today[0] if len(managers_today) > 0 else "—"
+    manager_name = day["manager"] or "—"
 
     return (
         f"📅 Дата: {last_date.strftime('%Y-%m-%d')}\n\n"
@@ -70,144 +95,466 @@ def analyze(df):
         f"📊 Доля ЗП зала: {hall_share:.1f}%\n"
         f"🍔 Фудкост: {foodcost}% {foodcost_emoji}\n"
         f"💸 Скидка: {discount}%"
+        f"{pace_line() if last_date == store.last_date() else ''}"
     )
 
-# --- Обработка команд ---
+def managers_report(store=None, year=None, month=None):
+    """Рейтинг менеджеров за месяц (по умолчанию — текущий)."""
+    store = store or get_store()
+    now = datetime.now()
+    if year is not None and month is not None:
+        now = datetime(year, month, 1)
+    month_start = now.replace(day=1)
+    month_end = month_start.replace(day=calendar.monthrange(now.year, now.month)[1])
+    manager_stats = store.manager_stats(month_start, month_end).fillna(0)
+    if manager_stats.empty:
+        period_text = "текущий месяц" if year is None else now.strftime('%B %Y')
+        return f"⚠️ Нет строк с указанными менеджерами за {period_text}."
 
-async def forecast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_to_telegram(f"Вызван forecast_command. ChatID: {update.effective_chat.id}")
-    try:
-        df = read_data()
-        result = forecast(df)
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=result)
-    except Exception as e:
-        await send_to_telegram(f"Ошибка в forecast_command: {e}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"❌ Ошибка: {str(e)}")
+    manager_stats = rank_managers(manager_stats)
+    message = f"📅 Период: {now.strftime('%B %Y')}\n\n"
+    for name, row in manager_stats.iterrows():
+        discount_percent = round(display_value(row['Скидка общий, %'], "discount"), 1)
+        message += (
+            f"👤 {name}\n"
+            f"📊 Выручка: {format_ruble(row['Общая выручка'])}\n"
+            f"🧾 Ср. чек: {format_ruble(row['Ср. чек общий'])}\n"
+            f"📏 Глубина: {row['Глубина']:.1f}\n"
+            f"💸 Скидка: {discount_percent}%\n\n"
+        )
+    message += f"🏆 Победитель: {manager_stats.index[0]}"
+    return message
+
+# --- Вычисление ответов на команды (выполняются в пуле потоков) ---
+
+def _fresh_store():
+    """Хранилище с данными не старше DATA_MAX_AGE_SECONDS (наблюдатель обновляет их при изменениях)."""
+    store = get_store(DATA_MAX_AGE_SECONDS)
+    return store, stale_note(get_data())
+
+def view_result(view, anchor=None, max_age_seconds=None):
+    """
+    Представление с кнопками навигации: (текст, вид, якорь, последний якорь, версия данных).
+    anchor=None — последний день с данными или текущий месяц.
+    Без max_age_seconds берутся уже синхронизированные данные — листание ничего не загружает.
+    """
+    store = get_store(max_age_seconds)
+    note = stale_note(get_data())
+    version = get_version()
+    now = datetime.now()
+    if view == "analyze":
+        last = store.last_date()
+        latest = (last or now).strftime("%Y-%m-%d")
+        anchor = min(anchor or latest, latest)
+        text = analyze(store, anchor if last is not None else None)
+    else:
+        latest = now.strftime("%Y-%m")
+        anchor = anchor or latest
+        year, month = int(anchor[:4]), int(anchor[5:7])
+        if view == "forecast":
+            text = forecast(store) if anchor == latest else forecast_for_month(year, month, store)
+        else:
+            text = managers_report(store) if anchor == latest else managers_report(store, year, month)
+    return text + note, view, anchor, latest, version
+
+def forecast_text(args):
+    return view_result("forecast", max_age_seconds=DATA_MAX_AGE_SECONDS)
+
+def forecast_prev_text(args):
+    prev_month = (datetime.now().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    return view_result("forecast", prev_month, max_age_seconds=DATA_MAX_AGE_SECONDS)
+
+def forecast_period_text(args):
+    store, note = _fresh_store()
+    period = 'current'
+    if args:
+        arg = args[0].lower()
+        if arg in ('previous', 'last', 'prev'):
+            period = 'previous'
+    return forecast_for_period(period, store) + note
+
+def analyze_text(args):
+    return view_result("analyze", max_age_seconds=DATA_MAX_AGE_SECONDS)
+
+def managers_text(args):
+    return view_result("managers", max_age_seconds=DATA_MAX_AGE_SECONDS)
 
-async def forecast_prev_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_to_telegram(f"Вызван forecast_prev_command. ChatID: {update.effective_chat.id}")
+def compare_text(args):
+    kind = args[0].lower() if args else "mom"
+    count = 8
+    if len(args) > 1 and args[1].isdigit():
+        count = max(1, int(args[1]))
+    df = get_data(DATA_MAX_AGE_SECONDS)
+    return compare_report(kind, count) + stale_note(df)
+
+PERIOD_USAGE = "Использование: /period [week|month|quarter|year|prev] или /period дата [дата]"
+
+def period_text(args):
+    df = get_data(DATA_MAX_AGE_SECONDS)
     try:
-        df = read_data()
-        await send_to_telegram(f"Данные считаны: {df.shape}")
-        result = forecast_for_period(df, period='previous')
-        await send_to_telegram(f"Результат функции forecast_for_period: {str(result)[:60]}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=result)
-    except Exception as e:
-        await send_to_telegram(f"Ошибка в forecast_prev_command: {e}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"❌ Ошибка: {str(e)}")
+        report = period_report(list(args))
+    except ValueError as e:
+        return f"❌ {e}\n{PERIOD_USAGE}"
+    return report + stale_note(df)
+
+def pnl_text(args):
+    """/pnl [N] [chart]: P&L за последние N месяцев (по умолчанию 12), по желанию с графиком."""
+    months = 12
+    if args and args[0].isdigit():
+        months = min(max(1, int(args[0])), 120)
+    store, note = _fresh_store()
+    chart = pnl_trend_chart(months, store) if "chart" in [a.lower() for a in args] else None
+    return pnl_trend_report(months, store) + note, chart
+
+def backtest_text(args):
+    """/backtest [N]: точность прогноза на конец месяца за последние N завершённых месяцев (по умолчанию — все)."""
+    months = min(max(1, int(args[0])), 240) if args and args[0].isdigit() else None
+    df = get_data(DATA_MAX_AGE_SECONDS)
+    return backtest_report(df, months) + stale_note(df)
+
+def pace_text(args):
+    """/pace [менеджер]: темп месяца к целям из листа целей управляющей таблицы."""
+    df = get_data(DATA_MAX_AGE_SECONDS)
+    return pace_report(" ".join(args) or None) + stale_note(df)
+
+def dashboard_text(args):
+    """/dashboard [full]: опубликовать показатели на лист Dashboard сейчас (full — переписать весь лист)."""
+    if not DASHBOARD_SHEET_ID:
+        return "⚠️ Публикация выключена: задайте DASHBOARD_SHEET_ID."
+    df = get_data(DATA_MAX_AGE_SECONDS)
+    cells = publish_dashboard(df, full="full" in [a.lower() for a in args])
+    return f"✅ Dashboard: обновлено ячеек {cells}" if cells else "✅ Dashboard: изменений нет"
+
+# Команды, которые можно профилировать через /profile: имя -> расчёт ответа
+PROFILE_TARGETS = {
+    "analyze": analyze_text,
+    "forecast": forecast_text,
+    "forecast_prev": forecast_prev_text,
+    "managers": managers_text,
+    "compare": compare_text,
+    "period": period_text,
+    "backtest": backtest_text,
+    "pace": pace_text,
+}
 
-async def forecast_period_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_to_telegram(f"Вызван forecast_period_command. ChatID: {update.effective_chat.id}")
+def profile_files(args):
+    """/profile команда [аргументы]: один расчёт под cProfile и tracemalloc, отчёт — текстовым файлом."""
+    if not args or args[0] not in PROFILE_TARGETS:
+        return f"Использование: /profile команда [аргументы]\nКоманды: {', '.join(PROFILE_TARGETS)}"
+    command, command_args = args[0], tuple(args[1:])
     try:
-        df = read_data()
-        period = 'current'
-        if context.args:
-            arg = context.args[0].lower()
-            if arg in ('previous', 'last', 'prev'):
-                period = 'previous'
-        result = forecast_for_period(df, period)
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=result)
-    except Exception as e:
-        await send_to_telegram(f"Ошибка в forecast_period_command: {e}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"❌ Ошибка: {str(e)}")
+        _, report = profile_call(PROFILE_TARGETS[command], command_args)
+    except ProfilingBusyError:
+        return "⏳ Профилирование уже идёт, попробуйте позже."
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"Профиль /{command} {' '.join(command_args)}\n\n{report}")
+    return [(path, f"profile_{command}.txt")]
+
+# --- Обработка команд ---
+
+coordinator = RequestCoordinator()
+view_cache = ViewCache()
+_views_fallback = {"previous": False}  # была ли прошлая синхронизация из резервной копии
 
-async def analyze_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_to_telegram(f"Вызван analyze_command. ChatID: {update.effective_chat.id}")
+@register_sync_hook
+def _keep_unchanged_views(df, version):
+    """Ответы навигации за дни и месяцы без правок остаются в кэше и после синхронизации."""
+    changes = changes_for(df, version)
+    fallback, _views_fallback["previous"] = _views_fallback["previous"], bool(df.attrs.get("fallback_age"))
+    if changes["initial"] or fallback or _views_fallback["previous"]:
+        return  # в ответах подпись о резервной копии — пусть пересчитаются
+    days, months = set(changes["dates"]), set(changes["months"])
+    # Месячные отчёты (P&L, бонусы) считаются по параметрам управляющей таблицы
+    params_changed = params_changed_in(version)
+
+    def keep(view, anchor, result):
+        if anchor == result[3]:
+            return False  # последний день / текущий месяц: темп месяца, кнопки, прогноз
+        if view == "analyze":
+            return anchor not in days
+        return not params_changed and anchor not in months
+    view_cache.carry_forward(version - 1, version, keep)
+
+async def send_text(context, chat_id, result):
+    await context.bot.send_message(chat_id=chat_id, text=result)
+
+async def send_files(context, chat_id, files):
     try:
-        df = read_data()
-        report = analyze(df)
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=report)
-    except Exception as e:
-        await send_to_telegram(f"Ошибка в analyze_command: {e}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"❌ Ошибка: {str(e)}")
+        for path, filename in files:
+            with open(path, "rb") as f:
+                await context.bot.send_document(chat_id=chat_id, document=f, filename=filename)
+    finally:
+        remove_files(files)
 
-async def managers_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await send_to_telegram(f"Вызван managers_command. ChatID: {update.effective_chat.id}")
+async def send_text_with_chart(context, chat_id, result):
+    text, chart = result
     try:
-        df = read_data()
-        if "Менеджер" not in df.columns:
-            await context.bot.send_message(chat_id=update.effective_chat.id, text="⚠️ Колонка 'Менеджер' не найдена в данных.")
+        await context.bot.send_message(chat_id=chat_id, text=text)
+        if chart:
+            with open(chart, "rb") as f:
+                await context.bot.send_photo(chat_id=chat_id, photo=f)
+    finally:
+        if chart:
+            remove_files([(chart, None)])
+
+async def send_view(context, chat_id, result):
+    text, view, anchor, latest, version = result
+    view_cache.put(chat_id, (view, anchor, version), result)
+    await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard(view, anchor, latest))
+
+async def send_text_or_files(context, chat_id, result):
+    if isinstance(result, str):
+        await send_text(context, chat_id, result)
+    else:
+        await send_files(context, chat_id, result)
+
+def coordinated(name, compute, send=send_text, per_chat=False):
+    """
+    Обработчик команды поверх координатора: объединение одинаковых запросов
+    и расчёт вне цикла событий (доступ и квоты уже проверены в access_gate).
+    per_chat=True — результат не делится между чатами (например, временные файлы).
+    """
+    async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
+        logging.info("Вызван %s. ChatID: %s", name, chat_id)
+        args = tuple(context.args or ())
+        key = (name, args, chat_id) if per_chat else (name, args)
+        try:
+            result = await coordinator.run(key, compute, args)
+        except Exception as e:
+            logging.exception("Ошибка в %s", name)
+            await asyncio.to_thread(send_to_telegram, f"Ошибка в {name}: {e}")
+            await context.bot.send_message(chat_id=chat_id, text=f"❌ Ошибка: {str(e)}")
             return
-        now = datetime.now()
-        filtered = df[
-            df["Менеджер"].notna() &
-            (df["Дата"].dt.year == now.year) &
-            (df["Дата"].dt.month == now.month)
-        ]
-        if filtered.empty:
-            await context.bot.send_message(chat_id=update.effective_chat.id, text="⚠️ Нет строк с указанными менеджерами за текущий месяц.")
+        await send(context, chat_id, result)
+    handler.__name__ = f"{name}_command"
+    return handler
+
+forecast_command = coordinated("forecast", forecast_text, send=send_view)
+forecast_prev_command = coordinated("forecast_prev", forecast_prev_text, send=send_view)
+forecast_period_command = coordinated("forecast_period", forecast_period_text)
+analyze_command = coordinated("analyze", analyze_text, send=send_view)
+managers_command = coordinated("managers", managers_text, send=send_view)
+compare_command = coordinated("compare", compare_text)
+period_command = coordinated("period", period_text)
+export_command = coordinated("export", export_files, send=send_files, per_chat=True)
+pnl_command = coordinated("pnl", pnl_text, send=send_text_with_chart, per_chat=True)
+backtest_command = coordinated("backtest", backtest_text)
+pace_command = coordinated("pace", pace_text)
+dashboard_command = coordinated("dashboard", dashboard_text)
+# Только для владельцев: в ролях по умолчанию /profile есть лишь у owner ("*")
+profile_command = coordinated("profile", profile_files, send=send_text_or_files, per_chat=True)
+
+async def navigation_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопки навигации: ответ из кэша чата или расчёт по уже синхронизированным данным, затем правка сообщения."""
+    query = update.callback_query
+    parsed = parse_callback(query.data)
+    if parsed is None:
+        await query.answer("Кнопка устарела, повторите команду.")
+        return
+    view, anchor = parsed
+    chat_id = update.effective_chat.id
+    result = view_cache.get(chat_id, (view, anchor, get_version()))
+    if result is None:
+        try:
+            result = await coordinator.run(("nav", view, anchor), view_result, view, anchor)
+        except Exception as e:
+            logging.exception("Ошибка навигации %s %s", view, anchor)
+            await query.answer(f"❌ Ошибка: {e}"[:200])
             return
+        # Якорь мог сдвинуться (день позже последнего в данных) — кэшируем под обоими
+        view_cache.put(chat_id, (view, anchor, result[4]), result)
+        view_cache.put(chat_id, (result[1], result[2], result[4]), result)
+    await query.answer()
+    text, view, anchor, latest, _ = result
+    try:
+        await query.edit_message_text(text=text, reply_markup=keyboard(view, anchor, latest))
+    except BadRequest as e:
+        # "Message is not modified" — тот же ответ уже на экране
+        if "not modified" not in str(e).lower():
+            raise
 
-        manager_stats = filtered.groupby("Менеджер").agg({
-            "Выручка бар": "sum",
-            "Выручка кухня": "sum",
-            "Ср. чек общий": "mean",
-            "Ср. поз чек общий": "mean",
-            "Скидка общий, %": "mean"
-        }).fillna(0)
-
-        manager_stats["Общая выручка"] = manager_stats["Выручка бар"] + manager_stats["Выручка кухня"]
-        manager_stats["Глубина"] = manager_stats["Ср. поз чек общий"] / 10
-
-        max_values = {
-            "Ср. чек общий": manager_stats["Ср. чек общий"].max(),
-            "Общая выручка": manager_stats["Общая выручка"].max(),
-            "Глубина": manager_stats["Глубина"].max()
-        }
-
-        manager_stats["Оценка"] = (
-            (manager_stats["Ср. чек общий"] / max_values["Ср. чек общий"]) * 0.5 +
-            (manager_stats["Общая выручка"] / max_values["Общая выручка"]) * 0.3 +
-            (manager_stats["Глубина"] / max_values["Глубина"]) * 0.2
-        )
+# Отчёты для подписок: имя -> функция без аргументов, возвращающая текст
+SUBSCRIPTION_REPORTS = {
+    "analyze": analyze,
+    "forecast": forecast,
+    "forecast_prev": lambda: forecast_for_period('previous'),
+    "managers": managers_report,
+    "pnl": pnl_trend_report,
+}
+
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/subscribe отчёт ЧЧ:ММ [заведение]"""
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    at = parse_time(args[1]) if len(args) > 1 else None
+    if not args or args[0] not in SUBSCRIPTION_REPORTS or at is None:
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"Использование: /subscribe отчёт ЧЧ:ММ [заведение]\nОтчёты: {', '.join(SUBSCRIPTION_REPORTS)}")
+        return
+    if not is_allowed(role_of(chat_id), args[0]):
+        await context.bot.send_message(chat_id=chat_id, text="⛔ Этот отчёт недоступен для вашей роли.")
+        return
+    venue = args[2] if len(args) > 2 else DEFAULT_VENUE
+    if venue not in VENUES:
+        await context.bot.send_message(chat_id=chat_id, text=f"❌ Нет такого заведения. Доступны: {', '.join(VENUES)}")
+        return
+    added = subscribe(chat_id, args[0], at, venue)
+    text = f"✅ Подписка: {args[0]} в {at}" if added else "ℹ️ Такая подписка уже есть"
+    await context.bot.send_message(chat_id=chat_id, text=text)
 
-        manager_stats = manager_stats.sort_values("Оценка", ascending=False)
-        message = f"📅 Период: {now.strftime('%B %Y')}\n\n"
-        for name, row in manager_stats.iterrows():
-            discount_percent = round(row['Скидка общий, %'] / 10, 1)
-            message += (
-                f"👤 {name}\n"
-                f"📊 Выручка: {format_ruble(row['Общая выручка'])}\n"
-                f"🧾 Ср. чек: {format_ruble(row['Ср. чек общий'])}\n"
-                f"📏 Глубина: {row['Глубина']:.1f}\n"
-                f"💸 Скидка: {discount_percent}%\n\n"
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/unsubscribe [отчёт] [ЧЧ:ММ] — без аргументов снимает все подписки чата."""
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    report = args[0] if args else None
+    at = parse_time(args[1]) if len(args) > 1 else None
+    removed = unsubscribe(chat_id, report, at)
+    await context.bot.send_message(chat_id=chat_id, text=f"🗑 Удалено подписок: {removed}")
+
+async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    subs = list_subscriptions(chat_id)
+    if not subs:
+        text = "Подписок нет. Добавить: /subscribe отчёт ЧЧ:ММ"
+    else:
+        text = "📬 Подписки:\n" + "\n".join(f"• {sub['report']} в {sub['time']} ({venue_of(sub)})" for sub in subs)
+    await context.bot.send_message(chat_id=chat_id, text=text)
+
+def command_name(update):
+    """Имя команды для проверки доступа: '/pnl@bot 12' -> 'pnl'; кнопка навигации -> её представление."""
+    if update.callback_query:
+        parsed = parse_callback(update.callback_query.data)
+        return parsed[0] if parsed else "nav"
+    message = update.effective_message
+    if message and message.text and message.text.startswith("/"):
+        return message.text.split()[0][1:].split("@")[0].lower()
+    return None
+
+async def access_gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Первая группа обработчиков: чужие чаты, недоступные роли команды и превышение квоты
+    останавливаются здесь, до любых обращений к Google и расчётов.
+    """
+    chat = update.effective_chat
+    command = command_name(update)
+    if chat is None or command is None:
+        raise ApplicationHandlerStop
+    denial = check_access(chat.id, command)
+    if denial is None:
+        return
+    logging.info("Отказ: чат %s, команда %s", chat.id, command)
+    if denial:
+        if update.callback_query:
+            await update.callback_query.answer(denial)
+        else:
+            await context.bot.send_message(chat_id=chat.id, text=denial)
+    raise ApplicationHandlerStop
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Пишет входящие обновления в RECORD_UPDATES_FILE (JSON по строке) — для replay_updates.py."""
+    with open(RECORD_UPDATES_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(update.to_dict(), ensure_ascii=False) + "\n")
+
+def build_app(token=TELEGRAM_TOKEN):
+    """Приложение бота со всеми обработчиками (одно и то же для polling и webhook)."""
+    app = (ApplicationBuilder().token(token)
+           .base_url(f"{TELEGRAM_API_URL}/bot")
+           .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+           # Иначе PTB обрабатывает обновления по одному и координатору нечего объединять
+           .concurrent_updates(UPDATE_CONCURRENCY)
+           .build())
+    app.add_handler(TypeHandler(Update, access_gate), group=-2)
+    if RECORD_UPDATES_FILE:
+        app.add_handler(TypeHandler(Update, record_update), group=-1)
+
+    app.add_handler(CommandHandler("analyze", analyze_command))
+    app.add_handler(CommandHandler("forecast", forecast_command))
+    app.add_handler(CommandHandler("managers", managers_command))
+    app.add_handler(CommandHandler("forecast_prev", forecast_prev_command))
+    app.add_handler(CommandHandler("forecast_period", forecast_period_command))
+    app.add_handler(CommandHandler("compare", compare_command))
+    app.add_handler(CommandHandler("period", period_command))
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(CommandHandler("pnl", pnl_command))
+    app.add_handler(CommandHandler("backtest", backtest_command))
+    app.add_handler(CommandHandler("pace", pace_command))
+    app.add_handler(CommandHandler("dashboard", dashboard_command))
+    app.add_handler(CommandHandler("profile", profile_command))
+    app.add_handler(CommandHandler("subscribe", subscribe_command))
+    app.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
+    app.add_handler(CommandHandler("subscriptions", subscriptions_command))
+    app.add_handler(CallbackQueryHandler(navigation_callback, pattern=r"^nav:"))
+    return app
+
+def run_bot(app):
+    """
+    BOT_MODE=webhook — встроенный HTTP-сервер PTB: проверяет секретный токен
+    (заголовок X-Telegram-Bot-Api-Secret-Token) и передаёт обновления тем же обработчикам.
+    Без WEBHOOK_URL или в режиме polling — long polling, как раньше.
+    Webhook без WEBHOOK_SECRET не запускается: иначе обновления примет любой, кто знает адрес.
+    Оба режима сами останавливаются по SIGINT/SIGTERM.
+    """
+    if BOT_MODE == "webhook":
+        if WEBHOOK_URL:
+            if not WEBHOOK_SECRET:
+                logging.error("BOT_MODE=webhook, но WEBHOOK_SECRET не задан — запуск отменён")
+                raise SystemExit("Задайте WEBHOOK_SECRET для режима webhook")
+            logging.info("Режим webhook: %s:%s/%s", WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH)
+            app.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
             )
-        message += f"🏆 Победитель: {manager_stats.index[0]}"
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=message)
-    except Exception as e:
-        await send_to_telegram(f"Ошибка в managers_command: {e}")
-        await context.bot.send_message(chat_id=update.effective_chat.id, text=f"❌ Ошибка: {str(e)}")
+            return
+        logging.warning("BOT_MODE=webhook, но WEBHOOK_URL не задан — работаю через polling")
+    app.run_polling()
 
 # --- Планировщик для ежедневного отчёта ---
 def job():
     try:
-        df = read_data()
-        report = analyze(df)
+        df = sync()
+        report = analyze() + stale_note(df)
         send_to_telegram(report)
+        mark_report_sent(report)
     except Exception as e:
         send_to_telegram(f"❌ Ошибка: {str(e)}")
 
 if __name__ == "__main__":
     send_to_telegram("⚡️ Перезапуск (тестовая версия с логами)")
     print("⏰ Тестовый запуск без Telegram\n")
-    df = read_data()
+    sync()
     print("=== Анализ дня ===")
-    print(analyze(df))
+    print(analyze())
     print("=== Прогноз ===")
-    print(forecast(df))
+    print(forecast())
     print("=== Прогноз за прошлый месяц ===")
-    print(forecast_for_period(df, period='previous'))
+    print(forecast_for_period(period='previous'))
     print("⏰ Бот запущен. Отчёт будет в 9:30 по Калининграду")
 
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    app = build_app()
 
-    app.add_handler(CommandHandler("analyze", analyze_command))
-    app.add_handler(CommandHandler("forecast", forecast_command))
-    app.add_handler(CommandHandler("managers", managers_command))
-    app.add_handler(CommandHandler("forecast_prev", forecast_prev_command))
-    app.add_handler(CommandHandler("forecast_period", forecast_period_command))
-
-    scheduler = BlockingScheduler(timezone="Europe/Kaliningrad")
-    scheduler.add_job(job, trigger="cron", hour=9, minute=30)
+    scheduler = BlockingScheduler(timezone=TIMEZONE)
+    # Плановые отчёты, подписки и оповещения читают Google в приоритетной полосе квоты (quota.py),
+    # команды пользователей — в обычной
+    scheduler.add_job(in_lane("scheduled", job), trigger="cron", hour=9, minute=30)
+    # Подписки: раз в минуту рассылаем те, чьё время наступило
+    scheduler.add_job(in_lane("scheduled", subscriptions_job), trigger="cron", minute="*",
+                      args=[SUBSCRIPTION_REPORTS], max_instances=1, coalesce=True)
+    # Наблюдатель: отчёт уходит сразу, как только день внесён или исправлен
+    scheduler.add_job(in_lane("scheduled", watch_job), trigger="interval", seconds=WATCH_INTERVAL_SECONDS,
+                      args=[analyze], max_instances=1, coalesce=True)
+    if DRIVE_FOLDER_ID:
+        # Выгрузки кассы из папки Drive — в историю
+        scheduler.add_job(in_lane("background", ingest_job), trigger="interval", seconds=DRIVE_POLL_SECONDS,
+                          max_instances=1, coalesce=True)
     threading.Thread(target=scheduler.start).start()
-    app.run_polling()
+    try:
+        run_bot(app)
+    finally:
+        # Бот остановлен — останавливаем и планировщик, иначе процесс не завершится
+        scheduler.shutdown(wait=False)
@@ -0,0 +1,118 @@
+# navigation.py
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import NAV_CACHE_SIZE
+
+# Представления с навигацией: шаг листания и подпись кнопки переключения
+VIEWS = {
+    "analyze": {"step": "day", "title": "📅 День"},
+    "forecast": {"step": "month", "title": "📈 P&L"},
+    "managers": {"step": "month", "title": "👥 Менеджеры"},
+}
+CALLBACK_PREFIX = "nav"
+
+
+def callback_data(view, anchor):
+    """Данные кнопки: 'nav:вид:якорь' (якорь — ГГГГ-ММ-ДД для дня, ГГГГ-ММ для месяца); до 64 байт."""
+    return f"{CALLBACK_PREFIX}:{view}:{anchor}"
+
+
+def parse_callback(data):
+    """'nav:вид:якорь' -> (вид, якорь) или None, если данные не наши или устарели."""
+    parts = (data or "").split(":")
+    if len(parts) != 3 or parts[0] != CALLBACK_PREFIX or parts[1] not in VIEWS:
+        return None
+    view, anchor = parts[1], parts[2]
+    try:
+        datetime.strptime(anchor, "%Y-%m-%d" if VIEWS[view]["step"] == "day" else "%Y-%m")
+    except ValueError:
+        return None
+    return view, anchor
+
+
+def convert_anchor(anchor, view):
+    """Якорь другого представления: день -> его месяц, месяц -> его последний день."""
+    if VIEWS[view]["step"] == "month":
+        return anchor[:7]
+    if len(anchor) == 10:
+        return anchor
+    first = datetime.strptime(anchor, "%Y-%m")
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return last.strftime("%Y-%m-%d")
+
+
+def shift_anchor(view, anchor, step):
+    """Соседний день или месяц (step = -1 / +1)."""
+    if VIEWS[view]["step"] == "day":
+        day = datetime.strptime(anchor, "%Y-%m-%d") + timedelta(days=step)
+        return day.strftime("%Y-%m-%d")
+    first = datetime.strptime(anchor, "%Y-%m")
+    if step < 0:
+        first = (first - timedelta(days=1)).replace(day=1)
+    else:
+        first = (first + timedelta(days=32)).replace(day=1)
+    return first.strftime("%Y-%m")
+
+
+def keyboard(view, anchor, latest=None):
+    """
+    Кнопки под сообщением: листание назад/вперёд и переключение представлений.
+    latest — последний якорь, дальше которого листать некуда (для дня — последняя дата в данных).
+    """
+    is_day = VIEWS[view]["step"] == "day"
+    latest = latest or datetime.now().strftime("%Y-%m-%d" if is_day else "%Y-%m")
+    label = "день" if is_day else "месяц"
+    arrows = [InlineKeyboardButton(f"◀️ {label}", callback_data=callback_data(view, shift_anchor(view, anchor, -1)))]
+    if anchor < latest:
+        arrows.append(InlineKeyboardButton(f"{label} ▶️",
+                                           callback_data=callback_data(view, shift_anchor(view, anchor, 1))))
+    toggles = [
+        InlineKeyboardButton(VIEWS[other]["title"], callback_data=callback_data(other, convert_anchor(anchor, other)))
+        for other in VIEWS if other != view
+    ]
+    return InlineKeyboardMarkup([arrows, toggles])
+
+
+class ViewCache:
+    """
+    Кэш готовых ответов навигации по чатам: ключ — (вид, якорь, версия данных).
+    После синхронизации версия меняется, и старые записи просто вытесняются;
+    на чат хранится не больше size ответов.
+    """
+
+    def __init__(self, size=NAV_CACHE_SIZE):
+        self.size = size
+        self._chats = {}
+        self._lock = threading.Lock()
+
+    def get(self, chat_id, key):
+        with self._lock:
+            entries = self._chats.get(chat_id)
+            if entries is None or key not in entries:
+                return None
+            entries.move_to_end(key)
+            return entries[key]
+
+    def carry_forward(self, old_version, new_version, keep):
+        """
+        Переносит ответы версии old_version на new_version, если keep(вид, якорь, ответ) —
+        данные под ними не менялись (см. changelog); остальные вытесняются как обычно.
+        """
+        with self._lock:
+            for entries in self._chats.values():
+                for (view, anchor, version), value in list(entries.items()):
+                    if version == old_version and keep(view, anchor, value):
+                        entries[(view, anchor, new_version)] = value
+                        del entries[(view, anchor, version)]
+
+    def put(self, chat_id, key, value):
+        with self._lock:
+            entries = self._chats.setdefault(chat_id, OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.size:
+                entries.popitem(last=False)
@@ -0,0 +1,288 @@
+# pace.py
+
+import re
+import time
+import logging
+import calendar
+import threading
+from datetime import datetime
+import pandas as pd
+
+from config import MANAGEMENT_SHEET_ID, TARGETS_SHEET_NAME, MANAGEMENT_CACHE_SECONDS
+from utils import fetch_records, metric_columns, parse_decimal, format_ruble
+from dataset import date_slice
+from pnl import display_value
+from sync import register_sync_hook, get_data
+from changelog import changes_for
+
+logger = logging.getLogger(__name__)
+
+# Колонки листа целей: начало заголовка (в нижнем регистре) -> ключ цели.
+# Лист: Месяц | Менеджер (пусто — весь ресторан) | Выручка | Фудкост, % | LC, %
+TARGET_COLUMNS = {"выручка": "revenue", "фудкост": "foodcost", "lc": "lc"}
+RESTAURANT = None  # ключ «весь ресторан» в целях и итогах
+
+_state = {
+    "month": None,    # 'YYYY-MM' — месяц, за который посчитаны итоги
+    "last_day": None,  # последний день с данными в этом месяце
+    "days": {},       # (день, менеджер или RESTAURANT) -> суммы дня (см. day_sums)
+    "totals": {},     # менеджер (или RESTAURANT) -> итоги месяца с начала
+    "targets": {},    # ('YYYY-MM', менеджер или RESTAURANT) -> {revenue, foodcost, lc}
+}
+_targets_cache = {"at": None, "targets": None}  # последняя загрузка целей (в том числе неудачная)
+_lock = threading.Lock()
+
+
+def _parse_month(value):
+    """'2026-10', '10.2026', '01.10.2026', '10/2026' -> '2026-10'; иначе None."""
+    text = str(value).strip()
+    match = re.fullmatch(r"(\d{4})-(\d{1,2})(?:-\d{1,2})?", text)
+    if match:
+        year, month = match.groups()
+    else:
+        match = re.fullmatch(r"(?:\d{1,2}\.)?(\d{1,2})[./](\d{4})", text)
+        if not match:
+            return None
+        month, year = match.groups()
+    if not 1 <= int(month) <= 12:
+        return None
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def parse_targets(records):
+    """Строки листа целей -> {('YYYY-MM', менеджер или None): {цель: float}}."""
+    targets = {}
+    for record in records:
+        fields = {str(key).lower().strip(): value for key, value in record.items()}
+        month = _parse_month(fields.get("месяц", ""))
+        if month is None:
+            continue
+        manager = str(fields.get("менеджер", "")).strip() or RESTAURANT
+        values = {}
+        for header, value in fields.items():
+            for prefix, key in TARGET_COLUMNS.items():
+                number = parse_decimal(value) if header.startswith(prefix) else None
+                if number is not None:
+                    values[key] = float(number)
+        if values:
+            targets[(month, manager)] = values
+    return targets
+
+
+def load_targets():
+    """
+    Цели из листа TARGETS_SHEET_NAME управляющей таблицы; если листа нет — None.
+    И цели, и отсутствие листа запоминаются на MANAGEMENT_CACHE_SECONDS: без этого
+    каждая синхронизация снова ходила бы в таблицу и писала предупреждение.
+    """
+    with _lock:
+        if _targets_cache["at"] is not None and time.monotonic() - _targets_cache["at"] < MANAGEMENT_CACHE_SECONDS:
+            return _targets_cache["targets"]
+    try:
+        records, _ = fetch_records(MANAGEMENT_SHEET_ID, TARGETS_SHEET_NAME,
+                                   max_age_seconds=MANAGEMENT_CACHE_SECONDS)
+        targets = parse_targets(records)
+    except Exception as e:
+        logger.warning("Не удалось загрузить цели (%s): %s", TARGETS_SHEET_NAME, e)
+        targets = None
+    with _lock:
+        _targets_cache.update(at=time.monotonic(), targets=targets)
+    return targets
+
+
+def _month_bounds(year, month):
+    return datetime(year, month, 1), datetime(year, month, calendar.monthrange(year, month)[1])
+
+
+def day_sums(df, start, end):
+    """
+    Суммы по дням [start, end] по ресторану и по менеджерам:
+    {(день, менеджер или RESTAURANT): {revenue, salary, foodcost_sum, foodcost_count}}.
+    Только срез из отсортированного кадра (dataset.date_slice).
+    """
+    rows = date_slice(df, start, end) if not df.empty and "Дата" in df.columns else df.iloc[0:0]
+    if rows.empty:
+        return {}
+    metrics = metric_columns(rows)
+    managers = rows["Менеджер"].astype(object) if "Менеджер" in rows.columns else pd.Series(None, index=rows.index)
+    frame = pd.DataFrame({
+        "day": rows["Дата"].dt.normalize(),
+        "manager": managers.where(managers.isna(), managers.astype(str).str.strip()),
+        "revenue": metrics["revenue"],
+        "salary": metrics["salary"],
+        "foodcost_sum": metrics["foodcost"],
+        "foodcost_count": metrics["foodcost"],
+    })
+    aggregations = {"revenue": "sum", "salary": "sum", "foodcost_sum": "sum", "foodcost_count": "count"}
+    sums = {}
+    for day, values in frame.groupby("day").agg(aggregations).iterrows():
+        sums[(day, RESTAURANT)] = values.to_dict()
+    by_manager = frame.dropna(subset=["manager"]).groupby(["day", "manager"]).agg(aggregations)
+    for (day, manager), values in by_manager.iterrows():
+        sums[(day, manager)] = values.to_dict()
+    return sums
+
+
+def sum_days(days):
+    """Дневные суммы -> итоги с начала месяца (с числом дней с данными) и последний день."""
+    totals = {}
+    for (day, who), values in days.items():
+        item = totals.setdefault(who, {"revenue": 0.0, "salary": 0.0, "foodcost_sum": 0.0,
+                                       "foodcost_count": 0, "days": 0})
+        item["revenue"] += float(values["revenue"])
+        item["salary"] += float(values["salary"])
+        item["foodcost_sum"] += float(values["foodcost_sum"])
+        item["foodcost_count"] += int(values["foodcost_count"])
+        item["days"] += 1
+    return totals, max((day for day, _ in days), default=None)
+
+
+def month_totals(df, year, month):
+    """
+    Итоги месяца с начала по ресторану и по менеджерам: выручка, ЗП, фудкост (сумма и число
+    значений), дней с данными.
+    """
+    return sum_days(day_sums(df, *_month_bounds(year, month)))
+
+
+@register_sync_hook
+def _update(df, version):
+    """
+    После синхронизации пересчитываются только дни текущего месяца, которые журнал
+    изменений (changelog.changes_for) отметил добавленными, изменёнными или удалёнными;
+    весь месяц — при первом расчёте, в новом месяце и без журнала.
+    Цели — из кэша управляющей таблицы.
+    """
+    now = datetime.now()
+    month = now.strftime("%Y-%m")
+    changes = changes_for(df, version) if version is not None else None
+    with _lock:
+        days = dict(_state["days"]) if _state["month"] == month else None
+    if days is None or changes is None or changes["initial"]:
+        days = day_sums(df, *_month_bounds(now.year, now.month))
+    else:
+        touched = {pd.Timestamp(date) for date in changes["dates"] if date[:7] == month}
+        days = {key: values for key, values in days.items() if key[0] not in touched}
+        for day in touched:
+            days.update(day_sums(df, day, day))
+    totals, last_day = sum_days(days)
+    targets = load_targets()
+    with _lock:
+        _state.update(month=month, days=days, totals=totals, last_day=last_day)
+        if targets is not None:
+            _state["targets"] = targets
+
+
+def _current_state():
+    """Итоги и цели последней синхронизации; в новом месяце — пересчёт по уже загруженным данным."""
+    df = get_data()
+    with _lock:
+        fresh = _state["month"] == datetime.now().strftime("%Y-%m")
+    if not fresh:
+        _update(df, None)
+    with _lock:
+        return dict(_state)
+
+
+def pace(manager=RESTAURANT, state=None):
+    """
+    Темп месяца по готовым итогам (постоянная стоимость): выручка с начала месяца,
+    средняя в день, прогноз на конец месяца, отставание от цели и нужный темп
+    на оставшиеся дни, фудкост и LC против лимитов. None — нет данных за месяц.
+    """
+    state = state or _current_state()
+    totals = state["totals"].get(manager)
+    if not totals or state["last_day"] is None:
+        return None
+    year, month = int(state["month"][:4]), int(state["month"][5:7])
+    days_in_month = calendar.monthrange(year, month)[1]
+    elapsed = state["last_day"].day
+    remaining = days_in_month - elapsed
+    target = state["targets"].get((state["month"], manager), {})
+
+    daily = totals["revenue"] / elapsed
+    result = {
+        "month": state["month"],
+        "last_day": state["last_day"],
+        "revenue": totals["revenue"],
+        "daily": daily,
+        "projected": daily * days_in_month,
+        "remaining_days": remaining,
+        "target": target.get("revenue"),
+        "foodcost": (display_value(totals["foodcost_sum"] / totals["foodcost_count"], "foodcost")
+                     if totals["foodcost_count"] else None),
+        "foodcost_limit": target.get("foodcost"),
+        "lc": totals["salary"] / totals["revenue"] * 100 if totals["revenue"] else None,
+        "lc_limit": target.get("lc"),
+    }
+    if result["target"]:
+        result["done_share"] = totals["revenue"] / result["target"] * 100
+        result["gap"] = result["projected"] - result["target"]
+        result["required_daily"] = (max(result["target"] - totals["revenue"], 0) / remaining) if remaining else None
+    return result
+
+
+def _limit_text(value, limit):
+    if value is None:
+        return "—"
+    if limit is None:
+        return f"{value:.1f}%"
+    emoji = "🙂" if value <= limit else "🙁"
+    return f"{value:.1f}% (лимит {limit:g}%) {emoji}"
+
+
+def _signed_ruble(value):
+    return ("+" if value >= 0 else "−") + format_ruble(abs(value))
+
+
+def pace_line(state=None):
+    """Одна строка темпа для /analyze ('' — цели на месяц нет)."""
+    result = pace(state=state)
+    if not result or not result.get("target"):
+        return ""
+    return (f"\n🎯 Темп месяца: {result['done_share']:.0f}% цели, "
+            f"прогноз {_signed_ruble(result['gap'])} к цели")
+
+
+def pace_report(manager=None):
+    """Текст для /pace [менеджер]: темп ресторана или одного менеджера к целям месяца."""
+    state = _current_state()
+    name = manager.strip() if manager else RESTAURANT
+    if name is not RESTAURANT:
+        name = next((key for key in state["totals"] if key and key.lower() == name.lower()), name)
+    result = pace(name, state)
+    if result is None:
+        who = f" у менеджера {name}" if name else ""
+        return f"⚠️ Нет данных{who} за текущий месяц."
+
+    title = datetime.strptime(result["month"], "%Y-%m").strftime("%B %Y")
+    lines = [f"🎯 Темп за {title}{f' — {name}' if name else ''} (по {result['last_day'].strftime('%d.%m')})"]
+    if result["target"]:
+        lines += [
+            f"📊 Выручка: {format_ruble(result['revenue'])} из {format_ruble(result['target'])} "
+            f"({result['done_share']:.0f}%)",
+            f"📈 Темп: {format_ruble(result['daily'])}/день → прогноз {format_ruble(result['projected'])} "
+            f"({_signed_ruble(result['gap'])} к цели)",
+        ]
+        if result["required_daily"] is not None:
+            lines.append(f"🏃 Нужно: {format_ruble(result['required_daily'])}/день "
+                         f"в оставшиеся {result['remaining_days']} дн.")
+    else:
+        lines += [
+            f"📊 Выручка: {format_ruble(result['revenue'])} (цель на месяц не задана)",
+            f"📈 Темп: {format_ruble(result['daily'])}/день → прогноз {format_ruble(result['projected'])}",
+        ]
+    lines += [
+        f"🍔 Фудкост: {_limit_text(result['foodcost'], result['foodcost_limit'])}",
+        f"🪑 LC (смены): {_limit_text(result['lc'], result['lc_limit'])}",
+    ]
+    if name is RESTAURANT:
+        managers = [key for key in state["totals"] if key is not RESTAURANT]
+        manager_lines = []
+        for key in managers:
+            item = pace(key, state)
+            if item and item.get("target"):
+                manager_lines.append(f"👤 {key}: {item['done_share']:.0f}% цели, прогноз {_signed_ruble(item['gap'])}")
+        if manager_lines:
+            lines += [""] + manager_lines
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+# params_history.py
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+
+from config import PARAMS_DB
+from utils import get_management_snapshot
+from sync import register_sync_hook
+
+logger = logging.getLogger(__name__)
+
+# Первое записанное значение параметра считается действующим «всегда»:
+# до начала версионирования других сведений об истории нет
+FIRST_VALID_FROM = "2000-01-01"
+# Явно очищенное значение в истории: отличается от «в эту дату не менялось» (NaN) при протяжке вперёд
+CLEARED = float("-inf")
+
+_lock = threading.Lock()
+_last_change = {"version": None}  # последняя синхронизация, в которой менялись параметры
+
+
+def _connect():
+    os.makedirs(os.path.dirname(PARAMS_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(PARAMS_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS management_params ("
+        " name TEXT NOT NULL,"
+        " col TEXT NOT NULL,"
+        " value TEXT,"
+        " valid_from TEXT NOT NULL,"
+        " PRIMARY KEY (name, col, valid_from))"
+    )
+    return conn
+
+
+def record_snapshot(snapshot, today=None):
+    """
+    Записывает изменившиеся параметры управляющей таблицы с датой начала действия.
+    Параметр, пропавший из таблицы, записывается очищенным (NULL).
+    Возвращает список (строка, столбец) с изменениями.
+    """
+    if not snapshot:
+        # Пустой снимок — таблица не прочиталась, а не очищена целиком
+        return []
+    valid_from = (today or datetime.now()).strftime("%Y-%m-%d")
+    changed = []
+    with _lock, _connect() as conn:
+        current = {}
+        for name, col, value in conn.execute(
+                "SELECT name, col, value FROM management_params p WHERE valid_from ="
+                " (SELECT MAX(valid_from) FROM management_params q WHERE q.name = p.name AND q.col = p.col)"):
+            current[(name, col)] = value
+        # Только самый первый снимок действует «всегда»; всё, что появилось позже, — с даты появления
+        first = not current
+        rows = []
+        for name, columns in snapshot.items():
+            for col, value in columns.items():
+                text = None if value is None else str(value)
+                if current.get((name, col)) == text:
+                    continue
+                if first:
+                    if text is not None:
+                        rows.append((name, col, text, FIRST_VALID_FROM))
+                    continue
+                rows.append((name, col, text, valid_from))
+                changed.append((name, col))
+        for name, col in current:
+            if current[(name, col)] is not None and col not in snapshot.get(name, {}):
+                rows.append((name, col, None, valid_from))
+                changed.append((name, col))
+        conn.executemany(
+            "INSERT OR REPLACE INTO management_params (name, col, value, valid_from) VALUES (?, ?, ?, ?)", rows)
+    return changed
+
+
+@register_sync_hook
+def _record_on_sync(df, version):
+    changed = record_snapshot(get_management_snapshot())
+    if changed:
+        _last_change["version"] = version
+        logger.info("Изменились параметры управляющей таблицы: %s", changed)
+
+
+def changed_in(version):
+    """Менялись ли параметры управляющей таблицы в синхронизации version."""
+    return version is not None and _last_change["version"] == version
+
+
+def load_params():
+    """Вся история параметров: name, col, value (float), valid_from (datetime)."""
+    with _lock, _connect() as conn:
+        history = pd.read_sql_query("SELECT name, col, value, valid_from FROM management_params", conn)
+    history["value"] = pd.to_numeric(history["value"], errors="coerce")
+    history["valid_from"] = pd.to_datetime(history["valid_from"])
+    return history
+
+
+def effective_lookup(as_of_dates, index=None):
+    """
+    Параметры, действовавшие на каждую дату as_of_dates (например, конец месяца):
+    одна таблица «дата изменения -> все параметры» и один merge_asof.
+    Очищенный в таблице параметр с даты очистки — NaN, прежнее значение не протягивается.
+    Возвращает lookup(name, column) -> Series (по index) или None, как в pnl.snapshot_lookup.
+    """
+    history = load_params()
+    index = index if index is not None else pd.RangeIndex(len(as_of_dates))
+    if history.empty:
+        return None
+    history["value"] = history["value"].fillna(CLEARED)
+    wide = (history.pivot_table(index="valid_from", columns=["name", "col"], values="value", aggfunc="last")
+            .sort_index().ffill().replace(CLEARED, float("nan")))
+    wide.columns = [f"{name}|{col}" for name, col in wide.columns]
+    dates = pd.DataFrame({"as_of": pd.to_datetime(list(as_of_dates))}).reset_index()
+    merged = pd.merge_asof(dates.sort_values("as_of"), wide, left_on="as_of", right_index=True)
+    merged = merged.sort_values("index").set_index(index)
+    known = set(wide.columns)
+
+    def lookup(name, column):
+        key = f"{name.lower().strip()}|{column}"
+        if key not in known:
+            return None
+        series = merged[key]
+        return None if series.isna().all() else series
+    return lookup
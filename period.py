@@ -0,0 +1,168 @@
+# period.py
+
+import calendar
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from forecast import pnl_report
+from pnl import display_value
+from utils import format_ruble, metric_columns
+from sync import register_sync_hook, get_data, get_version
+
+# Метрики с префиксными суммами: имя -> способ агрегации за период
+PREFIX_METRICS = {
+    "revenue": "sum",
+    "bar": "sum",
+    "kitchen": "sum",
+    "salary": "sum",
+    "hall": "sum",
+    "delivery": "sum",
+    "avg_check": "mean",
+    "depth": "mean",
+    "foodcost": "mean",
+    "discount": "mean",
+}
+
+_prefix = {"version": None, "data": None}
+
+
+def build_prefix_sums(df):
+    """
+    Префиксные суммы по каждой метрике (строки отсортированы по дате):
+    sums[i] и counts[i] — сумма и число непустых значений в первых i строках.
+    Итог или среднее за любой диапазон — разность двух элементов.
+    """
+    if not df.empty and not df["Дата"].is_monotonic_increasing:
+        df = df.sort_values("Дата", kind="stable")
+    dates = df["Дата"].to_numpy(dtype="datetime64[ns]") if not df.empty else np.array([], dtype="datetime64[ns]")
+    sums, counts = {}, {}
+    if not df.empty:
+        for name, series in metric_columns(df).items():
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+            present = ~np.isnan(values)
+            sums[name] = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+            counts[name] = np.concatenate(([0], np.cumsum(present)))
+    new_day = np.ones(len(dates), dtype=bool)
+    if len(dates) > 1:
+        new_day[1:] = dates[1:] != dates[:-1]
+    return {
+        "dates": dates,
+        "sums": sums,
+        "counts": counts,
+        "days": np.concatenate(([0], np.cumsum(new_day))),
+    }
+
+
+@register_sync_hook
+def _rebuild_prefix(df, version):
+    _prefix["data"] = build_prefix_sums(df)
+    _prefix["version"] = version
+
+
+def get_prefix_sums():
+    """Префиксные суммы для последней синхронизации."""
+    get_data()
+    if _prefix["version"] != get_version():
+        _rebuild_prefix(get_data(), get_version())
+    return _prefix["data"]
+
+
+def range_stats(prefix, start, end):
+    """Итоги метрик за [start, end] включительно: O(log n) поиск границ + O(1) на метрику."""
+    lo = np.searchsorted(prefix["dates"], np.datetime64(pd.Timestamp(start)), side="left")
+    hi = np.searchsorted(prefix["dates"], np.datetime64(pd.Timestamp(end) + timedelta(days=1)), side="left")
+    # Граница lo — первая строка своего дня, поэтому разность days даёт число различных дней
+    stats = {"rows": int(hi - lo), "days": int(prefix["days"][hi] - prefix["days"][lo])}
+    for name, how in PREFIX_METRICS.items():
+        total = prefix["sums"][name][hi] - prefix["sums"][name][lo]
+        count = prefix["counts"][name][hi] - prefix["counts"][name][lo]
+        if how == "sum":
+            stats[name] = total if count else np.nan
+        else:
+            stats[name] = total / count if count else np.nan
+    return stats
+
+
+def _parse_date(text):
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Не удалось разобрать дату '{text}'. Формат: ГГГГ-ММ-ДД или ДД.ММ.ГГГГ")
+
+
+def parse_period(args, today=None):
+    """
+    Аргументы команды -> (начало, конец) включительно.
+    Поддерживаются: 'week', 'month', 'quarter', 'year', 'prev' (прошлый месяц),
+    одна дата или две даты.
+    """
+    today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    if not args:
+        return today.replace(day=1), today
+    keyword = args[0].lower()
+    if keyword == "week":
+        return today - timedelta(days=today.weekday()), today
+    if keyword == "month":
+        return today.replace(day=1), today
+    if keyword == "quarter":
+        first_month = (today.month - 1) // 3 * 3 + 1
+        return today.replace(month=first_month, day=1), today
+    if keyword == "year":
+        return today.replace(month=1, day=1), today
+    if keyword in ("previous", "last", "prev"):
+        last_day_prev_month = today.replace(day=1) - timedelta(days=1)
+        return last_day_prev_month.replace(day=1), last_day_prev_month
+    start = _parse_date(args[0])
+    end = _parse_date(args[1]) if len(args) > 1 else start
+    if end < start:
+        start, end = end, start
+    return start, end
+
+
+def month_fraction(start, end):
+    """Сколько месяцев покрывает [start, end]: полный месяц = 1, частичный — доля дней."""
+    total = 0.0
+    current = start
+    while current <= end:
+        days_in_month = calendar.monthrange(current.year, current.month)[1]
+        month_end = current.replace(day=days_in_month)
+        last = min(month_end, end)
+        total += ((last - current).days + 1) / days_in_month
+        current = month_end + timedelta(days=1)
+    return total
+
+
+def period_report(args):
+    """Отчёт за произвольный период: метрики в стиле analyze и P&L (forecast.pnl_report)."""
+    start, end = parse_period(args)
+    stats = range_stats(get_prefix_sums(), start, end)
+    header = f"📅 Период: {start.strftime('%d.%m.%Y')} – {end.strftime('%d.%m.%Y')}"
+    if stats["rows"] == 0:
+        return f"{header}\n\n⚠️ Нет данных за период."
+
+    total = stats["revenue"]
+    hall_share = (stats["hall"] / total * 100) if total else 0
+    delivery_share = (stats["delivery"] / total * 100) if total else 0
+    metrics = (
+        f"{header} ({stats['days']} дн.)\n\n"
+        f"📊 Выручка: {format_ruble(total)} (Бар: {format_ruble(stats['bar'])} + Кухня: {format_ruble(stats['kitchen'])})\n"
+        f"📈 В среднем за день: {format_ruble(total / stats['days'])}\n"
+        f"🧾 Ср.чек: {format_ruble(stats['avg_check'])}\n"
+        f"📏 Глубина: {display_value(stats['depth'], 'depth'):.1f}\n"
+        f"🪑 ЗП зал: {format_ruble(stats['hall'])}\n"
+        f"📦 Доставка: {format_ruble(stats['delivery'])} ({delivery_share:.1f}%)\n"
+        f"📊 Доля ЗП зала: {hall_share:.1f}%\n"
+        f"🍔 Фудкост: {display_value(stats['foodcost'], 'foodcost'):.1f}%\n"
+        f"💸 Скидка: {display_value(stats['discount'], 'discount'):.1f}%"
+    )
+    totals = {
+        "revenue": total,
+        "salary": stats["salary"],
+        "foodcost": stats["foodcost"],
+        "delivery": stats["delivery"],
+    }
+    pnl = pnl_report(totals, "P&L за период", fixed_scale=month_fraction(start, end), as_of=end)
+    return f"{metrics}\n\n{pnl}"
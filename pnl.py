@@ -0,0 +1,158 @@
+# pnl.py
+
+import pandas as pd
+
+from utils import get_management_snapshot
+
+# Модель единиц: как значение из таблицы превращается в долю от базы.
+# divisor — делитель доли, auto — если значение больше 100, оно введено
+# в более мелких единицах и сначала делится на auto.
+UNITS = {
+    "percent": {"divisor": 100, "auto": None},         # 5 -> 5%
+    "permille": {"divisor": 1000, "auto": None},       # 15 -> 1.5%
+    "percent_auto": {"divisor": 100, "auto": 100},     # 5 или 500 -> 5%
+    "permille_auto": {"divisor": 1000, "auto": 1000},  # 15 или 15000 -> 1.5%
+    "tenths": {"divisor": 10, "auto": None},           # 35 -> 3.5 (не доля: глубина чека в позициях)
+}
+# Колонки операционной таблицы в десятых: фудкост и скидка 235 -> 23.5%, глубина 35 -> 3.5
+DATA_UNITS = {"foodcost": "permille", "discount": "permille", "depth": "tenths"}
+
+# Строки P&L в порядке расчёта.
+# base — от чего считается доля: revenue, delivery, salary (уже посчитанная строка ЗП), profit;
+# param — названия строк управляющей таблицы (берётся первое найденное, столбец 'Процент');
+# data — доля берётся из данных периода (средний фудкост), а не из управляющей таблицы;
+# fixed — сумма из столбца 'Сумма', за период масштабируется долей месяца;
+# add_base — к строке прибавляется база из итогов периода (ЗП по сменам + фикс).
+COST_LINES = [
+    {"key": "salary", "fixed": "ЗП упр", "add_base": "salary",
+     "warning": "❗ Не удалось получить фикс. зарплату из управляющей таблицы.\n"},
+    {"key": "foodcost", "base": "revenue", "data": "foodcost", "unit": "permille"},
+    {"key": "franchise", "base": "revenue", "param": ["Франшиза"], "unit": "percent",
+     "warning": "❗ Не удалось получить процент по франшизе.\n"},
+    {"key": "writeoff", "base": "revenue", "param": ["Процент списания"], "unit": "permille",
+     "warning": "❗ Не удалось получить процент списания.\n"},
+    {"key": "hozy", "base": "revenue", "param": ["Процент хозы", "Хозы"], "unit": "percent",
+     "warning": "❗ Не удалось получить процент хозрасходов.\n"},
+    {"key": "delivery", "base": "delivery", "param": ["Процент доставка"], "unit": "percent_auto",
+     "warning": "❗ Не удалось получить процент по доставке.\n"},
+    {"key": "acquiring", "base": "revenue", "param": ["Эквайринг"], "unit": "permille_auto",
+     "warning": "❗ Не удалось получить процент эквайринга.\n"},
+    {"key": "bank_commission", "base": "revenue", "param": ["Комиссия Банка"], "unit": "permille_auto",
+     "warning": "❗ Не удалось получить процент комиссии банка.\n"},
+    {"key": "permanent", "fixed": "Постоянные",
+     "warning": "❗ Не удалось получить значение постоянных расходов.\n"},
+    {"key": "salary_tax", "base": "salary", "param": ["Налоги ЗП"], "unit": "percent",
+     "warning": "❗ Не удалось получить процент по налогам ЗП.\n"},
+]
+TAX_LINE = {"key": "usn", "base": "profit", "param": ["УСН"], "unit": "percent",
+            "warning": "❗ Не удалось получить процент УСН.\n"}
+
+# Порядок предупреждений в отчёте (как в прежнем отчёте прогноза)
+WARNING_ORDER = ["franchise", "writeoff", "hozy", "salary", "delivery", "acquiring",
+                 "bank_commission", "permanent", "salary_tax", "usn"]
+
+
+def snapshot_lookup(snapshot=None):
+    """
+    Параметры из одного снимка управляющей таблицы: (строка, столбец) -> float или None.
+    parse_decimal только разбирает ячейку ('3,2%', '100 000'); сам P&L считается во float64.
+    """
+    snapshot = get_management_snapshot() if snapshot is None else snapshot
+
+    def lookup(name, column):
+        value = snapshot.get(name.lower().strip(), {}).get(column)
+        return None if value is None else float(value)
+    return lookup
+
+
+def _find_param(lookup, names, column):
+    for name in names:
+        value = lookup(name, column)
+        if value is not None:
+            return value
+    return None
+
+
+def normalize(values, unit):
+    """Значения из таблицы -> (доля от базы, процент для отчёта). Работает и с числами, и с Series."""
+    rule = UNITS[unit]
+    if rule["auto"]:
+        if isinstance(values, pd.Series):
+            values = values.where(values <= 100, values / rule["auto"])
+        elif values > 100:
+            values = values / rule["auto"]
+    return values / rule["divisor"], values / (rule["divisor"] / 100)
+
+
+def display_value(values, metric):
+    """Значение колонки данных (ключ DATA_UNITS) для отчёта: процент для долей, иначе само число."""
+    unit = DATA_UNITS[metric]
+    share, percent = normalize(values, unit)
+    return share if unit == "tenths" else percent
+
+
+def calculate(totals, lookup=None, fixed_scale=1.0):
+    """
+    P&L за много периодов за один векторный проход.
+    totals — DataFrame (строка = период) с колонками revenue, salary, foodcost, delivery;
+    lookup(name, column) — параметры управляющей таблицы: число, Series по периодам или None;
+    fixed_scale — доля месяца для фиксированных сумм (число или Series).
+    Возвращает (DataFrame со строками P&L, процентами и итогами, текст предупреждений).
+    """
+    lookup = lookup or snapshot_lookup()
+    result = pd.DataFrame(index=totals.index)
+    bases = {"revenue": totals["revenue"], "delivery": totals["delivery"]}
+    warnings = {}
+
+    def evaluate(line):
+        key = line["key"]
+        if "fixed" in line:
+            amount = lookup(line["fixed"], "Сумма")
+            if amount is None:
+                warnings[key] = line["warning"]
+                amount = 0.0
+            elif isinstance(amount, pd.Series) and amount.isna().any():
+                warnings[key] = line["warning"]
+                amount = amount.fillna(0.0)
+            amount = amount * fixed_scale
+            if "add_base" in line:
+                amount = totals[line["add_base"]] + amount
+            result[key] = amount
+            return
+        if "data" in line:
+            raw = totals[line["data"]]
+        else:
+            raw = _find_param(lookup, line["param"], "Процент")
+        if raw is None:
+            warnings[key] = line["warning"]
+            result[key] = 0.0 * bases[line["base"]]
+            result[f"{key}_percent"] = None
+            return
+        if isinstance(raw, pd.Series) and "data" not in line and raw.isna().any():
+            warnings[key] = line["warning"]
+            raw = raw.fillna(0.0)
+        rate, percent = normalize(raw, line["unit"])
+        result[key] = bases[line["base"]] * rate
+        result[f"{key}_percent"] = percent
+
+    for line in COST_LINES:
+        evaluate(line)
+        if line["key"] == "salary":
+            bases["salary"] = result["salary"]
+
+    cost_keys = [line["key"] for line in COST_LINES]
+    # skipna=False: нет фудкоста за период — нет и прибыли, как раньше
+    result["total_costs"] = result[cost_keys].sum(axis=1, skipna=False)
+    result["profit"] = totals["revenue"] - result["total_costs"]
+    bases["profit"] = result["profit"]
+    evaluate(TAX_LINE)
+    result["profit_after_usn"] = result["profit"] - result["usn"]
+
+    revenue = totals["revenue"]
+    nonzero = revenue.where(revenue != 0)
+    for key in ("salary", "franchise", "writeoff", "hozy"):
+        result[f"{key}_share"] = (result[key] / nonzero * 100).fillna(0.0)
+    result["revenue"] = revenue
+
+    text = "".join(warnings[key] for key in WARNING_ORDER if key in warnings)
+    return result, text
@@ -0,0 +1,66 @@
+# profiling.py
+
+import io
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+
+PROFILE_TOP_FUNCTIONS = 30    # Строк в списке функций по накопленному времени
+PROFILE_TOP_ALLOCATIONS = 20  # Строк в списке мест выделения памяти
+TRACEMALLOC_FRAMES = 5        # Глубина стека для мест выделения
+
+_lock = threading.Lock()  # tracemalloc общий на процесс: два профиля сразу испортили бы друг другу замеры
+
+
+class ProfilingBusyError(Exception):
+    """Уже идёт другое профилирование."""
+
+
+def profile_call(func, *args):
+    """
+    Один вызов func(*args) под cProfile и tracemalloc; возвращает (результат, текст отчёта).
+    Вне этой функции профилировщики не включены и ничего не стоят.
+    cProfile видит только текущий поток, tracemalloc — выделения всех потоков за время вызова.
+    Одновременно идёт только одно профилирование, иначе — ProfilingBusyError.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilingBusyError()
+    try:
+        return _profile_call(func, *args)
+    finally:
+        _lock.release()
+
+
+def _profile_call(func, *args):
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        result = profiler.runcall(func, *args)
+    finally:
+        elapsed = time.perf_counter() - started
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    noise = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+    allocations = after.filter_traces(noise).compare_to(before.filter_traces(noise), "lineno")
+
+    lines = [
+        f"Время: {elapsed:.3f} с",
+        f"Пик памяти (tracemalloc): {peak / 1024 / 1024:.1f} МБ",
+        "",
+        f"=== Топ {PROFILE_TOP_ALLOCATIONS} мест выделения памяти (прирост за вызов) ===",
+    ]
+    lines += [str(stat) for stat in allocations[:PROFILE_TOP_ALLOCATIONS]]
+    lines += ["", f"=== Топ {PROFILE_TOP_FUNCTIONS} функций по накопленному времени ===", functions.getvalue()]
+    return result, "\n".join(lines)
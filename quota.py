@@ -0,0 +1,127 @@
+# quota.py
+
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from config import SHEETS_READS_PER_MINUTE, QUOTA_RESERVE, QUOTA_MAX_WAIT_SECONDS
+
+# Полосы приоритета: меньше число — раньше обслуживается
+LANES = {
+    "scheduled": 0,    # отчёт в 9:30, подписки, оповещения наблюдателя
+    "background": 1,   # фоновые опросы и импорт
+    "interactive": 2,  # команды пользователей (по умолчанию)
+}
+DEFAULT_LANE = "interactive"
+
+_local = threading.local()
+
+
+class QuotaExhaustedError(Exception):
+    """Бюджет запросов к Google исчерпан, а ждать дольше нельзя."""
+
+
+@contextmanager
+def lane(name):
+    """Все чтения из Google внутри блока (в этом потоке) идут по полосе name."""
+    previous = getattr(_local, "lane", None)
+    _local.lane = name
+    try:
+        yield
+    finally:
+        _local.lane = previous
+
+
+def in_lane(name, func):
+    """Обёртка для задач планировщика: func выполняется в полосе name."""
+    def wrapper(*args, **kwargs):
+        with lane(name):
+            return func(*args, **kwargs)
+    wrapper.__name__ = getattr(func, "__name__", "job")
+    return wrapper
+
+
+def current_lane():
+    return getattr(_local, "lane", None) or DEFAULT_LANE
+
+
+class QuotaBudget:
+    """
+    Корзина токенов на чтения Sheets (квота Google — запросов в минуту на проект).
+    Ждущие обслуживаются строго по приоритету полосы, внутри полосы — по очереди.
+    Полосам ниже главной недоступен резерв reserve * capacity: он всегда
+    остаётся для плановых отчётов.
+    """
+
+    def __init__(self, per_minute, reserve):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.reserve = self.capacity * reserve
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiting = []  # куча (приоритет, номер) ждущих
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _shortage(self, cost, lane_name):
+        """Сколько токенов не хватает полосе на cost запросов (0 — хватает)."""
+        floor = 0.0 if LANES[lane_name] == 0 else self.reserve
+        return max(0.0, min(cost, self.capacity - floor) + floor - self._tokens)
+
+    def available(self, cost, lane_name=None):
+        """Хватит ли бюджета прямо сейчас, без очереди (ничего не списывает)."""
+        lane_name = lane_name or current_lane()
+        with self._cond:
+            self._refill()
+            ahead = self._waiting and self._waiting[0][0] <= LANES[lane_name]
+            return not ahead and self._shortage(cost, lane_name) == 0
+
+    def acquire(self, cost, lane_name=None, timeout=QUOTA_MAX_WAIT_SECONDS):
+        """
+        Списывает cost запросов, при нехватке — ждёт в очереди своей полосы.
+        Возвращает False, если за timeout секунд очередь не дошла.
+        """
+        lane_name = lane_name or current_lane()
+        ticket = (LANES[lane_name], next(self._counter))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    shortage = self._shortage(cost, lane_name)
+                    if self._waiting[0] == ticket and shortage == 0:
+                        self._tokens -= cost
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    # Первый в очереди ждёт пополнения, остальные — своей очереди
+                    self._cond.wait(min(remaining, shortage / self.rate) if self._waiting[0] == ticket and shortage
+                                    else remaining)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def spend(self, cost):
+        """Списывает cost без ожидания (повторы уже начатой загрузки); баланс может уйти в минус."""
+        with self._cond:
+            self._refill()
+            self._tokens -= cost
+
+    def snapshot(self):
+        with self._cond:
+            self._refill()
+            return {"tokens": round(self._tokens, 1), "capacity": self.capacity, "waiting": len(self._waiting)}
+
+
+# Общий бюджет процесса на чтения Google Sheets
+sheets_budget = QuotaBudget(SHEETS_READS_PER_MINUTE, QUOTA_RESERVE)
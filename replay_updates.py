@@ -0,0 +1,71 @@
+# replay_updates.py
+#
+# Проигрывает записанные обновления Telegram (RECORD_UPDATES_FILE, JSON по строке)
+# в webhook бота и меряет пропускную способность приёма:
+#   python replay_updates.py updates.jsonl http://127.0.0.1:8443/telegram --secret ... --concurrency 8 --repeat 10
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+def load_updates(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(updates, url, secret="", concurrency=4, repeat=1):
+    """Отправляет обновления POST-запросами; возвращает (длительности запросов в сек., ошибки, общее время)."""
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    session = requests.Session()
+    # Разные update_id, чтобы повторы выглядели как новые обновления
+    payloads = []
+    for round_no in range(repeat):
+        for update in updates:
+            payloads.append(dict(update, update_id=update.get("update_id", 0) + round_no * 1_000_000))
+
+    def post(payload):
+        started = time.perf_counter()
+        try:
+            response = session.post(url, json=payload, headers=headers, timeout=30)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(post, payloads))
+    total = time.perf_counter() - started
+    durations = sorted(duration for duration, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    return durations, errors, total
+
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проигрывание записанных обновлений в webhook бота")
+    parser.add_argument("file", help="файл с обновлениями (JSON по строке)")
+    parser.add_argument("url", help="адрес webhook, например http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", default="", help="секретный токен webhook (WEBHOOK_SECRET)")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных запросов")
+    parser.add_argument("--repeat", type=int, default=1, help="сколько раз проиграть файл")
+    args = parser.parse_args()
+
+    updates = load_updates(args.file)
+    if not updates:
+        print("⚠️ В файле нет обновлений")
+        sys.exit(1)
+    durations, errors, total = replay(updates, args.url, args.secret, args.concurrency, args.repeat)
+    print(f"Отправлено: {len(durations)}, ошибок: {errors}, за {total:.2f} с")
+    print(f"Пропускная способность: {len(durations) / total:.1f} обновл./с")
+    print(f"Задержка p50: {percentile(durations, 0.5) * 1000:.1f} мс, "
+          f"p95: {percentile(durations, 0.95) * 1000:.1f} мс, max: {durations[-1] * 1000:.1f} мс")
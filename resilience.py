@@ -0,0 +1,101 @@
+# resilience.py
+
+import time
+import random
+import logging
+import threading
+import requests
+import gspread
+import httpx
+
+from sheets_async import SheetsAPIError
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Выключатель разомкнут: к Google временно не обращаемся."""
+
+
+class CircuitBreaker:
+    """
+    Простой выключатель: после failure_threshold неудач подряд размыкается
+    на reset_seconds, затем пропускает один пробный запрос (half-open).
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probe_in_flight:
+                raise CircuitOpenError("Google Sheets временно недоступен")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Выключатель Google Sheets разомкнут после %s ошибок", self._failures)
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+def is_retryable(exc):
+    """Повторяем только квоты (429), ошибки сервера (5xx) и сетевые сбои."""
+    if isinstance(exc, (gspread.exceptions.APIError, SheetsAPIError)):
+        status = getattr(exc.response, "status_code", None) or exc.code
+        return status == 429 or (isinstance(status, int) and status >= 500)
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError))
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def call_with_retries(func, breaker, retries, base_delay, max_delay):
+    """
+    Вызов func() с ограниченным экспоненциальным backoff (с джиттером)
+    и учётом выключателя. Неповторяемые ошибки пробрасываются сразу.
+    """
+    breaker.before_call()
+    for attempt in range(retries + 1):
+        try:
+            result = func()
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.record_success()  # Google ответил, просто запрос неверный
+                raise
+            if attempt == retries:
+                breaker.record_failure()
+                raise
+            delay = _retry_after(e) or min(max_delay, base_delay * 2 ** attempt)
+            delay = min(max_delay, delay) * random.uniform(0.5, 1.0)
+            logger.warning("Ошибка Google (%s), повтор %s через %.1f с", e, attempt + 1, delay)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
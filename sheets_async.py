@@ -0,0 +1,175 @@
+# sheets_async.py
+
+import sys
+import time
+import asyncio
+import threading
+import importlib.util
+from datetime import datetime, timedelta, timezone
+import httpx
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request
+from gspread.utils import numericise_all
+
+from config import (
+    SHEETS_API_URL,
+    SHEETS_ANONYMOUS,
+    SHEETS_POOL_SIZE,
+    SHEETS_HTTP2,
+    SHEETS_TIMEOUT,
+    SERVICE_ACCOUNT_FILE,
+    SCOPES,
+)
+
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # Токен обновляем заранее, а не после 401
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None  # httpx умеет HTTP/2 только с пакетом h2
+
+
+class SheetsAPIError(Exception):
+    """Sheets API ответил не 200. response и code — как у gspread.APIError (см. resilience.is_retryable)."""
+
+    def __init__(self, response):
+        self.response = response
+        self.code = response.status_code
+        super().__init__(f"Sheets API {response.status_code}: {response.text[:200]}")
+
+
+def sheet_range(title):
+    """Диапазон «весь лист» в нотации A1: имя в кавычках, кавычки внутри удваиваются."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def records_from_values(values):
+    """
+    Строки values API -> список словарей, как gspread get_all_records():
+    первая строка — заголовок, короткие строки дополняются '', числа из строк разбираются.
+    """
+    if not values:
+        return []
+    width = max(len(row) for row in values)
+    rows = [list(row) + [""] * (width - len(row)) for row in values]
+    header = rows[0]
+    return [dict(zip(header, numericise_all(row))) for row in rows[1:]]
+
+
+def _needs_refresh(credentials):
+    if not credentials.token or credentials.expiry is None:
+        return True
+    now = datetime.now(timezone.utc).replace(tzinfo=None)  # expiry у google-auth — наивное UTC
+    return credentials.expiry - TOKEN_REFRESH_MARGIN <= now
+
+
+class AsyncSheetsClient:
+    """
+    Клиент values API поверх httpx.AsyncClient: один пул keep-alive соединений
+    (HTTP/2, если есть h2), токен обновляется один раз на всех и вне цикла событий,
+    листы разных таблиц читаются параллельными values:batchGet.
+    """
+
+    def __init__(self, credentials=None, base_url=SHEETS_API_URL):
+        self._credentials = credentials
+        self._http = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}/v4/spreadsheets/",
+            http2=SHEETS_HTTP2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=SHEETS_POOL_SIZE, max_keepalive_connections=SHEETS_POOL_SIZE),
+            timeout=SHEETS_TIMEOUT,
+        )
+        self._token_lock = asyncio.Lock()
+        self._titles = {}  # spreadsheet_id -> имя первого листа (аналог sheet1)
+
+    async def _auth_headers(self):
+        credentials = self._credentials
+        if credentials is None:
+            return {}
+        if _needs_refresh(credentials):
+            async with self._token_lock:
+                if _needs_refresh(credentials):  # пока ждали замок, токен мог обновить другой запрос
+                    # google-auth обновляет токен синхронно (requests) — в отдельном потоке
+                    await asyncio.to_thread(credentials.refresh, Request())
+        return {"Authorization": f"Bearer {credentials.token}"}
+
+    async def _get(self, path, params):
+        response = await self._http.get(path, params=params, headers=await self._auth_headers())
+        if response.status_code != 200:
+            raise SheetsAPIError(response)
+        return response.json()
+
+    async def first_sheet_title(self, spreadsheet_id):
+        if spreadsheet_id not in self._titles:
+            metadata = await self._get(spreadsheet_id, {"fields": "sheets.properties(title,index)"})
+            sheets = sorted(metadata["sheets"], key=lambda sheet: sheet["properties"]["index"])
+            self._titles[spreadsheet_id] = sheets[0]["properties"]["title"]
+        return self._titles[spreadsheet_id]
+
+    async def batch_get(self, spreadsheet_id, ranges):
+        """Значения нескольких диапазонов одной таблицы за один запрос; список в порядке ranges."""
+        params = [("ranges", name) for name in ranges] + [("majorDimension", "ROWS")]
+        response = await self._get(f"{spreadsheet_id}/values:batchGet", params)
+        return [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+
+    async def get_records(self, keys):
+        """
+        {(sheet_id, worksheet): records} для списка ключей как в utils.fetch_records
+        (worksheet=None — первый лист). По одному batchGet на таблицу, таблицы — параллельно.
+        """
+        by_sheet = {}
+        for sheet_id, worksheet in keys:
+            worksheets = by_sheet.setdefault(sheet_id, [])
+            if worksheet not in worksheets:
+                worksheets.append(worksheet)
+
+        async def one(sheet_id, worksheets):
+            try:
+                ranges = [sheet_range(worksheet or await self.first_sheet_title(sheet_id)) for worksheet in worksheets]
+                values = await self.batch_get(sheet_id, ranges)
+            except SheetsAPIError:
+                self._titles.pop(sheet_id, None)  # первый лист могли переименовать
+                raise
+            return {(sheet_id, worksheet): records_from_values(rows) for worksheet, rows in zip(worksheets, values)}
+
+        result = {}
+        for part in await asyncio.gather(*(one(sheet_id, ws) for sheet_id, ws in by_sheet.items())):
+            result.update(part)
+        return result
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+# --- Синхронный вход для потоков бота и планировщика ---
+# Клиент и его пул живут в собственном цикле событий в фоновом потоке:
+# соединения переиспользуются между вызовами, а не создаются в каждом asyncio.run().
+
+_runtime = {"loop": None, "client": None}
+_runtime_lock = threading.Lock()
+
+
+def _get_runtime():
+    with _runtime_lock:
+        if _runtime["loop"] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="sheets-async", daemon=True).start()
+            credentials = None if SHEETS_ANONYMOUS else service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            _runtime["client"] = AsyncSheetsClient(credentials)
+            _runtime["loop"] = loop
+        return _runtime["loop"], _runtime["client"]
+
+
+def fetch_records(keys):
+    """Блокирующая обёртка над AsyncSheetsClient.get_records (SHEETS_PROVIDER='async' в utils)."""
+    loop, client = _get_runtime()
+    return asyncio.run_coroutine_threadsafe(client.get_records(keys), loop).result()
+
+
+if __name__ == "__main__":
+    from config import SHEET_ID, MANAGEMENT_SHEET_ID, MANAGEMENT_SHEET_NAME
+
+    keys = [(SHEET_ID, None), (MANAGEMENT_SHEET_ID, MANAGEMENT_SHEET_NAME)]
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"HTTP/2: {'да' if SHEETS_HTTP2 and HTTP2_AVAILABLE else 'нет (keep-alive HTTP/1.1)'}")
+    for attempt in range(rounds):
+        started = time.perf_counter()
+        result = fetch_records(keys)
+        sizes = ", ".join(f"{worksheet or 'sheet1'}: {len(records)}" for (_, worksheet), records in result.items())
+        print(f"{attempt + 1}. {time.perf_counter() - started:.3f} с — строк {sizes}")
@@ -0,0 +1,166 @@
+# store.py
+
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+from config import ANALYTICS_DB
+from utils import metric_columns
+from sync import register_sync_hook, get_data, get_version
+from changelog import changes_for
+
+# Колонки хранилища: имя -> метрика из utils.metric_columns
+STORE_COLUMNS = ["bar", "kitchen", "salary", "hall", "delivery", "avg_check", "depth", "foodcost", "discount"]
+
+
+def _iso(day):
+    return pd.Timestamp(day).strftime("%Y-%m-%d")
+
+
+class AnalyticsStore:
+    """
+    Встроенное аналитическое хранилище (SQLite) — зеркало синхронизированных данных.
+    path=':memory:' — вариант в памяти (для проверок и локальных экспериментов).
+    """
+
+    def __init__(self, path=":memory:"):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.version = None
+        with self._lock, self._conn:
+            columns = ", ".join(f"{name} REAL" for name in STORE_COLUMNS)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS daily_data (date TEXT NOT NULL, manager TEXT, {columns})")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_date ON daily_data (date)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_manager ON daily_data (manager, date)")
+
+    def _rows(self, df):
+        rows = []
+        if not df.empty and "Дата" in df.columns:
+            metrics = metric_columns(df)
+            dates = df["Дата"].dt.strftime("%Y-%m-%d")
+            managers = df["Менеджер"] if "Менеджер" in df.columns else pd.Series(None, index=df.index)
+            values = np.column_stack([pd.to_numeric(metrics[name], errors="coerce").to_numpy(dtype=float)
+                                      for name in STORE_COLUMNS])
+            for date, manager, row in zip(dates, managers, values):
+                rows.append((date, None if pd.isna(manager) else str(manager),
+                             *[None if np.isnan(v) else float(v) for v in row]))
+        return rows
+
+    def _insert(self, rows):
+        placeholders = ", ".join("?" * (len(STORE_COLUMNS) + 2))
+        self._conn.executemany(
+            f"INSERT INTO daily_data (date, manager, {', '.join(STORE_COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def replace_all(self, df, version=None):
+        """Полностью заменяет содержимое хранилища строками df (одна транзакция)."""
+        rows = self._rows(df)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM daily_data")
+            self._insert(rows)
+        self.version = version
+
+    def replace_days(self, df, days, version=None):
+        """Заменяет строки только за дни days ('YYYY-MM-DD'), остальное не трогает (см. changelog)."""
+        rows = self._rows(df[df["Дата"].dt.strftime("%Y-%m-%d").isin(days)]) if days else []
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM daily_data WHERE date = ?", [(day,) for day in days])
+            self._insert(rows)
+        self.version = version
+
+    def _one(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def query_df(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def last_date(self, until=None):
+        """Последняя дата с данными (не позже until, если задано)."""
+        if until is None:
+            row = self._one("SELECT MAX(date) FROM daily_data")
+        else:
+            row = self._one("SELECT MAX(date) FROM daily_data WHERE date <= ?", (_iso(until),))
+        return pd.Timestamp(row[0]) if row and row[0] else None
+
+    def day_summary(self, day):
+        """Итоги одного дня — как в analyze."""
+        row = self._one(
+            "SELECT SUM(bar), SUM(kitchen), AVG(avg_check), AVG(depth), SUM(hall), SUM(delivery),"
+            " AVG(foodcost), AVG(discount), COUNT(*) FROM daily_data WHERE date = ?", (_iso(day),))
+        keys = ["bar", "kitchen", "avg_check", "depth", "hall", "delivery", "foodcost", "discount", "rows"]
+        summary = {key: (np.nan if value is None else value) for key, value in zip(keys, row)}
+        manager = self._one(
+            "SELECT manager FROM daily_data WHERE date = ? AND manager IS NOT NULL ORDER BY rowid LIMIT 1",
+            (_iso(day),))
+        summary["manager"] = manager[0] if manager else None
+        return summary
+
+    def period_totals(self, start, end):
+        """Итоги для P&L за [start, end]: суммы выручки, ЗП, доставки и средний фудкост."""
+        row = self._one(
+            "SELECT SUM(bar + kitchen), SUM(salary), AVG(foodcost), SUM(delivery), COUNT(*)"
+            " FROM daily_data WHERE date BETWEEN ? AND ?", (_iso(start), _iso(end)))
+        revenue, salary, foodcost, delivery, rows = row
+        return {
+            "revenue": revenue or 0,
+            "salary": salary or 0,
+            "foodcost": np.nan if foodcost is None else foodcost,
+            "delivery": delivery or 0,
+            "rows": rows,
+        }
+
+    def monthly_totals(self, start, end):
+        """Итоги для P&L по месяцам за [start, end] одним GROUP BY; индекс — 'ГГГГ-ММ'."""
+        return self.query_df(
+            "SELECT substr(date, 1, 7) AS month, SUM(bar + kitchen) AS revenue, SUM(salary) AS salary,"
+            " AVG(foodcost) AS foodcost, SUM(delivery) AS delivery, COUNT(*) AS rows"
+            " FROM daily_data WHERE date BETWEEN ? AND ? GROUP BY month ORDER BY month",
+            (_iso(start), _iso(end)),
+        ).set_index("month").fillna({"revenue": 0, "salary": 0, "delivery": 0})
+
+    def manager_stats(self, start, end):
+        """Показатели менеджеров за [start, end] — колонки как в исходной таблице."""
+        return self.query_df(
+            'SELECT manager AS "Менеджер", SUM(bar) AS "Выручка бар", SUM(kitchen) AS "Выручка кухня",'
+            ' AVG(avg_check) AS "Ср. чек общий", AVG(depth) AS "Ср. поз чек общий",'
+            ' AVG(discount) AS "Скидка общий, %"'
+            " FROM daily_data WHERE manager IS NOT NULL AND date BETWEEN ? AND ?"
+            " GROUP BY manager",
+            (_iso(start), _iso(end)),
+        ).set_index("Менеджер")
+
+
+_store = {"instance": None}
+_store_lock = threading.Lock()
+
+
+def _get_instance():
+    with _store_lock:
+        if _store["instance"] is None:
+            _store["instance"] = AnalyticsStore(ANALYTICS_DB)
+        return _store["instance"]
+
+
+@register_sync_hook
+def _mirror(df, version):
+    """Правки задним числом и новые дни — только затронутые дни; после перезапуска — всё."""
+    store = _get_instance()
+    changes = changes_for(df, version)
+    if changes["initial"] or store.version is None or store.version != version - 1:
+        store.replace_all(df, version)
+    else:
+        store.replace_days(df, changes["dates"], version)
+
+
+def get_store(max_age_seconds=None):
+    """Хранилище, синхронизированное с последними данными (см. sync.get_data)."""
+    df = get_data(max_age_seconds)
+    store = _get_instance()
+    if store.version != get_version():
+        store.replace_all(df, get_version())
+    return store
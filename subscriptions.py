@@ -0,0 +1,205 @@
+# subscriptions.py
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor
+
+from config import STATE_DIR, TIMEZONE, SEND_RATE_PER_SECOND, SEND_CONCURRENCY, DATA_MAX_AGE_SECONDS
+from utils import send_to_telegram, stale_note
+from sync import get_data, get_version
+from access import role_of, is_allowed
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS_FILE = os.path.join(STATE_DIR, "subscriptions.json")
+DEFAULT_VENUE = "main"
+VENUES = [DEFAULT_VENUE]  # Заведения, по которым есть данные: пока у бота одна таблица
+
+_lock = threading.Lock()
+
+
+def _load():
+    try:
+        with open(SUBSCRIPTIONS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return []
+
+
+def _save(subscriptions):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = SUBSCRIPTIONS_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(subscriptions, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, SUBSCRIPTIONS_FILE)
+
+
+def parse_time(text):
+    """'9:30' -> '09:30'; None, если время некорректно."""
+    try:
+        hours, minutes = (int(part) for part in text.split(":"))
+    except ValueError:
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return f"{hours:02d}:{minutes:02d}"
+
+
+def list_subscriptions(chat_id=None):
+    """Все подписки или подписки одного чата: [{chat_id, report, venue, time}]."""
+    with _lock:
+        subscriptions = _load()
+    if chat_id is None:
+        return subscriptions
+    return [sub for sub in subscriptions if sub["chat_id"] == str(chat_id)]
+
+
+def venue_of(sub):
+    return sub.get("venue") or DEFAULT_VENUE
+
+
+def _same(sub, other):
+    return (all(sub[key] == other[key] for key in ("chat_id", "report", "time"))
+            and venue_of(sub) == venue_of(other))
+
+
+def subscribe(chat_id, report, at, venue=DEFAULT_VENUE):
+    """
+    Добавляет подписку (чат, отчёт, заведение, время); повтор той же подписки
+    ничего не меняет. True — если добавлена.
+    """
+    entry = {"chat_id": str(chat_id), "report": report, "venue": venue, "time": at}
+    with _lock:
+        subscriptions = _load()
+        if any(_same(sub, entry) for sub in subscriptions):
+            return False
+        subscriptions.append(entry)
+        _save(subscriptions)
+    return True
+
+
+def unsubscribe(chat_id, report=None, at=None):
+    """Удаляет подписки чата (все или по отчёту и/или времени). Возвращает число удалённых."""
+    def matches(sub):
+        return (sub["chat_id"] == str(chat_id)
+                and (report is None or sub["report"] == report)
+                and (at is None or sub["time"] == at))
+
+    with _lock:
+        subscriptions = _load()
+        kept = [sub for sub in subscriptions if not matches(sub)]
+        if len(kept) != len(subscriptions):
+            _save(kept)
+    return len(subscriptions) - len(kept)
+
+
+class RateLimitedSender:
+    """
+    Общий для всех потоков рассылки темп отправки: не чаще rate_per_second сообщений.
+    На 429 от Telegram ждёт retry_after и повторяет один раз.
+    """
+
+    def __init__(self, rate_per_second=SEND_RATE_PER_SECOND, send=send_to_telegram):
+        self.interval = 1.0 / rate_per_second
+        self.send = send
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_slot(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def __call__(self, chat_id, text):
+        for _ in range(2):
+            self._wait_slot()
+            response = self.send(text, chat_id)
+            if getattr(response, "status_code", 200) != 429:
+                return response
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+            except ValueError:
+                retry_after = 1
+            time.sleep(retry_after)
+        return response
+
+
+# Готовые отчёты: (отчёт, заведение) -> (версия данных, текст)
+_report_cache = {}
+
+
+def build_once(report, venue, builders):
+    """Отчёт заведения считается один раз на версию данных, сколько бы подписчиков его ни ждало."""
+    if venue not in VENUES:
+        raise ValueError(f"Нет данных по заведению {venue}")
+    version = get_version()
+    cached = _report_cache.get((report, venue))
+    if cached and cached[0] == version:
+        return cached[1]
+    text = builders[report]() + stale_note(get_data())
+    _report_cache[(report, venue)] = (version, text)
+    return text
+
+
+def is_permitted(sub):
+    """Доступ проверяется в момент отправки: роль чата могли снять или урезать после подписки."""
+    role = role_of(sub["chat_id"])
+    return role is not None and is_allowed(role, sub["report"])
+
+
+def deliver(subscriptions, builders, sender=None):
+    """
+    Рассылает отчёты подписчикам: каждый отчёт считается один раз,
+    отправки идут параллельно через общий ограничитель темпа.
+    Подписки чатов, которым отчёт больше не разрешён, пропускаются.
+    Возвращает число успешно отправленных сообщений.
+    """
+    permitted = [sub for sub in subscriptions if is_permitted(sub)]
+    for sub in subscriptions:
+        if sub not in permitted:
+            logger.info("Подписка %s чата %s пропущена: нет доступа", sub["report"], sub["chat_id"])
+    subscriptions = permitted
+    if not subscriptions:
+        return 0
+    sender = sender or RateLimitedSender()
+    get_data(DATA_MAX_AGE_SECONDS)  # одна синхронизация перед расчётом всех отчётов
+    texts = {}
+    for key in {(sub["report"], venue_of(sub)) for sub in subscriptions}:
+        try:
+            texts[key] = build_once(*key, builders)
+        except Exception as e:
+            logger.exception("Не удалось построить отчёт %s: %s", key, e)
+
+    def send(sub):
+        text = texts.get((sub["report"], venue_of(sub)))
+        if text is None:
+            return False
+        try:
+            response = sender(sub["chat_id"], text)
+            return getattr(response, "ok", True)
+        except Exception as e:
+            logger.warning("Не удалось отправить %s в чат %s: %s", sub["report"], sub["chat_id"], e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=SEND_CONCURRENCY) as pool:
+        return sum(pool.map(send, subscriptions))
+
+
+def subscriptions_job(builders, now=None):
+    """Задача планировщика (раз в минуту): рассылка подписок, время которых наступило (по TIMEZONE)."""
+    at = (now or datetime.now(ZoneInfo(TIMEZONE))).strftime("%H:%M")
+    due = [sub for sub in list_subscriptions() if sub["time"] == at and sub["report"] in builders]
+    try:
+        sent = deliver(due, builders)
+        if due:
+            logger.info("Рассылка %s: отправлено %s из %s", at, sent, len(due))
+    except Exception as e:
+        logger.exception("Ошибка рассылки подписок: %s", e)
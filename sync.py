@@ -0,0 +1,86 @@
+# sync.py
+
+import logging
+import threading
+from datetime import datetime
+
+from utils import read_data
+from history import merge_with_history
+from dataset import compact
+
+logger = logging.getLogger(__name__)
+
+# Последний синхронизированный набор данных (общий для всех модулей)
+_state = {
+    "df": None,          # pandas.DataFrame из read_data()
+    "version": 0,        # растёт при каждой синхронизации
+    "synced_at": None,   # время последней синхронизации
+}
+_lock = threading.Lock()
+_sync_lock = threading.RLock()  # синхронизации идут по одной: хуки видят версии строго по порядку
+_hooks = []
+
+
+def register_sync_hook(func):
+    """
+    Регистрирует функцию, которая вызывается после каждой синхронизации
+    с аргументами (df, version). Ошибки в хуках не прерывают синхронизацию.
+    """
+    _hooks.append(func)
+    return func
+
+
+def sync():
+    """
+    Полная синхронизация: читает таблицу (плюс локальную историю), сохраняет
+    компактный кадр (см. dataset.compact) и запускает хуки.
+    Одновременные вызовы выполняются по очереди.
+    """
+    with _sync_lock:
+        return _sync_locked()
+
+
+def _sync_locked():
+    df = compact(merge_with_history(read_data()))
+    with _lock:
+        _state["df"] = df
+        _state["version"] += 1
+        _state["synced_at"] = datetime.now()
+        version = _state["version"]
+    for hook in _hooks:
+        try:
+            hook(df, version)
+        except Exception as e:
+            logger.exception("Ошибка в хуке синхронизации %s: %s", getattr(hook, "__name__", hook), e)
+    return df
+
+
+def _fresh(max_age_seconds):
+    """Последний кадр, если он есть и не старше max_age_seconds; иначе None."""
+    with _lock:
+        df = _state["df"]
+        synced_at = _state["synced_at"]
+    if df is None:
+        return None
+    if max_age_seconds is not None and (datetime.now() - synced_at).total_seconds() > max_age_seconds:
+        return None
+    return df
+
+
+def get_data(max_age_seconds=None):
+    """
+    Возвращает последний синхронизированный DataFrame.
+    Если данных ещё нет или они старше max_age_seconds — синхронизирует заново.
+    Ждавшие той же синхронизации получают её результат, а не запускают свою.
+    """
+    df = _fresh(max_age_seconds)
+    if df is not None:
+        return df
+    with _sync_lock:
+        df = _fresh(max_age_seconds)  # пока ждали, данные мог обновить другой поток
+        return df if df is not None else _sync_locked()
+
+
+def get_version():
+    """Номер версии данных (0 — синхронизации ещё не было)."""
+    return _state["version"]
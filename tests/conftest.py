@@ -0,0 +1,38 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Состояние бота (SQLite, JSON) — во временной папке, а не в рабочей state/
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="bot-tests-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_df(start, end, seed=0):
+    """Операционная таблица: одна строка на день, колонки как в Google-таблице."""
+    dates = pd.date_range(start, end, freq="D")
+    rng = np.random.default_rng(seed)
+    n = len(dates)
+    return pd.DataFrame({
+        "Дата": dates,
+        "Менеджер": rng.choice(["Анна", "Борис", "Вера"], n),
+        "Выручка бар": rng.integers(20000, 60000, n).astype(float),
+        "Выручка кухня": rng.integers(50000, 120000, n).astype(float),
+        "Ср. чек общий": rng.integers(900, 1800, n).astype(float),
+        "Ср. поз чек общий": rng.integers(20, 60, n).astype(float),
+        "Зал начислено": rng.integers(5000, 15000, n).astype(float),
+        "Выручка доставка ": rng.integers(0, 20000, n).astype(float),
+        "Фудкост общий, %": rng.integers(200, 300, n).astype(float),
+        "Скидка общий, %": rng.integers(10, 80, n).astype(float),
+        "Начислено": rng.integers(10000, 25000, n).astype(float),
+    })
+
+
+@pytest.fixture
+def frame():
+    return make_df
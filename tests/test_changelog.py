@@ -0,0 +1,76 @@
+# test_changelog.py
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import changelog
+
+
+@pytest.fixture(autouse=True)
+def journal_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(changelog, "CHANGELOG_DB", str(tmp_path / "changelog.db"))
+
+
+def test_first_sync_is_initial(frame):
+    changes = changelog.record_changes(frame("2026-09-01", "2026-09-30"), now=datetime(2026, 10, 1))
+    assert changes["initial"]
+    assert changes["dates"] == []
+
+
+def test_unchanged_and_compacted_data_is_not_a_change(frame):
+    df = frame("2026-09-01", "2026-09-30")
+    changelog.record_changes(df, now=datetime(2026, 10, 1))
+    compact = df.astype({"Выручка бар": "float32", "Начислено": "int32"})
+    changes = changelog.record_changes(compact, now=datetime(2026, 10, 1))
+    assert not changes["initial"]
+    assert (changes["added"], changes["changed"], changes["removed"]) == (0, 0, 0)
+
+
+def test_edit_in_closed_month(frame):
+    df = frame("2026-08-01", "2026-10-05")
+    changelog.record_changes(df, now=datetime(2026, 10, 6))
+    df.loc[df["Дата"] == "2026-08-10", "Выручка бар"] += 1000
+    df = df[df["Дата"] != "2026-09-02"]
+    changes = changelog.record_changes(df, now=datetime(2026, 10, 6))
+
+    assert (changes["changed"], changes["removed"]) == (1, 1)
+    assert changes["retro_dates"] == ["2026-08-10", "2026-09-02"]
+    assert sorted(changes["closed_months"]) == ["2026-08", "2026-09"]
+    august = changes["closed_months"]["2026-08"]
+    assert august["revenue_after"] - august["revenue_before"] == pytest.approx(1000)
+    assert "Изменились данные закрытых месяцев" in changelog.closed_month_message(changes)
+
+
+def test_month_end_rollover_is_not_a_closed_month_edit(frame):
+    # 1-го числа дозаносят последние дни прошлого месяца — это не правка закрытого месяца
+    full = frame("2026-09-01", "2026-10-01")
+    changelog.record_changes(full[full["Дата"] <= "2026-09-28"], now=datetime(2026, 9, 29))
+    changes = changelog.record_changes(full, now=datetime(2026, 10, 1, 9))
+
+    assert changes["added"] == 3
+    assert changes["dates"] == ["2026-09-29", "2026-09-30", "2026-10-01"]
+    assert changes["retro_dates"] == []
+    assert changes["closed_months"] == {}
+    assert changelog.closed_month_message(changes) == ""
+
+
+def test_backdated_row_in_closed_month_is_an_edit(frame):
+    df = frame("2026-09-01", "2026-10-03")
+    changelog.record_changes(df, now=datetime(2026, 10, 4))
+    extra = df[df["Дата"] == "2026-09-15"].assign(Менеджер="Гоша")
+    changes = changelog.record_changes(pd.concat([df, extra], ignore_index=True), now=datetime(2026, 10, 4))
+
+    assert changes["added"] == 1
+    assert list(changes["closed_months"]) == ["2026-09"]
+
+
+def test_journal_keeps_rows(frame):
+    df = frame("2026-09-01", "2026-09-30")
+    changelog.record_changes(df, now=datetime(2026, 10, 1))
+    df.loc[df["Дата"] == "2026-09-20", "Начислено"] += 1
+    changelog.record_changes(df, now=datetime(2026, 10, 1))
+    journal = changelog.recent_changes()
+    assert list(journal["kind"]) == ["changed"]
+    assert list(journal["date"]) == ["2026-09-20"]
@@ -0,0 +1,66 @@
+# test_coordinator.py
+
+import asyncio
+import threading
+import time
+
+from coordinator import RequestCoordinator
+
+
+def test_identical_requests_share_one_call():
+    calls = []
+
+    def compute(arg):
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return f"отчёт {arg}"
+
+    async def scenario():
+        coordinator = RequestCoordinator()
+        results = await asyncio.gather(*(coordinator.run(("analyze", ()), compute, 1) for _ in range(5)))
+        return results, coordinator.in_flight
+
+    results, in_flight = asyncio.run(scenario())
+    assert results == ["отчёт 1"] * 5
+    assert len(calls) == 1
+    assert in_flight == 0
+
+
+def test_different_keys_and_later_requests_run_separately():
+    calls = []
+
+    def compute(arg):
+        calls.append(arg)
+        time.sleep(0.05)
+        return arg
+
+    async def scenario():
+        coordinator = RequestCoordinator()
+        first = await asyncio.gather(coordinator.run(("pnl", ()), compute, "a"),
+                                     coordinator.run(("pace", ()), compute, "b"))
+        second = await coordinator.run(("pnl", ()), compute, "c")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == ["a", "b"] and second == "c"
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    done = []
+
+    def compute():
+        time.sleep(0.2)
+        done.append(1)
+        return "готово"
+
+    async def scenario():
+        coordinator = RequestCoordinator()
+        first = asyncio.ensure_future(coordinator.run(("forecast", ()), compute))
+        second = asyncio.ensure_future(coordinator.run(("forecast", ()), compute))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "готово"
+    assert done == [1]
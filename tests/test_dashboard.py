@@ -0,0 +1,84 @@
+# test_dashboard.py
+
+import threading
+
+import pytest
+
+import dashboard
+
+
+def test_changed_ranges_groups_runs_and_clears_leftovers():
+    old = [["A", 1, 2, 3], ["B", 4]]
+    new = [["A", 1, 9, 8], ["B"]]
+    assert dashboard.changed_ranges(old, new) == [("C1:D1", [[9, 8]]), ("B2:B2", [[""]])]
+
+
+def test_changed_ranges_identical_grids():
+    grid = [["Дата", "Выручка"], ["2026-10-01", 150000]]
+    assert dashboard.changed_ranges(grid, grid) == []
+
+
+def test_changed_ranges_force_writes_everything_and_clears_old_extent():
+    old = [["A", 1, 2], ["B", 3], ["C"]]
+    new = [["A", 1], ["B", 5]]
+    assert dashboard.changed_ranges(old, new, force=True) == [
+        ("A1:C1", [["A", 1, ""]]),
+        ("A2:B2", [["B", 5]]),
+        ("A3:A3", [[""]]),
+    ]
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.batches = []
+
+    def worksheet(self, name):
+        return name
+
+    def values_batch_update(self, body):
+        self.batches.append(body["data"])
+
+
+@pytest.fixture
+def sheet(tmp_path, monkeypatch):
+    spreadsheet = FakeSpreadsheet()
+    grids = iter([[["A", 1, 2], ["B", 3]], [["A", 1]], [["A", 1]]])
+    monkeypatch.setattr(dashboard, "STATE_FILE", str(tmp_path / "dashboard.json"))
+    monkeypatch.setattr(dashboard, "DASHBOARD_SHEET_ID", "sheet")
+    monkeypatch.setattr(dashboard, "build_grid", lambda df, store: next(grids))
+    monkeypatch.setattr(dashboard, "get_store", lambda: None)
+    monkeypatch.setattr(dashboard, "get_write_client",
+                        lambda: type("Client", (), {"open_by_key": lambda self, key: spreadsheet})())
+    return spreadsheet
+
+
+def test_publish_diffs_and_full_clears_previous_extent(sheet):
+    assert dashboard.publish(df=object()) == 5
+    assert dashboard.publish(df=object()) == 3  # очищены C1, A2, B2
+    assert dashboard.publish(df=object(), full=True) == 2
+    assert [item["range"] for item in sheet.batches[-1]] == [dashboard._worksheet_range("A1:B1")]
+
+
+def test_sync_hook_publishes_in_background(monkeypatch):
+    started, release, done = threading.Event(), threading.Event(), threading.Event()
+    published = []
+
+    def slow_publish(df):
+        started.set()
+        release.wait(5)
+        published.append(df)
+        if len(published) == 2:
+            done.set()
+        return 1
+
+    monkeypatch.setattr(dashboard, "DASHBOARD_SHEET_ID", "sheet")
+    monkeypatch.setattr(dashboard, "publish", slow_publish)
+    frames = [type("Frame", (), {"attrs": {}})() for _ in range(3)]
+
+    dashboard._publish_on_sync(frames[0], 1)  # не ждёт записи в Sheets
+    assert started.wait(5)
+    dashboard._publish_on_sync(frames[1], 2)
+    dashboard._publish_on_sync(frames[2], 3)  # пока идёт публикация, ждёт только последняя версия
+    release.set()
+    assert done.wait(5)
+    assert published == [frames[0], frames[2]]
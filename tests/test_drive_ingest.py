@@ -0,0 +1,97 @@
+# test_drive_ingest.py
+
+import pytest
+
+import drive_ingest
+
+FOLDER = "folder"
+SHEET_MIME = drive_ingest.GOOGLE_SHEET_MIME
+
+
+def drive_file(file_id, name, parents=None, md5="v1", mime="text/csv", trashed=False):
+    file = {"id": file_id, "name": name, "mimeType": mime, "trashed": trashed, "modifiedTime": "2026-10-19T09:00:00Z"}
+    if md5:
+        file["md5Checksum"] = md5
+    if parents is not None:
+        file["parents"] = parents
+    return file
+
+
+class Request:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeDrive:
+    """files.list и changes.list с заранее заданными страницами."""
+
+    def __init__(self, folder_pages, change_pages=()):
+        self.folder_pages = list(folder_pages)
+        self.change_pages = list(change_pages)
+
+    def files(self):
+        drive = self
+
+        class Files:
+            def list(self, **kwargs):
+                return Request(drive.folder_pages.pop(0))
+        return Files()
+
+    def changes(self):
+        drive = self
+
+        class Changes:
+            def getStartPageToken(self):
+                return Request({"startPageToken": "t1"})
+
+            def list(self, **kwargs):
+                return Request(drive.change_pages.pop(0))
+        return Changes()
+
+
+@pytest.fixture
+def ingested(tmp_path, monkeypatch):
+    imported = []
+    monkeypatch.setattr(drive_ingest, "STATE_FILE", str(tmp_path / "drive_ingest.json"))
+    monkeypatch.setattr(drive_ingest, "_ingest_one", lambda file: imported.append(file["id"]) or 1)
+    monkeypatch.setattr(drive_ingest, "sync", lambda: None)
+    return imported
+
+
+def run(monkeypatch, drive):
+    monkeypatch.setattr(drive_ingest, "_get_service", lambda: drive)
+    return drive_ingest.ingest(FOLDER)
+
+
+def test_first_run_walks_all_folder_pages(monkeypatch, ingested):
+    drive = FakeDrive([
+        {"files": [drive_file("a", "a.csv", [FOLDER])], "nextPageToken": "p2"},
+        {"files": [drive_file("b", "b.xlsx", [FOLDER]), drive_file("c", "notes.txt", [FOLDER])]},
+    ])
+    run(monkeypatch, drive)
+    assert sorted(ingested) == ["a", "b"]
+
+
+def test_changes_outside_folder_are_ignored(monkeypatch, ingested):
+    run(monkeypatch, FakeDrive([{"files": []}]))
+    drive = FakeDrive([], [{"newStartPageToken": "t2", "changes": [
+        {"fileId": "live", "file": drive_file("live", "Операционная", mime=SHEET_MIME, md5=None)},  # без parents
+        {"fileId": "other", "file": drive_file("other", "x.csv", ["elsewhere"])},
+        {"fileId": "gone", "removed": True},
+        {"fileId": "bin", "file": drive_file("bin", "old.csv", [FOLDER], trashed=True)},
+        {"fileId": "new", "file": drive_file("new", "new.csv", [FOLDER])},
+    ]}])
+    run(monkeypatch, drive)
+    assert ingested == ["new"]
+
+
+def test_unchanged_file_is_not_downloaded_again(monkeypatch, ingested):
+    run(monkeypatch, FakeDrive([{"files": [drive_file("a", "a.csv", [FOLDER])]}]))
+    change = {"fileId": "a", "file": drive_file("a", "a.csv", [FOLDER])}
+    run(monkeypatch, FakeDrive([], [{"newStartPageToken": "t2", "changes": [change]}]))
+    run(monkeypatch, FakeDrive([], [{"newStartPageToken": "t3", "changes": [
+        {"fileId": "a", "file": drive_file("a", "a.csv", [FOLDER], md5="v2")}]}]))
+    assert ingested == ["a", "a"]
@@ -0,0 +1,22 @@
+# test_forecast.py
+
+import os
+
+import forecast
+from store import AnalyticsStore
+
+
+def test_pnl_trend_without_data():
+    store = AnalyticsStore()
+    assert forecast.pnl_trend_report(3, store) == "⚠️ Нет данных за выбранные месяцы."
+    assert forecast.pnl_trend_chart(3, store) is None
+
+
+def test_pnl_trend_chart_with_data(frame, monkeypatch, tmp_path):
+    store = AnalyticsStore()
+    store.replace_all(frame("2026-01-01", "2026-12-31"))
+    monkeypatch.setattr(forecast, "effective_lookup", lambda as_of, index: lambda name, column: 5.0)
+    monkeypatch.setattr(forecast, "datetime", type("Now", (forecast.datetime,), {
+        "now": classmethod(lambda cls: forecast.datetime(2026, 12, 15))}))
+    path = forecast.pnl_trend_chart(3, store, path=str(tmp_path / "chart.png"))
+    assert os.path.getsize(path) > 0
@@ -0,0 +1,60 @@
+# test_navigation.py
+
+import pandas as pd
+import pytest
+
+import navigation
+
+
+def test_callback_round_trip():
+    data = navigation.callback_data("analyze", "2026-10-05")
+    assert len(data.encode("utf-8")) <= 64
+    assert navigation.parse_callback(data) == ("analyze", "2026-10-05")
+
+
+def test_parse_callback_rejects_foreign_and_stale_data():
+    assert navigation.parse_callback(None) is None
+    assert navigation.parse_callback("other:analyze:2026-10-05") is None
+    assert navigation.parse_callback("nav:unknown:2026-10") is None
+    assert navigation.parse_callback("nav:forecast:2026-10-05") is None  # месячный вид с дневным якорем
+
+
+def test_shift_anchor_crosses_month_and_year():
+    assert navigation.shift_anchor("analyze", "2026-03-01", -1) == "2026-02-28"
+    assert navigation.shift_anchor("forecast", "2026-12", 1) == "2027-01"
+    assert navigation.shift_anchor("managers", "2026-01", -1) == "2025-12"
+
+
+def test_convert_anchor_between_day_and_month():
+    assert navigation.convert_anchor("2026-02-14", "forecast") == "2026-02"
+    assert navigation.convert_anchor("2026-02", "analyze") == "2026-02-28"
+
+
+def test_view_cache_carries_forward_only_kept_entries():
+    cache = navigation.ViewCache()
+    cache.put(1, ("analyze", "2026-09-05", 1), "old day")
+    cache.put(1, ("forecast", "2026-10", 1), "current month")
+    cache.carry_forward(1, 2, keep=lambda view, anchor, value: anchor != "2026-10")
+    assert cache.get(1, ("analyze", "2026-09-05", 2)) == "old day"
+    assert cache.get(1, ("forecast", "2026-10", 2)) is None
+
+
+@pytest.mark.parametrize("params_changed, month_kept", [(False, True), (True, False)])
+def test_month_views_dropped_when_params_change(monkeypatch, params_changed, month_kept):
+    import main
+
+    cache = navigation.ViewCache()
+    monkeypatch.setattr(main, "view_cache", cache)
+    monkeypatch.setattr(main, "_views_fallback", {"previous": False})
+    monkeypatch.setattr(main, "changes_for", lambda df, version: {
+        "initial": False, "dates": ["2026-10-19"], "months": ["2026-10"]})
+    monkeypatch.setattr(main, "params_changed_in", lambda version: params_changed)
+    day = ("text", "analyze", "2026-09-05", "2026-10-19", 1)
+    month = ("text", "forecast", "2026-09", "2026-10", 1)
+    cache.put(1, ("analyze", "2026-09-05", 1), day)
+    cache.put(1, ("forecast", "2026-09", 1), month)
+
+    main._keep_unchanged_views(pd.DataFrame(), 2)
+
+    assert cache.get(1, ("analyze", "2026-09-05", 2)) == day
+    assert (cache.get(1, ("forecast", "2026-09", 2)) == month) is month_kept
@@ -0,0 +1,69 @@
+# test_pace.py
+
+from datetime import datetime
+
+import pytest
+
+import changelog
+import pace
+
+
+class FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 10, 20)
+
+
+@pytest.fixture(autouse=True)
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(changelog, "CHANGELOG_DB", str(tmp_path / "changelog.db"))
+    monkeypatch.setattr(changelog, "_last", {"version": None, "changes": None})
+    monkeypatch.setattr(pace, "datetime", FixedDatetime)
+    monkeypatch.setattr(pace, "_state", {"month": None, "last_day": None, "days": {}, "totals": {}, "targets": {}})
+    monkeypatch.setattr(pace, "_targets_cache", {"at": None, "targets": None})
+
+
+def test_incremental_totals_match_full_recount(frame, monkeypatch):
+    monkeypatch.setattr(pace, "load_targets", lambda: {})
+    df = frame("2026-09-01", "2026-10-18")
+    pace._update(df[df["Дата"] <= "2026-10-15"], 1)
+
+    df.loc[df["Дата"] == "2026-10-03", "Выручка бар"] += 5000
+    df.loc[df["Дата"] == "2026-10-07", "Менеджер"] = "Глеб"
+    df = df[df["Дата"] != "2026-10-10"].reset_index(drop=True)
+    recounted = []
+    original = pace.day_sums
+    monkeypatch.setattr(pace, "day_sums", lambda df, start, end: recounted.append(start) or original(df, start, end))
+    pace._update(df, 2)
+
+    assert len(recounted) == 6  # 03, 07, 10 и три новых дня — не весь месяц
+    expected, last_day = pace.month_totals(df, 2026, 10)
+    assert pace._state["totals"] == expected
+    assert pace._state["last_day"] == last_day == datetime(2026, 10, 18)
+    assert "Глеб" in pace._state["totals"]
+
+
+def test_missing_targets_sheet_is_cached(monkeypatch):
+    calls = []
+
+    def fetch_records(*args, **kwargs):
+        calls.append(args)
+        raise LookupError("нет листа")
+
+    monkeypatch.setattr(pace, "fetch_records", fetch_records)
+    assert pace.load_targets() is None
+    assert pace.load_targets() is None
+    assert len(calls) == 1
+
+
+def test_targets_are_cached(monkeypatch):
+    calls = []
+
+    def fetch_records(*args, **kwargs):
+        calls.append(args)
+        return [{"Месяц": "2026-10", "Менеджер": "", "Выручка": "3000000"}], None
+
+    monkeypatch.setattr(pace, "fetch_records", fetch_records)
+    assert pace.load_targets() == {("2026-10", None): {"revenue": 3000000.0}}
+    assert pace.load_targets() == {("2026-10", None): {"revenue": 3000000.0}}
+    assert len(calls) == 1
@@ -0,0 +1,69 @@
+# test_params_history.py
+
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import params_history
+
+
+@pytest.fixture(autouse=True)
+def params_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(params_history, "PARAMS_DB", str(tmp_path / "params.db"))
+
+
+def record(day, value):
+    params_history.record_snapshot({"франшиза": {"Процент": value}}, today=datetime.strptime(day, "%Y-%m-%d"))
+
+
+def test_value_in_effect_on_each_date():
+    record("2026-01-10", Decimal("5"))
+    record("2026-03-01", Decimal("6"))
+    lookup = params_history.effective_lookup(["2025-12-31", "2026-02-28", "2026-03-31"])
+    assert list(lookup("Франшиза", "Процент")) == [5.0, 5.0, 6.0]
+    assert lookup("Эквайринг", "Процент") is None
+
+
+def test_cleared_value_is_not_carried_forward():
+    record("2026-01-10", Decimal("5"))
+    record("2026-03-01", None)
+    record("2026-05-01", Decimal("7"))
+    values = params_history.effective_lookup(["2026-02-28", "2026-03-31", "2026-04-30", "2026-05-31"])(
+        "франшиза", "Процент")
+    assert values.iloc[0] == 5.0
+    assert np.isnan(values.iloc[1]) and np.isnan(values.iloc[2])
+    assert values.iloc[3] == 7.0
+
+
+def test_cleared_everywhere_is_missing():
+    record("2026-01-10", Decimal("5"))
+    record("2026-03-01", None)
+    assert params_history.effective_lookup(["2026-04-30"])("франшиза", "Процент") is None
+
+
+def test_parameter_added_later_takes_effect_from_its_date():
+    record("2026-01-10", Decimal("5"))
+    changed = params_history.record_snapshot(
+        {"франшиза": {"Процент": Decimal("5")}, "эквайринг": {"Процент": Decimal("2")}},
+        today=datetime(2026, 3, 1))
+    assert changed == [("эквайринг", "Процент")]
+    values = params_history.effective_lookup(["2026-02-28", "2026-03-31"])("эквайринг", "Процент")
+    assert np.isnan(values.iloc[0]) and values.iloc[1] == 2.0
+
+
+def test_removed_row_is_cleared():
+    params_history.record_snapshot(
+        {"франшиза": {"Процент": Decimal("5")}, "эквайринг": {"Процент": Decimal("2")}},
+        today=datetime(2026, 1, 10))
+    changed = params_history.record_snapshot({"франшиза": {"Процент": Decimal("5")}}, today=datetime(2026, 3, 1))
+    assert changed == [("эквайринг", "Процент")]
+    values = params_history.effective_lookup(["2026-02-28", "2026-03-31"])("эквайринг", "Процент")
+    assert values.iloc[0] == 2.0 and np.isnan(values.iloc[1])
+
+
+def test_empty_snapshot_clears_nothing():
+    record("2026-01-10", Decimal("5"))
+    assert params_history.record_snapshot({}, today=datetime(2026, 3, 1)) == []
+    assert params_history.effective_lookup(["2026-03-31"])("франшиза", "Процент").iloc[0] == 5.0
@@ -0,0 +1,42 @@
+# test_period.py
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import period
+from utils import metric_columns
+
+
+def test_parse_period_keywords():
+    today = datetime(2026, 10, 15, 13, 30)
+    assert period.parse_period([], today) == (datetime(2026, 10, 1), datetime(2026, 10, 15))
+    assert period.parse_period(["week"], today) == (datetime(2026, 10, 12), datetime(2026, 10, 15))
+    assert period.parse_period(["quarter"], today) == (datetime(2026, 10, 1), datetime(2026, 10, 15))
+    assert period.parse_period(["prev"], today) == (datetime(2026, 9, 1), datetime(2026, 9, 30))
+
+
+def test_parse_period_dates_in_any_order():
+    assert period.parse_period(["10.09.2026", "2026-09-01"]) == (datetime(2026, 9, 1), datetime(2026, 9, 10))
+    assert period.parse_period(["2026-09-05"]) == (datetime(2026, 9, 5), datetime(2026, 9, 5))
+
+
+def test_parse_period_rejects_bad_dates():
+    with pytest.raises(ValueError):
+        period.parse_period(["31.02.2026"])
+
+
+def test_month_fraction():
+    assert period.month_fraction(datetime(2026, 9, 1), datetime(2026, 9, 30)) == pytest.approx(1.0)
+    assert period.month_fraction(datetime(2026, 9, 16), datetime(2026, 10, 31)) == pytest.approx(1.5)
+
+
+def test_range_stats_match_direct_sums(frame):
+    df = frame("2026-01-01", "2026-06-30")
+    stats = period.range_stats(period.build_prefix_sums(df), datetime(2026, 2, 10), datetime(2026, 4, 5))
+    rows = (df["Дата"] >= "2026-02-10") & (df["Дата"] <= "2026-04-05")
+    metrics = metric_columns(df[rows])
+    assert stats["days"] == rows.sum()
+    assert stats["revenue"] == pytest.approx(metrics["revenue"].sum())
+    assert stats["foodcost"] == pytest.approx(np.nanmean(metrics["foodcost"]))
@@ -0,0 +1,88 @@
+# test_pnl.py
+
+import pandas as pd
+import pytest
+
+import pnl
+
+PARAMS = {
+    ("ЗП упр", "Сумма"): 50000,
+    ("Франшиза", "Процент"): 5,
+    ("Процент списания", "Процент"): 15,
+    ("Процент хозы", "Процент"): 2,
+    ("Процент доставка", "Процент"): 30,
+    ("Эквайринг", "Процент"): 18,
+    ("Комиссия Банка", "Процент"): 5,
+    ("Постоянные", "Сумма"): 100000,
+    ("Налоги ЗП", "Процент"): 30,
+    ("УСН", "Процент"): 6,
+}
+
+
+def lookup_from(params):
+    return lambda name, column: params.get((name, column))
+
+
+def month(revenue=1_000_000, salary=200_000, foodcost=250, delivery=100_000):
+    return pd.DataFrame([{"revenue": revenue, "salary": salary, "foodcost": foodcost, "delivery": delivery}])
+
+
+def test_full_table():
+    lines, warnings = pnl.calculate(month(), lookup=lookup_from(PARAMS))
+    row = lines.iloc[0]
+    assert warnings == ""
+    expected = {
+        "salary": 250000, "foodcost": 250000, "franchise": 50000, "writeoff": 15000, "hozy": 20000,
+        "delivery": 30000, "acquiring": 18000, "bank_commission": 5000, "permanent": 100000,
+        "salary_tax": 75000, "profit": 187000, "usn": 11220, "profit_after_usn": 175780,
+    }
+    for key, value in expected.items():
+        assert row[key] == pytest.approx(value), key
+    assert row["salary_share"] == pytest.approx(25.0)
+    assert row["foodcost_percent"] == pytest.approx(25.0)
+    assert row["acquiring_percent"] == pytest.approx(1.8)
+
+
+def test_fixed_amounts_scale_with_month_fraction():
+    row = pnl.calculate(month(), lookup=lookup_from(PARAMS), fixed_scale=0.5)[0].iloc[0]
+    assert row["salary"] == pytest.approx(225000)
+    assert row["permanent"] == pytest.approx(50000)
+
+
+def test_auto_units_accept_smaller_units():
+    params = {**PARAMS, ("Эквайринг", "Процент"): 18000, ("Процент доставка", "Процент"): 3000}
+    row = pnl.calculate(month(), lookup=lookup_from(params))[0].iloc[0]
+    assert row["acquiring"] == pytest.approx(18000)
+    assert row["delivery"] == pytest.approx(30000)
+
+
+def test_missing_parameters_warn_in_report_order():
+    params = {key: value for key, value in PARAMS.items() if key[0] not in ("УСН", "Франшиза")}
+    lines, warnings = pnl.calculate(month(), lookup=lookup_from(params))
+    assert lines.iloc[0]["franchise"] == 0
+    assert lines.iloc[0]["usn"] == 0
+    assert warnings == ("❗ Не удалось получить процент по франшизе.\n"
+                        "❗ Не удалось получить процент УСН.\n")
+
+
+def test_parameters_per_period():
+    totals = pd.concat([month(), month(revenue=2_000_000)], ignore_index=True)
+    franchise = pd.Series([5.0, 4.0], index=totals.index)
+    params = lookup_from(PARAMS)
+    lines, _ = pnl.calculate(
+        totals, lookup=lambda name, column: franchise if name == "Франшиза" else params(name, column))
+    assert list(lines["franchise"]) == pytest.approx([50000, 80000])
+
+
+def test_snapshot_lookup_matches_management_rows():
+    lookup = pnl.snapshot_lookup({"франшиза": {"Процент": 5}, "постоянные": {"Сумма": None}})
+    assert lookup("Франшиза", "Процент") == 5.0
+    assert lookup("Постоянные", "Сумма") is None
+    assert lookup("УСН", "Процент") is None
+
+
+def test_display_value_uses_data_units():
+    assert pnl.display_value(235, "foodcost") == pytest.approx(23.5)
+    assert pnl.display_value(35, "depth") == pytest.approx(3.5)
+    values = pnl.display_value(pd.Series([120.0, 45.0]), "discount")
+    assert list(values) == pytest.approx([12.0, 4.5])
@@ -0,0 +1,50 @@
+# test_quota.py
+
+import threading
+import time
+
+import quota
+
+
+def test_scheduled_lane_is_served_before_earlier_interactive():
+    budget = quota.QuotaBudget(600, 0)  # 10 токенов в секунду
+    budget.spend(600)
+    order = []
+
+    def take(lane):
+        assert budget.acquire(1, lane, timeout=5)
+        order.append(lane)
+
+    interactive = threading.Thread(target=take, args=("interactive",))
+    interactive.start()
+    time.sleep(0.02)
+    scheduled = threading.Thread(target=take, args=("scheduled",))
+    scheduled.start()
+    interactive.join()
+    scheduled.join()
+    assert order == ["scheduled", "interactive"]
+
+
+def test_reserve_is_kept_for_scheduled_lane():
+    budget = quota.QuotaBudget(60, 0.25)
+    budget.spend(40)  # осталось 20 токенов, резерв — 15
+    assert budget.available(5, "interactive")
+    assert not budget.available(6, "background")
+    assert budget.available(20, "scheduled")
+
+
+def test_acquire_gives_up_after_timeout():
+    budget = quota.QuotaBudget(6, 0)  # 0.1 токена в секунду
+    budget.spend(6)
+    started = time.monotonic()
+    assert not budget.acquire(1, "interactive", timeout=0.1)
+    assert time.monotonic() - started < 1
+    assert budget.snapshot()["waiting"] == 0
+
+
+def test_lane_context_sets_current_lane():
+    assert quota.current_lane() == quota.DEFAULT_LANE
+    with quota.lane("background"):
+        assert quota.current_lane() == "background"
+        assert quota.in_lane("scheduled", quota.current_lane)() == "scheduled"
+    assert quota.current_lane() == quota.DEFAULT_LANE
@@ -0,0 +1,91 @@
+# test_resilience.py
+
+import pytest
+import requests
+
+import quota
+import resilience
+import utils
+
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: clock[0])
+    breaker = resilience.CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    breaker.before_call()  # одна ошибка — ещё замкнут
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+
+    clock[0] += 31
+    breaker.before_call()  # half-open: пробный запрос
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()  # второй — пока пробный не завершился
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.before_call()
+
+
+def test_retries_only_retryable_errors(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    breaker = resilience.CircuitBreaker(3, 30)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.exceptions.ConnectionError("сеть")
+        return "ok"
+
+    assert resilience.call_with_retries(flaky, breaker, 3, 0.1, 1) == "ok"
+    assert len(calls) == 3
+
+    def invalid():
+        calls.append(1)
+        raise ValueError("неверный запрос")
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        resilience.call_with_retries(invalid, breaker, 3, 0.1, 1)
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "SHEETS_PROVIDER", "gspread")
+    monkeypatch.setattr(utils, "FETCH_RETRIES", 0)
+    monkeypatch.setattr(utils, "_last_good", {})
+    monkeypatch.setattr(utils, "_breaker", resilience.CircuitBreaker(1, 60))
+    monkeypatch.setattr(utils, "sheets_budget", quota.QuotaBudget(600, 0))
+    responses = []
+    monkeypatch.setattr(utils, "_load_gspread", lambda keys: responses.pop(0)(keys))
+    return responses
+
+
+def test_fetch_falls_back_to_last_good_copy(sheets):
+    key = ("sheet", None)
+    sheets.append(lambda keys: {key: [{"Выручка": 1}]})
+    assert utils.fetch_records(*key) == ([{"Выручка": 1}], None)
+
+    def down(keys):
+        raise requests.exceptions.ConnectionError("Google недоступен")
+
+    sheets.append(down)
+    records, age = utils.fetch_records(*key)
+    assert records == [{"Выручка": 1}] and age is not None
+    # Выключатель разомкнут: копия отдаётся без обращения к Google
+    records, age = utils.fetch_records(*key)
+    assert records == [{"Выручка": 1}] and age is not None
+    assert sheets == []
+
+
+def test_fetch_without_copy_raises(sheets):
+    def down(keys):
+        raise requests.exceptions.ConnectionError("Google недоступен")
+
+    sheets.append(down)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        utils.fetch_records("other", None)
@@ -0,0 +1,44 @@
+# test_store.py
+
+import pandas as pd
+import pytest
+
+from store import AnalyticsStore
+from utils import metric_columns
+
+
+def test_period_and_monthly_totals_match_pandas(frame):
+    df = frame("2026-07-01", "2026-09-30")
+    df["Фудкост общий, %"] = df["Фудкост общий, %"].astype(object)
+    df.loc[df.index[3], "Фудкост общий, %"] = "24,5%"  # строка с процентом, как в таблице
+    store = AnalyticsStore()
+    store.replace_all(df)
+    metrics = pd.DataFrame(metric_columns(df))
+    august = (df["Дата"] >= "2026-08-01") & (df["Дата"] <= "2026-08-31")
+
+    totals = store.period_totals("2026-08-01", "2026-08-31")
+    assert totals["rows"] == 31
+    assert totals["revenue"] == pytest.approx(metrics.loc[august, "revenue"].sum())
+    assert totals["foodcost"] == pytest.approx(metrics.loc[august, "foodcost"].mean())
+
+    monthly = store.monthly_totals("2026-07-01", "2026-09-30")
+    assert list(monthly.index) == ["2026-07", "2026-08", "2026-09"]
+    assert monthly.loc["2026-07", "foodcost"] == pytest.approx(metrics.loc[df["Дата"] < "2026-08-01", "foodcost"].mean())
+    assert monthly["revenue"].sum() == pytest.approx(metrics["revenue"].sum())
+
+
+def test_replace_days_equals_full_rebuild(frame):
+    df = frame("2026-09-01", "2026-09-30")
+    scoped, full = AnalyticsStore(), AnalyticsStore()
+    scoped.replace_all(df)
+    edited = df.copy()
+    edited.loc[edited["Дата"] == "2026-09-10", "Выручка бар"] += 500
+    scoped.replace_days(edited, ["2026-09-10"])
+    full.replace_all(edited)
+    query = "SELECT * FROM daily_data ORDER BY date, manager"
+    pd.testing.assert_frame_equal(scoped.query_df(query), full.query_df(query))
+
+
+def test_empty_period():
+    totals = AnalyticsStore().period_totals("2026-01-01", "2026-01-31")
+    assert totals["rows"] == 0 and totals["revenue"] == 0
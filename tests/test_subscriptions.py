@@ -0,0 +1,37 @@
+# test_subscriptions.py
+
+import pytest
+
+import subscriptions
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(subscriptions, "SUBSCRIPTIONS_FILE", str(tmp_path / "subscriptions.json"))
+    monkeypatch.setattr(subscriptions, "_report_cache", {})
+
+
+def test_subscription_key_includes_venue(registry):
+    assert subscriptions.subscribe(1, "analyze", "09:00")
+    assert not subscriptions.subscribe(1, "analyze", "09:00", subscriptions.DEFAULT_VENUE)
+    assert subscriptions.subscribe(1, "analyze", "09:00", "second")
+    assert [subscriptions.venue_of(sub) for sub in subscriptions.list_subscriptions(1)] == ["main", "second"]
+
+
+def test_old_entries_without_venue_match_default(registry):
+    subscriptions._save([{"chat_id": "1", "report": "analyze", "time": "09:00"}])
+    assert not subscriptions.subscribe(1, "analyze", "09:00")
+
+
+def test_report_built_once_per_venue_and_version(registry, monkeypatch):
+    calls = []
+    monkeypatch.setattr(subscriptions, "get_version", lambda: 7)
+    monkeypatch.setattr(subscriptions, "get_data", lambda *args: None)
+    monkeypatch.setattr(subscriptions, "stale_note", lambda df: "")
+    builders = {"analyze": lambda: calls.append(1) or "отчёт"}
+
+    assert subscriptions.build_once("analyze", "main", builders) == "отчёт"
+    assert subscriptions.build_once("analyze", "main", builders) == "отчёт"
+    assert len(calls) == 1
+    with pytest.raises(ValueError):
+        subscriptions.build_once("analyze", "second", builders)
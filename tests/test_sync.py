@@ -0,0 +1,59 @@
+# test_sync.py
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import sync
+
+
+@pytest.fixture
+def source(monkeypatch):
+    """Подмена чтения таблицы: медленное чтение, счётчик вызовов и порядок версий в хуке."""
+    calls, seen = [], []
+
+    def read_data():
+        calls.append(time.monotonic())
+        time.sleep(0.2)
+        return pd.DataFrame({"Дата": pd.to_datetime(["2026-10-01"]), "Выручка бар": [float(len(calls))]})
+
+    monkeypatch.setattr(sync, "read_data", read_data)
+    monkeypatch.setattr(sync, "merge_with_history", lambda df: df)
+    monkeypatch.setattr(sync, "compact", lambda df: df)
+    monkeypatch.setattr(sync, "_hooks", [lambda df, version: seen.append(version)])
+    monkeypatch.setattr(sync, "_state", {"df": None, "version": 0, "synced_at": None})
+    return calls, seen
+
+
+def test_concurrent_stale_reads_share_one_sync(source):
+    calls, seen = source
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sync.get_data(300))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sync.get_version() == 1
+    assert all(df is results[0] for df in results)
+
+
+def test_explicit_syncs_run_hooks_in_version_order(source):
+    calls, seen = source
+    threads = [threading.Thread(target=sync.sync) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 3
+    assert seen == [1, 2, 3]
+
+
+def test_fresh_data_is_not_resynced(source):
+    calls, _ = source
+    sync.get_data(300)
+    sync.get_data(300)
+    sync.get_data()
+    assert len(calls) == 1
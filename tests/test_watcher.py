@@ -0,0 +1,67 @@
+# test_watcher.py
+
+import pytest
+
+import quota
+import utils
+import watcher
+
+
+class FakeSheet:
+    row_count, col_count = 1000, 3
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def col_values(self, col):
+        return [row[col - 1] for row in self.rows]
+
+    def get(self, a1_range):
+        start, end = (int("".join(ch for ch in part if ch.isdigit())) for part in a1_range.split(":"))
+        return self.rows[start - 1:end]
+
+
+class FakeClient:
+    def __init__(self, sheet):
+        self.sheet, self.opened = sheet, []
+
+    def open_by_key(self, key):
+        self.opened.append(key)
+        return type("Spreadsheet", (), {"sheet1": self.sheet})()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    sheet = FakeSheet([[f"2026-10-{day:02d}", "Анна", str(day)] for day in range(1, 31)])
+    client = FakeClient(sheet)
+    budget = quota.QuotaBudget(60, 0)
+    monkeypatch.setattr(utils, "_get_client", lambda: client)
+    monkeypatch.setattr(utils, "sheets_budget", budget)
+    monkeypatch.setattr(watcher, "sheets_budget", budget)
+    monkeypatch.setattr(watcher, "_probe", {"last_row": None})
+    return client, budget
+
+
+def test_checksum_uses_shared_client_and_charges_real_cost(client):
+    fake, budget = client
+    first = watcher.get_last_row_checksum()
+    assert budget.snapshot()["tokens"] == pytest.approx(55, abs=0.5)  # 3 + столбец и окно при первой проверке
+    assert watcher.get_last_row_checksum() == first
+    assert budget.snapshot()["tokens"] == pytest.approx(52, abs=0.5)
+    assert len(fake.opened) == 2
+
+
+def test_checksum_changes_with_new_row(client):
+    fake, _ = client
+    first = watcher.get_last_row_checksum()
+    fake.sheet.rows.append(["2026-10-31", "Борис", "31"])
+    assert watcher.get_last_row_checksum() != first
+    assert watcher._probe["last_row"] == 31
+
+
+def test_checksum_goes_through_breaker(client, monkeypatch):
+    breaker = utils.CircuitBreaker(1, 60)
+    breaker.record_failure()
+    monkeypatch.setattr(utils, "_breaker", breaker)
+    with pytest.raises(utils.CircuitOpenError):
+        watcher.get_last_row_checksum()
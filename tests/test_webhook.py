@@ -0,0 +1,40 @@
+# test_webhook.py
+
+import pytest
+
+import main
+
+
+class FakeApp:
+    def __init__(self):
+        self.calls = []
+
+    def run_webhook(self, **kwargs):
+        self.calls.append(("webhook", kwargs))
+
+    def run_polling(self):
+        self.calls.append(("polling", {}))
+
+
+@pytest.fixture
+def webhook_mode(monkeypatch):
+    monkeypatch.setattr(main, "BOT_MODE", "webhook")
+    monkeypatch.setattr(main, "WEBHOOK_URL", "https://bot.example/")
+
+
+def test_webhook_without_secret_refuses_to_start(webhook_mode, monkeypatch):
+    monkeypatch.setattr(main, "WEBHOOK_SECRET", "")
+    app = FakeApp()
+    with pytest.raises(SystemExit):
+        main.run_bot(app)
+    assert app.calls == []
+
+
+def test_webhook_passes_secret(webhook_mode, monkeypatch):
+    monkeypatch.setattr(main, "WEBHOOK_SECRET", "s3cret")
+    app = FakeApp()
+    main.run_bot(app)
+    mode, kwargs = app.calls[0]
+    assert mode == "webhook"
+    assert kwargs["secret_token"] == "s3cret"
+    assert kwargs["webhook_url"] == "https://bot.example/telegram"
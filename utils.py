@@ -2,6 +2,10 @@
 
 import os
 import json
+import time
+import logging
+import threading
+from decimal import Decimal, InvalidOperation
 import pandas as pd
 import requests
 from dotenv import load_dotenv
@@ -12,22 +16,232 @@ from config import (
     MANAGEMENT_SHEET_ID,
     MANAGEMENT_SHEET_NAME,
     SCOPES,
-    SERVICE_ACCOUNT_FILE
+    SERVICE_ACCOUNT_FILE,
+    STATE_DIR,
+    FETCH_RETRIES,
+    FETCH_BACKOFF_BASE,
+    FETCH_BACKOFF_MAX,
+    CIRCUIT_FAILURES,
+    CIRCUIT_RESET_SECONDS,
+    MANAGEMENT_CACHE_SECONDS,
+    FETCH_CONCURRENCY,
+    GOOGLE_SHEETS_API_URL,
+    SHEETS_API_URL,
+    SHEETS_ANONYMOUS,
+    SHEETS_PROVIDER,
+    DASHBOARD_SCOPES,
+    TELEGRAM_API_URL,
 )
+import sheets_async
+from quota import LANES, sheets_budget, current_lane, QuotaExhaustedError
+from resilience import CircuitBreaker, CircuitOpenError, call_with_retries, is_retryable
 
 load_dotenv()  # обязательно загрузить переменные из .env, если не сделали ранее
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
 
+logger = logging.getLogger(__name__)
+
 # Авторизация через JSON-файл сервисного аккаунта
-def get_creds():
+def get_creds(scopes=SCOPES):
     """Создание объекта авторизации для Google API."""
     return service_account.Credentials.from_service_account_file(
         SERVICE_ACCOUNT_FILE,
-        scopes=SCOPES
+        scopes=scopes
     )
 
+# --- Устойчивая загрузка из Google Sheets ---
+
+_breaker = CircuitBreaker(CIRCUIT_FAILURES, CIRCUIT_RESET_SECONDS)
+_client = {"gc": None, "writer": None}
+_last_good = {}   # (sheet_id, worksheet) -> (records, время загрузки)
+_last_good_lock = threading.Lock()
+_fetch_slots = threading.BoundedSemaphore(FETCH_CONCURRENCY)  # глобальный лимит загрузок
+
+class _BaseUrlHTTPClient(gspread.HTTPClient):
+    """HTTP-клиент gspread, который ходит на SHEETS_API_URL вместо sheets.googleapis.com."""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        endpoint = endpoint.replace(GOOGLE_SHEETS_API_URL, SHEETS_API_URL.rstrip("/"), 1)
+        return super().request(method, endpoint, *args, **kwargs)
+
+def _get_client():
+    """Авторизованный клиент gspread (один на процесс)."""
+    if _client["gc"] is None:
+        if SHEETS_ANONYMOUS:
+            # Эмулятор Sheets: без сервисного аккаунта и запросов за токеном
+            _client["gc"] = gspread.authorize(None, http_client=_BaseUrlHTTPClient, session=requests.Session())
+        else:
+            _client["gc"] = gspread.authorize(get_creds(), http_client=_BaseUrlHTTPClient)
+    return _client["gc"]
+
+def get_write_client():
+    """Клиент gspread с правом записи (публикация показателей, dashboard.py)."""
+    if _client["writer"] is None:
+        if SHEETS_ANONYMOUS:
+            _client["writer"] = gspread.authorize(None, http_client=_BaseUrlHTTPClient, session=requests.Session())
+        else:
+            _client["writer"] = gspread.authorize(get_creds(DASHBOARD_SCOPES), http_client=_BaseUrlHTTPClient)
+    return _client["writer"]
+
+def _last_good_path(sheet_id, worksheet):
+    return os.path.join(STATE_DIR, f"last_good_{sheet_id}_{worksheet or 'sheet1'}.json")
+
+def _store_last_good(key, records, fetched_at):
+    with _last_good_lock:
+        _last_good[key] = (records, fetched_at)
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        path = _last_good_path(*key)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": fetched_at, "records": records}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.warning("Не удалось сохранить резервную копию таблицы: %s", e)
+
+def _load_last_good(key):
+    with _last_good_lock:
+        if key in _last_good:
+            return _last_good[key]
+    try:
+        with open(_last_good_path(*key), encoding="utf-8") as f:
+            saved = json.load(f)
+        return saved["records"], saved["fetched_at"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _load_gspread(keys):
+    """Листы по очереди через gspread."""
+    result = {}
+    for sheet_id, worksheet in keys:
+        with _fetch_slots:
+            spreadsheet = _get_client().open_by_key(sheet_id)
+            sheet = spreadsheet.worksheet(worksheet) if worksheet else spreadsheet.sheet1
+            result[(sheet_id, worksheet)] = sheet.get_all_records()
+    return result
+
+def _load_async(keys):
+    """Все листы одним заходом: по batchGet на таблицу, таблицы параллельно (sheets_async)."""
+    with _fetch_slots:
+        return sheets_async.fetch_records(keys)
+
+def _fresh_records(key, max_age_seconds):
+    """Удачная копия из памяти, если она моложе max_age_seconds, иначе None."""
+    with _last_good_lock:
+        cached = _last_good.get(key)
+    if max_age_seconds and cached and time.time() - cached[1] < max_age_seconds:
+        return cached[0]
+    return None
+
+def _request_cost(keys):
+    """Сколько запросов к Sheets API уйдёт на загрузку keys выбранным загрузчиком."""
+    if SHEETS_PROVIDER == "async":
+        return len({sheet_id for sheet_id, _ in keys})  # один batchGet на таблицу
+    return 3 * len(keys)  # gspread: метаданные при открытии таблицы и при выборе листа + значения
+
+def fetch_many(keys, max_age_seconds=None):
+    """
+    Несколько листов сразу: {(sheet_id, worksheet): (records, age)}, смысл как у fetch_records.
+    Загрузчик выбирается SHEETS_PROVIDER: 'gspread' — по очереди, 'async' — параллельно.
+    Каждая попытка списывается с бюджета квоты (quota.sheets_budget) в полосе текущего потока.
+    Если бюджета сейчас нет, а у всех листов есть сохранённая копия, — неплановым чтениям
+    отдаём её, не дожидаясь; остальные ждут своей очереди.
+    """
+    results = {}
+    if max_age_seconds:
+        for key in keys:
+            records = _fresh_records(key, max_age_seconds)
+            if records is not None:
+                results[key] = (records, None)
+    missing = [key for key in dict.fromkeys(keys) if key not in results]
+    if not missing:
+        return results
+
+    loader = _load_async if SHEETS_PROVIDER == "async" else _load_gspread
+    cost, lane = _request_cost(missing), current_lane()
+
+    def serve_fallback(reason):
+        fallbacks = {key: _load_last_good(key) for key in missing}
+        if any(fallback is None for fallback in fallbacks.values()):
+            return False
+        logger.warning("Google Sheets: %s, используем резервную копию", reason)
+        now = time.time()
+        results.update({key: (fallback[0], now - fallback[1]) for key, fallback in fallbacks.items()})
+        return True
+
+    # Плановым отчётам нужны свежие данные — они ждут бюджета, остальным хватит копии
+    if LANES[lane] > 0 and not sheets_budget.available(cost, lane) \
+            and serve_fallback(f"бюджет квоты исчерпан (полоса {lane})"):
+        return results
+
+    attempts = []
+
+    def load():
+        if attempts:
+            sheets_budget.spend(cost)  # повтор — тоже запрос к квоте
+        attempts.append(1)
+        return loader(missing)
+
+    try:
+        if not sheets_budget.acquire(cost, lane):
+            raise QuotaExhaustedError("Квота Google Sheets исчерпана, попробуйте через минуту")
+        loaded = call_with_retries(load, _breaker, FETCH_RETRIES, FETCH_BACKOFF_BASE, FETCH_BACKOFF_MAX)
+    except Exception as e:
+        if not isinstance(e, (CircuitOpenError, QuotaExhaustedError)) and not is_retryable(e):
+            raise
+        if not serve_fallback(f"недоступен ({e})"):
+            raise
+        return results
+    fetched_at = time.time()
+    for key in missing:
+        _store_last_good(key, loaded[key], fetched_at)
+        results[key] = (loaded[key], None)
+    return results
+
+def call_sheets(func, cost):
+    """
+    Произвольное чтение через общий клиент: func(gc) с тем же бюджетом квоты (в полосе
+    текущего потока), выключателем, повторами и лимитом одновременных загрузок, что и fetch_many.
+    cost — запросов к Sheets API на одну попытку (см. _request_cost).
+    """
+    attempts = []
+
+    def load():
+        if attempts:
+            sheets_budget.spend(cost)  # повтор — тоже запрос к квоте
+        attempts.append(1)
+        with _fetch_slots:
+            return func(_get_client())
+
+    if not sheets_budget.acquire(cost, current_lane()):
+        raise QuotaExhaustedError("Квота Google Sheets исчерпана, попробуйте через минуту")
+    return call_with_retries(load, _breaker, FETCH_RETRIES, FETCH_BACKOFF_BASE, FETCH_BACKOFF_MAX)
+
+def fetch_records(sheet_id, worksheet=None, max_age_seconds=None):
+    """
+    get_all_records() с повторами, выключателем и откатом на последнюю удачную копию.
+    Возвращает (records, age): age — возраст данных в секундах, если Google недоступен
+    и пришлось взять резервную копию, иначе None.
+    max_age_seconds — можно вернуть удачную копию из памяти без запроса, если она свежее.
+    """
+    key = (sheet_id, worksheet)
+    return fetch_many([key], max_age_seconds)[key]
+
+def stale_note(df):
+    """Подпись к ответу, если данные взяты из резервной копии."""
+    age = getattr(df, "attrs", {}).get("fallback_age")
+    if not age:
+        return ""
+    minutes = int(age // 60)
+    age_text = f"{minutes // 60} ч {minutes % 60} мин" if minutes >= 60 else f"{minutes} мин"
+    return f"\n\n⚠️ Google Sheets недоступен, данные из резервной копии ({age_text} назад)."
+
+def _management_df():
+    records, _ = fetch_records(MANAGEMENT_SHEET_ID, MANAGEMENT_SHEET_NAME,
+                               max_age_seconds=MANAGEMENT_CACHE_SECONDS)
+    return pd.DataFrame(records)
+
 def format_ruble(val, decimals=0):
     """Красивое оформление суммы в рублях с пробелами."""
     if pd.isna(val):
@@ -37,12 +251,20 @@ def format_ruble(val, decimals=0):
         formatted = formatted.replace(".00", "")
     return formatted
 
-def read_data():
-    """Чтение основной таблицы (операционной) и возврат pandas.DataFrame."""
-    gc = gspread.authorize(get_creds())
-    sheet = gc.open_by_key(SHEET_ID).sheet1
-    df = pd.DataFrame(sheet.get_all_records())
+def to_percent_number(series):
+    """Процентная колонка ('24,5%', '24.5', 24.5) -> числа, как в analyze."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series  # уже разобрана (dataset.compact)
+    cleaned = (
+        series.astype(str)
+        .str.replace(",", ".")
+        .str.replace("%", "")
+        .str.strip()
+    )
+    return pd.to_numeric(cleaned, errors="coerce")
 
+def clean_data(df):
+    """Приведение типов как для операционной таблицы: числа, дата, строки без даты удаляются."""
     if "Дата" in df.columns:
         for col in df.columns:
             if col not in ["Дата", "Фудкост общий, %", "Менеджер"]:
@@ -56,14 +278,69 @@ def read_data():
         df = df.dropna(subset=["Дата"])
     return df
 
+def metric_columns(df):
+    """
+    Основные метрики по строкам операционной таблицы (проценты уже числами).
+    Всё в float64: сжатые int32/float32 колонки не теряют точность в суммах.
+    """
+    delivery_cols = [col for col in df.columns if "достав" in col.lower()]
+    delivery = df[delivery_cols[0]] if delivery_cols else pd.Series(float("nan"), index=df.index)
+
+    def wide(series):
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+
+    return {
+        "revenue": wide(df["Выручка бар"]) + wide(df["Выручка кухня"]),
+        "bar": wide(df["Выручка бар"]),
+        "kitchen": wide(df["Выручка кухня"]),
+        "salary": wide(df["Начислено"]),
+        "hall": wide(df["Зал начислено"]),
+        "delivery": wide(delivery),
+        "avg_check": wide(df["Ср. чек общий"]),
+        "depth": wide(df["Ср. поз чек общий"]),
+        "foodcost": wide(to_percent_number(df["Фудкост общий, %"])),
+        "discount": wide(to_percent_number(df["Скидка общий, %"])),
+    }
+
+def rank_managers(manager_stats):
+    """
+    Рейтинг менеджеров по итогам store.manager_stats: общая выручка, глубина и оценка
+    (ср. чек 50%, выручка 30%, глубина 20% от лучшего), по убыванию оценки.
+    """
+    manager_stats = manager_stats.copy()
+    manager_stats["Общая выручка"] = manager_stats["Выручка бар"] + manager_stats["Выручка кухня"]
+    manager_stats["Глубина"] = manager_stats["Ср. поз чек общий"] / 10
+
+    max_values = {
+        "Ср. чек общий": manager_stats["Ср. чек общий"].max(),
+        "Общая выручка": manager_stats["Общая выручка"].max(),
+        "Глубина": manager_stats["Глубина"].max()
+    }
+
+    manager_stats["Оценка"] = (
+        (manager_stats["Ср. чек общий"] / max_values["Ср. чек общий"]) * 0.5 +
+        (manager_stats["Общая выручка"] / max_values["Общая выручка"]) * 0.3 +
+        (manager_stats["Глубина"] / max_values["Глубина"]) * 0.2
+    )
+    return manager_stats.sort_values("Оценка", ascending=False)
+
+def read_data():
+    """Чтение основной таблицы (операционной) и возврат pandas.DataFrame."""
+    keys = [(SHEET_ID, None)]
+    management = (MANAGEMENT_SHEET_ID, MANAGEMENT_SHEET_NAME)
+    if SHEETS_PROVIDER == "async" and _fresh_records(management, MANAGEMENT_CACHE_SECONDS) is None:
+        keys.append(management)  # заодно и параллельно: хуки синхронизации сразу читают управляющую таблицу
+    records, fallback_age = fetch_many(keys)[(SHEET_ID, None)]
+    df = clean_data(pd.DataFrame(records))
+    df.attrs["fallback_age"] = fallback_age
+    return df
+
 def get_management_percent(row_name: str):
     """
     Возвращает число из управляющей таблицы по названию строки (столбец 'Процент').
     Поддерживает любые форматы (3.2, 3,2%, '3', '3.2%' и т.д.)
     """
-    gc = gspread.authorize(get_creds())
-    sheet = gc.open_by_key(MANAGEMENT_SHEET_ID).worksheet(MANAGEMENT_SHEET_NAME)
-    df = pd.DataFrame(sheet.get_all_records())
+    df = _management_df()
     found = df[df.iloc[:, 0].astype(str).str.lower().str.strip() == row_name.lower().strip()]
     if not found.empty and "Процент" in df.columns:
         value = found.iloc[0]["Процент"]
@@ -77,9 +354,7 @@ def get_management_value(row_name: str, column_name: str):
     Возвращает значение по названию строки и столбца из управляющей таблицы.
     Пример: row_name='ЗП упр', column_name='Сумма'
     """
-    gc = gspread.authorize(get_creds())
-    sheet = gc.open_by_key(MANAGEMENT_SHEET_ID).worksheet(MANAGEMENT_SHEET_NAME)
-    df = pd.DataFrame(sheet.get_all_records())
+    df = _management_df()
     found = df[df.iloc[:, 0].astype(str).str.lower().str.strip() == row_name.lower().strip()]
     if not found.empty and column_name in df.columns:
         value = found.iloc[0][column_name]
@@ -89,10 +364,37 @@ def get_management_value(row_name: str, column_name: str):
             return None
     return None
 
+def parse_decimal(value):
+    """Точное число из ячейки: '3,2%', '3.2', 3.2, '100 000' -> Decimal; пустое/ошибка -> None."""
+    if value is None:
+        return None
+    text = str(value).replace("%", "").replace(",", ".").replace("\xa0", "").replace(" ", "").strip()
+    if not text:
+        return None
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+def get_management_snapshot():
+    """
+    Управляющая таблица целиком за один запрос:
+    {название строки в нижнем регистре: {столбец: Decimal или None}}.
+    """
+    df = _management_df()
+    snapshot = {}
+    if df.empty:
+        return snapshot
+    value_columns = list(df.columns[1:])
+    for row in df.itertuples(index=False, name=None):
+        name = str(row[0]).lower().strip()
+        if name and name not in snapshot:
+            snapshot[name] = {col: parse_decimal(value) for col, value in zip(value_columns, row[1:])}
+    return snapshot
+
 def get_management_foodcost():
-    gc = gspread.authorize(CREDS)
-    sheet = gc.open_by_key(MANAGEMENT_SHEET_ID).worksheet(MANAGEMENT_SHEET_NAME)
-    df = pd.DataFrame(sheet.get_all_records())
+    df = _management_df()
     fc_row = df[df.iloc[:,0].astype(str).str.lower().str.strip() == "фудкост"]
     if not fc_row.empty:
         fc_percent = fc_row.iloc[0]["Процент"]
@@ -102,17 +404,16 @@ def get_management_foodcost():
             return None
     return None
 
-def send_to_telegram(message: str):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    data = {"chat_id": CHAT_ID, "text": message}
-    requests.post(url, data=data)
+def send_to_telegram(message: str, chat_id=None):
+    """Отправка сообщения через Bot API (по умолчанию — в CHAT_ID из .env); возвращает ответ."""
+    url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}/sendMessage"
+    data = {"chat_id": chat_id or CHAT_ID, "text": message}
+    return requests.post(url, data=data)
 
 def get_management_bonus_grid(manager_name):
     """
     Возвращает DataFrame с бонусной сеткой из управляющей таблицы по роли.
     """
-    gc = gspread.authorize(get_creds())
-    sheet = gc.open_by_key(MANAGEMENT_SHEET_ID).worksheet(MANAGEMENT_SHEET_NAME)
-    df = pd.DataFrame(sheet.get_all_records())
+    df = _management_df()
     # Возвращаем только подходящие строки
     return df[df.iloc[:, 0].astype(str).str.lower().str.contains(manager_name.lower())][["Минимум", "Максимум", "Бонус"]].reset_index(drop=True)
@@ -0,0 +1,140 @@
+# watcher.py
+
+import os
+import json
+import hashlib
+import logging
+from gspread.utils import rowcol_to_a1
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+from config import SHEET_ID, SERVICE_ACCOUNT_FILE, DRIVE_SCOPES, STATE_DIR
+from utils import call_sheets, send_to_telegram
+from quota import sheets_budget
+from sync import sync
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.path.join(STATE_DIR, "watcher.json")
+PROBE_ROWS = 20  # Строк до и после прежнего конца данных в запасной проверке
+PROBE_COST = 3   # Запросов на проверку: открытие таблицы, выбор листа, окно строк (как в utils._request_cost)
+
+_probe = {"last_row": None}  # последняя заполненная строка по прошлой проверке (в памяти процесса)
+
+_drive_service = None
+
+
+def _get_drive_service():
+    """Drive API клиент создаётся один раз и переиспользуется между проверками."""
+    global _drive_service
+    if _drive_service is None:
+        creds = service_account.Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE, scopes=DRIVE_SCOPES)
+        _drive_service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+    return _drive_service
+
+
+def _load_state():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, STATE_FILE)
+
+
+def get_sheet_modified_time():
+    """Время последнего изменения таблицы по метаданным Drive (один лёгкий запрос)."""
+    meta = _get_drive_service().files().get(fileId=SHEET_ID, fields="modifiedTime").execute()
+    return meta.get("modifiedTime")
+
+
+def get_last_row_checksum():
+    """
+    Запасной вариант без Drive API: контрольная сумма конца данных.
+    Читает одно окно в 2 * PROBE_ROWS строк вокруг прежнего конца данных; размер
+    сетки листа уже есть в метаданных. Весь первый столбец читается, только если
+    конец ещё неизвестен (первая проверка) или окно оказалось пустым (строки удалили).
+    Чтение идёт через общий клиент utils: SHEETS_API_URL, квота, выключатель и повторы.
+    """
+    return call_sheets(_last_row_checksum, PROBE_COST)
+
+
+def _last_row_checksum(gc):
+    sheet = gc.open_by_key(SHEET_ID).sheet1
+    last_row = _probe["last_row"]
+    window = _read_window(sheet, last_row) if last_row else []
+    if not window:
+        sheets_budget.spend(2)  # столбец и повторное окно
+        last_row = len(sheet.col_values(1))
+        window = _read_window(sheet, last_row) if last_row else []
+    start = max(1, last_row - PROBE_ROWS + 1) if last_row else 1
+    # values.get не возвращает пустые строки в конце окна: конец данных — последняя строка ответа
+    _probe["last_row"] = start + len(window) - 1 if window else 0
+    payload = json.dumps([sheet.row_count, _probe["last_row"], window], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _read_window(sheet, last_row):
+    start = max(1, last_row - PROBE_ROWS + 1)
+    end = min(sheet.row_count, last_row + PROBE_ROWS)
+    if end < start:
+        return []
+    return sheet.get(f"A{start}:{rowcol_to_a1(end, sheet.col_count)}")
+
+
+def get_change_marker():
+    """Маркер изменения таблицы: modifiedTime из Drive, иначе контрольная сумма последней строки."""
+    try:
+        return "drive:" + get_sheet_modified_time()
+    except Exception as e:
+        logger.warning("Drive API недоступен (%s), используем контрольную сумму строки", e)
+        return "row:" + get_last_row_checksum()
+
+
+def check_for_changes(build_report):
+    """
+    Проверка изменений таблицы. При изменении — полная синхронизация
+    и отправка отчёта build_report(), если он отличается от уже отправленного.
+    Возвращает True, если отчёт был отправлен.
+    """
+    state = _load_state()
+    marker = get_change_marker()
+    if marker == state.get("marker"):
+        return False
+
+    df = sync()
+    if df.attrs.get("fallback_age"):
+        return False  # Google недоступен — проверим снова в следующий раз
+    report = build_report()
+    report_hash = hashlib.sha1(report.encode("utf-8")).hexdigest()
+    state["marker"] = marker
+    sent = False
+    if report_hash != state.get("report_hash"):
+        send_to_telegram(report)
+        state["report_hash"] = report_hash
+        sent = True
+    _save_state(state)
+    return sent
+
+
+def mark_report_sent(report):
+    """Запоминает отчёт, отправленный по расписанию, чтобы наблюдатель не дублировал его."""
+    state = _load_state()
+    state["report_hash"] = hashlib.sha1(report.encode("utf-8")).hexdigest()
+    _save_state(state)
+
+
+def watch_job(build_report):
+    """Задача для планировщика: ошибки логируются, а не роняют планировщик."""
+    try:
+        check_for_changes(build_report)
+    except Exception as e:
+        logger.exception("Ошибка наблюдателя за таблицей: %s", e)